@@ -1,139 +1,399 @@
-from google import genai
-from typing import Dict, Any
 import re
-from tools.periodic_table_tool import PeriodicTableTool
+from typing import Dict, Any, Optional, Tuple, List, AsyncIterator
+from llm.client import LLMClient
+from core.metrics import stage_seconds, tool_call
+from tools.chemical_formula import FormulaError, parse_formula
+from tools.chemical_formula_tool import ChemicalFormulaTool
+from tools.periodic_table_tool import PeriodicTableTool, load_elements
+from tools.stoichiometry_tool import StoichiometryTool
+from .detectors import engine as detectors
+from .prompt_builder import PromptBuilder, PromptTemplate
+
+# Every element name and alias in the bundled table, longest first
+ELEMENT_NAMES = load_elements().names
+
+PERIODIC_TABLE_PATTERNS = [
+    # Atomic properties
+    r'atomic number of\s+\w+',
+    r'what is the atomic number',
+    r'atomic mass of\s+\w+',
+    r'atomic weight of\s+\w+',
+    r'mass number of\s+\w+',
+
+    # Electron configuration
+    r'electron configuration of\s+\w+',
+    r'electronic structure of\s+\w+',
+    r'orbital configuration',
+
+    # Element properties
+    r'properties of\s+\w+',
+    r'characteristics of\s+\w+',
+    r'information about\s+\w+',
+    r'tell me about\s+\w+',
+
+    # Element identification
+    r'element\s+\w+',
+    r'symbol for\s+\w+',
+    r'chemical symbol',
+    r'what element has',
+
+    # Periodic table position
+    r'group\s+\d+',
+    r'period\s+\d+',
+    r'which group',
+    r'which period',
+    r'family of elements',
+
+    # Any element named outright
+    r'\b(?:' + '|'.join(ELEMENT_NAMES) + r')\b',
+
+    # Chemical symbols
+    r'\b[A-Z][a-z]?\b(?:\s+element|\s+atom)',
+]
+
+CHEMICAL_CALCULATION_PATTERNS = [
+    r'molecular weight', r'molar mass', r'formula weight',
+    r'moles of', r'molarity', r'concentration',
+    r'balanced equation', r'stoichiometry',
+    r'percent composition', r'empirical formula',
+    r'limiting reagent', r'theoretical yield',
+    r'\bbalance\b', r'percent yield', r'actual yield', r'excess reagent'
+]
+
+# Element extraction detectors, tried in this order by _extract_element
+ELEMENT_EXTRACTORS = {
+    'chemistry.element_property': [
+        r'(?:element|atom|atomic number of|atomic mass of|properties of|electron configuration of)\s+(?P<element>\w+)'
+    ],
+    'chemistry.tell_me_about': [r'tell me about\s+(?P<element>\w+)'],
+    'chemistry.information_about': [r'information about\s+(?P<element>\w+)'],
+    'chemistry.what_is': [r'what is\s+(?P<element>\w+)'],
+    'chemistry.before_element': [r'(?P<element>\w+)\s+(?:element|atom)'],
+}
+
+# Whole-question pattern for instant answers: one property of one element
+INSTANT_PATTERNS = [
+    r'^\s*(?:what\s+is\s+|what\'s\s+)?(?:the\s+)?'
+    r'(?P<property>atomic\s+number|atomic\s+mass|atomic\s+weight|symbol|chemical\s+symbol|electron\s+configuration)'
+    r'\s+(?:of|for)\s+(?P<element>[a-z]+)\s*\??\s*$'
+]
+
+_INSTANT_PROPERTIES = {
+    'atomic number': ('atomic_number', 'atomic number', ''),
+    'atomic mass': ('atomic_mass', 'atomic mass', ' u'),
+    'atomic weight': ('atomic_mass', 'atomic mass', ' u'),
+    'symbol': ('symbol', 'symbol', ''),
+    'chemical symbol': ('symbol', 'symbol', ''),
+    'electron configuration': ('electron_configuration', 'electron configuration', ''),
+}
+
+# Formula-shaped tokens in the original (case-preserved) question: H2SO4, Ca(OH)2,
+# CuSO4·5H2O, SO4^2-, NH4+. Detectors see lowercased text, so this runs separately.
+_FORMULA = (
+    r"[\[(]?[A-Z][A-Za-z0-9()\[\]{}₀-₉]*"
+    r"(?:(?:[·•∙*]\d*|\.\d+)[A-Z][A-Za-z0-9()\[\]{}₀-₉]*)*"
+    r"(?:\^\d*[+-]|[+-]+\d*(?![\w(])|[⁰-⁹¹²³⁺⁻]+)?"
+)
+_FORMULA_CANDIDATE = re.compile(r"(?<![\w\])])" + _FORMULA)
+
+# A written reaction: species joined by '+' on both sides of an arrow
+_SPECIES = r"(?:\d+\s*)?(?:e-|" + _FORMULA + r")"
+_REACTION = re.compile(
+    rf"(?<![\w\])]){_SPECIES}(?:\s*\+\s*{_SPECIES})*"
+    rf"\s*(?:<=>|<->|⇌|⇄|-->|->|=>|→|⟶|=)\s*"
+    rf"{_SPECIES}(?:\s*\+\s*{_SPECIES})*"
+)
+# '10 g of H2', '2.5 mol O2', '500 mmol of NaOH'
+_AMOUNT = re.compile(
+    r"(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>kg|kilograms?|mg|milligrams?|g|grams?|mmol|millimoles?|mol|moles?)"
+    r"\s+(?:of\s+)?(?P<species>" + _FORMULA + r")"
+)
+# Whole-question pattern for tool-only answers: just balance this reaction
+_INSTANT_BALANCE = re.compile(
+    r"^\s*(?:please\s+)?balance\s+(?:the\s+)?(?:chemical\s+)?(?:equation|reaction)?\s*:?\s*"
+    r"(?P<reaction>.+?)\s*[.?]?\s*$",
+    re.IGNORECASE,
+)
+# Stoichiometry questions answered in full by the solver
+_STOICHIOMETRY_QUESTION = re.compile(r"limiting reagent|theoretical yield|percent yield|excess reagent", re.IGNORECASE)
+
+# Whole-question pattern for instant answers: one quantity of one formula
+_INSTANT_CALCULATION = re.compile(
+    r"^\s*(?:what\s+is\s+|what's\s+|calculate\s+|find\s+)?(?:the\s+)?"
+    r"(?P<property>molar\s+mass|molecular\s+weight|formula\s+weight|percent(?:age)?\s+composition)"
+    r"\s+(?:of|for)\s+(?P<formula>\S+?)\s*\??\s*$",
+    re.IGNORECASE,
+)
+
+PROMPT = PromptTemplate('chemistry', """
+    You are a chemistry tutor. A student asked: "{query}"
+
+    {context}
+
+    Provide a response that:
+    1. Explains the chemistry concept clearly
+    2. Uses the provided element information and computed values if relevant
+    3. Shows chemical equations and calculations if needed
+    4. Includes molecular structures or diagrams when helpful
+    5. Is educational and engaging
+""")
+
+detectors.register('chemistry.periodic_table', PERIODIC_TABLE_PATTERNS)
+detectors.register('chemistry.instant_element', INSTANT_PATTERNS)
+detectors.register('chemistry.calculation', CHEMICAL_CALCULATION_PATTERNS)
+detectors.register('chemistry.common_element', [r'\b(?P<element>' + '|'.join(ELEMENT_NAMES) + r')\b'],
+                   requires='chemistry.periodic_table')
+for _name, _patterns in ELEMENT_EXTRACTORS.items():
+    detectors.register(_name, _patterns, requires='chemistry.periodic_table')
+
 
 class ChemistryAgent:
-    def __init__(self, client: genai.Client):
-        self.client = client
+    def __init__(self, llm: LLMClient):
+        self.llm = llm
         self.periodic_table = PeriodicTableTool()
+        self.formula_tool = ChemicalFormulaTool(self.periodic_table)
+        self.stoichiometry = StoichiometryTool(self.formula_tool)
 
     def _needs_periodic_table(self, query: str) -> bool:
-        patterns = [
-            # Atomic properties
-            r'atomic number of\s+\w+',
-            r'what is the atomic number',
-            r'atomic mass of\s+\w+',
-            r'atomic weight of\s+\w+',
-            r'mass number of\s+\w+',
-            
-            # Electron configuration
-            r'electron configuration of\s+\w+',
-            r'electronic structure of\s+\w+',
-            r'orbital configuration',
-            
-            # Element properties
-            r'properties of\s+\w+',
-            r'characteristics of\s+\w+',
-            r'information about\s+\w+',
-            r'tell me about\s+\w+',
-            
-            # Element identification
-            r'element\s+\w+',
-            r'symbol for\s+\w+',
-            r'chemical symbol',
-            r'what element has',
-            
-            # Periodic table position
-            r'group\s+\d+',
-            r'period\s+\d+',
-            r'which group',
-            r'which period',
-            r'family of elements',
-            
-            # Specific elements (common ones)
-            r'\b(?:hydrogen|helium|lithium|beryllium|boron|carbon|nitrogen|oxygen|fluorine|neon)\b',
-            r'\b(?:sodium|magnesium|aluminum|silicon|phosphorus|sulfur|chlorine|argon)\b',
-            r'\b(?:potassium|calcium|iron|copper|zinc|silver|gold|mercury|lead)\b',
-            
-            # Chemical symbols
-            r'\b[A-Z][a-z]?\b(?:\s+element|\s+atom)',
-        ]
-        return any(re.search(pattern, query.lower()) for pattern in patterns)
+        return 'chemistry.periodic_table' in detectors.scan(query)
+
+    def _as_written(self, query: str, word: str) -> Optional[str]:
+        """``word`` (captured from the lowercased scan) as written in ``query``, if it names an element.
+
+        Names match in any case but symbols only in their own, so "in" and
+        "as" are words while "In" and "As" are indium and arsenic.
+        """
+        for match in re.finditer(rf'(?<!\w){re.escape(word)}(?!\w)', query, re.IGNORECASE):
+            if self.periodic_table.get_element(match.group()) is not None:
+                return match.group()
+        return None
 
     def _extract_element(self, query: str) -> str:
-        # Try different patterns to extract element name
-        patterns = [
-            r'(?:element|atom|atomic number of|atomic mass of|properties of|electron configuration of)\s+(\w+)',
-            r'tell me about\s+(\w+)',
-            r'information about\s+(\w+)',
-            r'what is\s+(\w+)',
-            r'(\w+)\s+(?:element|atom)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query.lower())
-            if match:
-                element = match.group(1)
-                # Check if it's a valid element name or symbol
-                if len(element) <= 3 and element.isalpha():
-                    return element
-        
-        # Look for common element names directly
-        common_elements = [
-            'hydrogen', 'helium', 'lithium', 'beryllium', 'boron', 'carbon',
-            'nitrogen', 'oxygen', 'fluorine', 'neon', 'sodium', 'magnesium',
-            'aluminum', 'silicon', 'phosphorus', 'sulfur', 'chlorine', 'argon',
-            'potassium', 'calcium', 'iron', 'copper', 'zinc', 'silver', 'gold'
-        ]
-        
-        for element in common_elements:
-            if element in query.lower():
+        scan = detectors.scan(query)
+        for name in ELEMENT_EXTRACTORS:
+            groups = scan.get(name)
+            # Check if it's a valid element name or symbol
+            element = self._as_written(query, groups['element']) if groups is not None else None
+            if element is not None:
                 return element
-        
-        return None
+
+        # Look for element names anywhere in the question
+        groups = scan.get('chemistry.common_element')
+        return groups['element'] if groups is not None else None
 
     def _needs_chemical_calculation(self, query: str) -> bool:
         """Check if query needs chemical calculations"""
-        calc_patterns = [
-            r'molecular weight', r'molar mass', r'formula weight',
-            r'moles of', r'molarity', r'concentration',
-            r'balanced equation', r'stoichiometry',
-            r'percent composition', r'empirical formula',
-            r'limiting reagent', r'theoretical yield'
-        ]
-        return any(re.search(pattern, query.lower()) for pattern in calc_patterns)
+        return 'chemistry.calculation' in detectors.scan(query)
 
-    async def handle_query(self, query: str) -> Dict[str, Any]:
+    def _extract_formulas(self, query: str) -> List[str]:
+        """Chemical formulas written in the question, in order, without repeats.
+
+        A lone capitalised word that happens to spell symbols (In, As, He)
+        is not taken as a formula unless it has a digit, bracket or charge
+        or at least two element symbols.
+        """
+        formulas = []
+        for match in _FORMULA_CANDIDATE.finditer(query):
+            text = match.group()
+            try:
+                parsed = parse_formula(text)
+            except FormulaError:
+                continue
+            if len(parsed.counts) < 2 and not re.search(r"[\d()\[\]+\-^⁺⁻₀-₉]", text):
+                continue
+            if text not in formulas:
+                formulas.append(text)
+        return formulas
+
+    def _calculate_formulas(self, query: str) -> List[Dict[str, Any]]:
+        formulas = self._extract_formulas(query)
+        if not formulas:
+            # "molar mass of iron": fall back to a named element
+            element = self._extract_element(query) if self._needs_periodic_table(query) else None
+            element = self.periodic_table.get_element(element) if element else None
+            formulas = [element.symbol] if element else []
+        return [result for result in self.formula_tool.analyze_batch(formulas) if result['success']]
+
+    @staticmethod
+    def _describe_formula(result: Dict[str, Any]) -> str:
+        parts = ", ".join(
+            f"{symbol} {count} x {result['element_mass'][symbol] / count:g} = {result['element_mass'][symbol]:.3f} g/mol "
+            f"({result['percent_composition'][symbol]:.2f}%)"
+            for symbol, count in result['composition'].items()
+        )
+        return f"{result['formula']}: molar mass {result['molar_mass']:.3f} g/mol; {parts}"
+
+    def _instant_calculation_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        match = _INSTANT_CALCULATION.match(query)
+        if match is None:
+            return None
+        result = self.formula_tool.analyze(match.group('formula'))
+        if not result['success']:
+            return None
+        if match.group('property').lower().startswith('percent'):
+            composition = ", ".join(f"{symbol} {percent:.2f}%" for symbol, percent in result['percent_composition'].items())
+            answer = f"The percent composition by mass of {result['formula']} is {composition}."
+        else:
+            answer = f"The molar mass of {result['formula']} is {result['molar_mass']:.3f} g/mol."
+        return {
+            'answer': answer,
+            'tools_used': ["Chemical Formula Calculator"],
+            'tool_only': True
+        }
+
+    def _solve_reaction(self, query: str) -> Optional[Dict[str, Any]]:
+        """Balance the reaction written in the question and, given amounts, work out the stoichiometry"""
+        match = _REACTION.search(query)
+        if match is None:
+            return None
+        balanced = self.stoichiometry.balance_equation(match.group())
+        if not balanced['success']:
+            return None
+
+        amounts, actual = {}, {}
+        for found in _AMOUNT.finditer(query):
+            species = found.group('species')
+            if species in balanced['coefficients']:
+                amounts.setdefault(species, (float(found.group('value')), found.group('unit')))
+        # with reactant amounts given, product amounts are what was actually obtained
+        if any(species in balanced['reactants'] for species in amounts):
+            actual = {species: amounts.pop(species) for species in list(amounts) if species in balanced['products']}
+        if not amounts:
+            return balanced
+        result = self.stoichiometry.solve(match.group(), amounts, actual or None)
+        return result if result['success'] else balanced
+
+    @staticmethod
+    def _describe_reaction(result: Dict[str, Any]) -> List[str]:
+        lines = [f"Balanced equation: {result['equation']}"]
+        quantities = result.get('quantities')
+        if quantities is None:
+            return lines
+
+        def amount(species: str, moles: float) -> str:
+            grams = moles * quantities[species]['molar_mass'] if quantities[species]['molar_mass'] else None
+            return f"{species} {moles:.4g} mol" + (f" = {grams:.4g} g" if grams is not None else "")
+
+        limiting = result['limiting_reagent']
+        products = result['products']
+        if limiting:
+            lines.append(f"Limiting reagent: {limiting}")
+            lines.append("Theoretical yield: " + "; ".join(amount(s, quantities[s]['moles']) for s in products))
+            excess = [s for s, q in quantities.items() if s != limiting and 'excess_moles' in q]
+            if excess:
+                lines.append("Excess remaining: " + "; ".join(amount(s, quantities[s]['excess_moles']) for s in excess))
+        else:
+            lines.append("Reactants needed: " + "; ".join(amount(s, quantities[s]['moles']) for s in result['reactants']))
+        for species, percent in result.get('percent_yield', {}).items():
+            lines.append(f"Percent yield of {species}: {percent:.2f}%")
+        return lines
+
+    def _instant_reaction_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        match = _INSTANT_BALANCE.match(query)
+        if match is not None and _REACTION.fullmatch(match.group('reaction')):
+            result = self.stoichiometry.balance_equation(match.group('reaction'))
+            if result['success']:
+                return {
+                    'answer': f"The balanced equation is {result['equation']}.",
+                    'tools_used': ["Equation Balancer"],
+                    'tool_only': True
+                }
+            return None
+        if not _STOICHIOMETRY_QUESTION.search(query):
+            return None
+        result = self._solve_reaction(query)
+        if result is None or 'quantities' not in result:
+            return None
+        return {
+            'answer': "\n".join(self._describe_reaction(result)),
+            'tools_used': ["Equation Balancer", "Stoichiometry Solver"],
+            'tool_only': True
+        }
+
+    def instant_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """Answer single element-property lookups, single-formula molar masses,
+        equation balancing and complete stoichiometry problems without the LLM"""
+        groups = detectors.scan(query).get('chemistry.instant_element')
+        if groups is None:
+            return self._instant_calculation_answer(query) or self._instant_reaction_answer(query)
+        element = self._as_written(query, groups['element'])
+        if element is None:
+            return None
+        element = self.periodic_table.get_element(element)
+        field, label, unit = _INSTANT_PROPERTIES[' '.join(groups['property'].split())]
+        return {
+            'answer': f"The {label} of {element.name} ({element.symbol}) is {getattr(element, field)}{unit}.",
+            'tools_used': ["Periodic Table"],
+            'tool_only': True
+        }
+
+    def _prepare(self, query: str) -> Tuple[PromptBuilder, List[str]]:
+        """Run the tools and collect their output as prompt context"""
         tools_used = []
-        element_info = ""
-        calculation_info = ""
+        prompt = PromptBuilder(PROMPT, query=query)
 
         if self._needs_periodic_table(query):
             element = self._extract_element(query)
             if element:
-                info = self.periodic_table.get_element_info(element)
+                # by name, else by symbol as written or atomic number
+                with tool_call("Periodic Table") as call:
+                    info = self.periodic_table.get_element_info(element)
+                    if info is None:
+                        found = self.periodic_table.get_element(element)
+                        info = found.info if found is not None else None
+                    call.hit = bool(info)
                 if info:
-                    element_info = f"Element Information:\n{info}"
+                    # one item per property, so the long description is dropped first when space is short
+                    prompt.add("Element Information", info.splitlines(), relevance=0.9)
                     tools_used.append("Periodic Table")
                 else:
-                    # Try by symbol if name didn't work
-                    symbol_info = self.periodic_table.get_element_by_symbol(element)
-                    if symbol_info:
-                        element_info = f"Element found by symbol: {element}"
-                        tools_used.append("Periodic Table")
-                    else:
-                        element_info = f"Element '{element}' not found in database"
+                    prompt.add("Element Information", f"'{element}' not found in database", relevance=0.5)
 
         if self._needs_chemical_calculation(query):
-            calculation_info = "Chemical calculations will be provided."
+            with tool_call("Equation Balancer") as call:
+                reaction = self._solve_reaction(query)
+                call.hit = bool(reaction)
+            if reaction:
+                prompt.add("Reaction (balanced and computed locally)", [
+                    (1.0, line) for line in self._describe_reaction(reaction)
+                ])
+                tools_used.append("Equation Balancer")
+                if 'quantities' in reaction:
+                    tools_used.append("Stoichiometry Solver")
+            else:
+                with tool_call("Chemical Formula Calculator") as call:
+                    results = self._calculate_formulas(query)
+                    call.hit = bool(results)
+                if results:
+                    prompt.add("Chemical Calculations (atomic masses from the periodic table)", [
+                        (1.0, self._describe_formula(result)) for result in results
+                    ])
+                    tools_used.append("Chemical Formula Calculator")
 
-        prompt = f"""
-        You are a chemistry tutor. A student asked: "{query}"
+        return prompt, tools_used
 
-        {element_info}
-        {calculation_info}
+    def _build_prompt(self, query: str) -> Tuple[str, List[str]]:
+        with stage_seconds.time('tools'):
+            prompt, tools_used = self._prepare(query)
+        return prompt.build(), tools_used
 
-        Provide a response that:
-        1. Explains the chemistry concept clearly
-        2. Uses the provided element information if relevant
-        3. Shows chemical equations and calculations if needed
-        4. Includes molecular structures or diagrams when helpful
-        5. Is educational and engaging
-        """
-        
-        response = self.client.models.generate_content(
-            model='gemini-2.0-flash-001',
-            contents=prompt
-        )
-        return {'answer': response.text, 'tools_used': tools_used}
\ No newline at end of file
+    def tool_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """The tools' results on their own, for when there is no time left to generate an answer"""
+        instant = self.instant_answer(query)
+        if instant is not None:
+            return instant
+        prompt, tools_used = self._prepare(query)
+        context = prompt.context()
+        if not context:
+            return None
+        return {'answer': context, 'tools_used': tools_used, 'tool_only': True}
+
+    async def handle_query(self, query: str) -> Dict[str, Any]:
+        prompt, tools_used = self._build_prompt(query)
+        answer = await self.llm.generate(prompt)
+        return {'answer': answer, 'tools_used': tools_used}
+
+    def stream_query(self, query: str) -> Tuple[List[str], AsyncIterator[str]]:
+        """Run the tools now and return them with an iterator over the streamed answer text"""
+        prompt, tools_used = self._build_prompt(query)
+        return tools_used, self.llm.stream(prompt)
\ No newline at end of file
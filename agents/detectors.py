@@ -0,0 +1,112 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_NAMED_GROUP = re.compile(r'\(\?P<(\w+)>')
+
+
+class Detections:
+    """Result of one scan: which detectors fired and what their patterns captured"""
+
+    __slots__ = ('_hits',)
+
+    def __init__(self, hits: Dict[str, Dict[str, Optional[str]]]):
+        self._hits = hits
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._hits
+
+    def get(self, name: str) -> Optional[Dict[str, Optional[str]]]:
+        """Captured named groups of the detector's first match, or None if it did not fire"""
+        return self._hits.get(name)
+
+    def first(self, names: Iterable[str]) -> Tuple[Optional[str], Optional[Dict[str, Optional[str]]]]:
+        """The first detector in ``names`` that fired, with its groups"""
+        for name in names:
+            groups = self._hits.get(name)
+            if groups is not None:
+                return name, groups
+        return None, None
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._hits)
+
+    def __repr__(self) -> str:
+        return f"Detections({self._hits!r})"
+
+
+class DetectorEngine:
+    """Compile every agent's pattern lists once and scan a question in one call.
+
+    Each detector is a list of alternative patterns. At first use the engine
+    joins each detector's patterns into a single alternation and compiles it,
+    so a scan is one ``search`` per detector instead of one per pattern, on a
+    text lowercased once. Within a detector the leftmost match wins, which is
+    exactly ``any(re.search(p) for p in ...)`` for detection. Named groups in
+    the patterns are captured, so extraction reuses the same match instead of
+    searching again. A detector registered with ``requires`` only runs when
+    that (earlier registered) detector fired, which keeps extractors off
+    questions they can never apply to.
+    """
+
+    def __init__(self):
+        self._detectors: Dict[str, Tuple[List[str], Optional[str]]] = {}
+        self._compiled: Optional[List[Tuple[str, Optional[str], re.Pattern, List[Tuple[str, str]]]]] = None
+
+    def register(self, name: str, patterns: Iterable[str], requires: Optional[str] = None) -> None:
+        if requires is not None and requires not in self._detectors:
+            raise ValueError(f"Detector '{name}' requires unknown detector '{requires}'")
+        self._detectors[name] = (list(patterns), requires)
+        self._compiled = None
+        self.scan.cache_clear()
+
+    def _compile(self) -> List[Tuple[str, Optional[str], re.Pattern, List[Tuple[str, str]]]]:
+        compiled = []
+        for name, (patterns, requires) in self._detectors.items():
+            captures: List[Tuple[str, str]] = []
+
+            def rename(match: re.Match) -> str:
+                # group names must be unique within the alternation, even when
+                # two alternatives of one detector capture the same field
+                group = f"g{len(captures)}"
+                captures.append((group, match.group(1)))
+                return f"(?P<{group}>"
+
+            alternation = "|".join(f"(?:{_NAMED_GROUP.sub(rename, pattern)})" for pattern in patterns)
+            compiled.append((name, requires, re.compile(alternation), captures))
+        return compiled
+
+    def _match(self, text: str) -> Dict[str, Dict[str, Optional[str]]]:
+        if self._compiled is None:
+            self._compiled = self._compile()
+        hits: Dict[str, Dict[str, Optional[str]]] = {}
+        for name, requires, regex, captures in self._compiled:
+            if requires is not None and requires not in hits:
+                continue
+            match = regex.search(text)
+            if match is None:
+                continue
+            groups: Dict[str, Optional[str]] = {}
+            for group, short in captures:
+                value = match.group(group)
+                if value is not None or short not in groups:
+                    groups[short] = value
+            hits[name] = groups
+        return hits
+
+    def scan_uncached(self, text: str) -> Detections:
+        return Detections(self._match(text.lower()))
+
+    @lru_cache(maxsize=512)
+    def scan(self, text: str) -> Detections:
+        """Scan ``text`` (lowercased) against every registered detector.
+
+        Results are memoized so an agent's detection and extraction steps, and
+        the tutor's routing step, share one scan of the same question.
+        """
+        return self.scan_uncached(text)
+
+
+# shared by every agent; each agent module registers its detectors at import time
+engine = DetectorEngine()
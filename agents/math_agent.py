@@ -1,136 +1,193 @@
-from google import genai
 import re
+from llm.client import LLMClient
 from tools.calculator_tool import CalculatorTool
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple, List, AsyncIterator
+from core.metrics import stage_seconds, tool_call
+from .detectors import engine as detectors
+from .prompt_builder import PromptBuilder, PromptTemplate
+
+CALCULATION_PATTERNS = [
+    # Basic arithmetic
+    r'\d+\s*[\+\-\*×÷\/]\s*\d+',
+    r'\d+\s*plus\s*\d+',
+    r'\d+\s*minus\s*\d+',
+    r'\d+\s*times\s*\d+',
+    r'\d+\s*divided\s+by\s*\d+',
+
+    # Keywords
+    r'calculate\s+\d',
+    r'compute\s+\d',
+    r'what\s+is\s+\d+',
+    r'solve\s+\d',
+    r'find\s+\d+',
+    r'evaluate\s+\d',
+
+    # Advanced operations
+    r'to\s+the\s+power\s+of',
+    r'raised\s+to\s+\d+',
+    r'\d+\s*\^+\s*\d+',
+    r'square\s+root\s+of\s+\d+',
+    r'sqrt\s*\(\s*\d+',
+    r'\d+\s*squared',
+    r'\d+\s*cubed',
+
+    # Mathematical functions
+    r'sin\s*\(\s*\d+',
+    r'cos\s*\(\s*\d+',
+    r'tan\s*\(\s*\d+',
+    r'log\s*\(\s*\d+',
+
+    # Fractions and decimals
+    r'\d+\.\d+\s*[\+\-\*\/]\s*\d+',
+    r'\d+\s*\/\s*\d+\s*[\+\-\*\/]',
+
+    # Word problems with numbers
+    r'how\s+much\s+is\s+\d+',
+    r'what\s+equals\s+\d+',
+    r'result\s+of\s+\d+',
+    r'answer\s+to\s+\d+',
+
+    # Percentage calculations
+    r'\d+\s*percent\s+of\s+\d+',
+    r'\d+%\s+of\s+\d+',
+    r'percentage\s+of\s+\d+',
+]
+
+_NUMBER = r'\d+(?:\.\d+)?'
+
+# Extraction detectors, tried in this order by _extract_calculation
+EXTRACTION_PATTERNS = {
+    'math.percent': [rf'(?P<percentage>{_NUMBER})\s*(?:percent|%)\s+of\s+(?P<number>{_NUMBER})'],
+    'math.sqrt': [rf'square\s+root\s+of\s+(?P<radicand>{_NUMBER})'],
+    'math.squared': [rf'(?P<base>{_NUMBER})\s*squared'],
+    'math.cubed': [rf'(?P<base>{_NUMBER})\s*cubed'],
+    'math.arithmetic': [
+        rf'(?P<left>{_NUMBER})\s*(?P<op>[\+\-\*×÷\/]|plus|minus|times|multiplied by|divided by)\s*(?P<right>{_NUMBER})'
+    ],
+    'math.power': [rf'(?P<base>{_NUMBER})\s*(?:\*\*|\^|to the power of|raised to)\s*(?P<exponent>{_NUMBER})'],
+    'math.expression': [r'(?:calculate|solve|compute|evaluate|what is|find)\s+(?P<expression>[^?]+)'],
+}
+
+_WORD_OPS = {
+    'plus': '+', 'minus': '-', 'times': '*', 'multiplied by': '*',
+    'divided by': '/', '×': '*', '÷': '/'
+}
+
+_OPERATOR = r'(?:\*\*|[\+\-\*×÷\/\^]|plus|minus|times|multiplied\s+by|divided\s+by|to\s+the\s+power\s+of)'
+
+# Whole-question pattern for instant answers: nothing but arithmetic on numbers
+INSTANT_PATTERNS = [
+    rf'^\s*(?:(?:what\s+is|what\'s|how\s+much\s+is|calculate|compute|evaluate)\s+)?'
+    rf'(?P<expression>{_NUMBER}(?:\s*{_OPERATOR}\s*{_NUMBER})+)\s*[?=.]?\s*$'
+]
+_INSTANT_OPS = [
+    (re.compile(r'to\s+the\s+power\s+of|\^'), '**'),
+    (re.compile(r'multiplied\s+by|times|×'), '*'),
+    (re.compile(r'divided\s+by|÷'), '/'),
+    (re.compile(r'plus'), '+'),
+    (re.compile(r'minus'), '-'),
+]
+
+PROMPT = PromptTemplate('math', """
+    You are a mathematics tutor. A student asked: "{query}"
+
+    {context}
+
+    Provide a response that:
+    1. Shows step-by-step solution
+    2. Explains the mathematical concept
+    3. Includes the final answer
+    4. Is educational and clear
+""")
+
+detectors.register('math.calculation', CALCULATION_PATTERNS)
+detectors.register('math.instant', INSTANT_PATTERNS)
+for _name, _patterns in EXTRACTION_PATTERNS.items():
+    detectors.register(_name, _patterns, requires='math.calculation')
+
 
 class MathAgent:
-    def __init__(self, client: genai.Client):
-        self.client = client
+    def __init__(self, llm: LLMClient):
+        self.llm = llm
         self.calculator = CalculatorTool()
 
     def _needs_calculation(self, query: str) -> bool:
-        calculation_patterns = [
-            # Basic arithmetic
-            r'\d+\s*[\+\-\*×÷\/]\s*\d+',
-            r'\d+\s*plus\s*\d+',
-            r'\d+\s*minus\s*\d+',
-            r'\d+\s*times\s*\d+',
-            r'\d+\s*divided\s+by\s*\d+',
-            
-            # Keywords
-            r'calculate\s+\d',
-            r'compute\s+\d',
-            r'what\s+is\s+\d+',
-            r'solve\s+\d',
-            r'find\s+\d+',
-            r'evaluate\s+\d',
-            
-            # Advanced operations
-            r'to\s+the\s+power\s+of',
-            r'raised\s+to\s+\d+',
-            r'\d+\s*\^+\s*\d+',
-            r'square\s+root\s+of\s+\d+',
-            r'sqrt\s*\(\s*\d+',
-            r'\d+\s*squared',
-            r'\d+\s*cubed',
-            
-            # Mathematical functions
-            r'sin\s*\(\s*\d+',
-            r'cos\s*\(\s*\d+',
-            r'tan\s*\(\s*\d+',
-            r'log\s*\(\s*\d+',
-            
-            # Fractions and decimals
-            r'\d+\.\d+\s*[\+\-\*\/]\s*\d+',
-            r'\d+\s*\/\s*\d+\s*[\+\-\*\/]',
-            
-            # Word problems with numbers
-            r'how\s+much\s+is\s+\d+',
-            r'what\s+equals\s+\d+',
-            r'result\s+of\s+\d+',
-            r'answer\s+to\s+\d+',
-            
-            # Percentage calculations
-            r'\d+\s*percent\s+of\s+\d+',
-            r'\d+%\s+of\s+\d+',
-            r'percentage\s+of\s+\d+',
-        ]
-        return any(re.search(pattern, query.lower()) for pattern in calculation_patterns)
+        return 'math.calculation' in detectors.scan(query)
 
     def _extract_calculation(self, query: str) -> str:
-        query_lower = query.lower()
-        
-        # Handle percentage calculations
-        percent_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:percent|%)\s+of\s+(\d+(?:\.\d+)?)', query_lower)
-        if percent_match:
-            percentage, number = percent_match.groups()
-            return f"({percentage} / 100) * {number}"
-        
-        # Handle square root
-        sqrt_match = re.search(r'square\s+root\s+of\s+(\d+(?:\.\d+)?)', query_lower)
-        if sqrt_match:
-            return f"sqrt({sqrt_match.group(1)})"
-        
-        # Handle squared/cubed
-        squared_match = re.search(r'(\d+(?:\.\d+)?)\s*squared', query_lower)
-        if squared_match:
-            return f"{squared_match.group(1)} ** 2"
-        
-        cubed_match = re.search(r'(\d+(?:\.\d+)?)\s*cubed', query_lower)
-        if cubed_match:
-            return f"{cubed_match.group(1)} ** 3"
-        
-        # Handle basic arithmetic with words
-        word_ops = {
-            'plus': '+', 'minus': '-', 'times': '*', 'multiplied by': '*',
-            'divided by': '/', 'to the power of': '**', 'raised to': '**'
+        name, groups = detectors.scan(query).first(EXTRACTION_PATTERNS)
+
+        if name == 'math.percent':
+            return f"({groups['percentage']} / 100) * {groups['number']}"
+        if name == 'math.sqrt':
+            return f"sqrt({groups['radicand']})"
+        if name == 'math.squared':
+            return f"{groups['base']} ** 2"
+        if name == 'math.cubed':
+            return f"{groups['base']} ** 3"
+        if name == 'math.arithmetic':
+            return f"{groups['left']} {_WORD_OPS.get(groups['op'], groups['op'])} {groups['right']}"
+        if name == 'math.power':
+            return f"{groups['base']} ** {groups['exponent']}"
+        if name == 'math.expression':
+            return groups['expression'].strip()
+        return query
+
+    def instant_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """Answer pure arithmetic questions straight from the calculator, without the LLM"""
+        groups = detectors.scan(query).get('math.instant')
+        if groups is None:
+            return None
+        expression = groups['expression']
+        for pattern, symbol in _INSTANT_OPS:
+            expression = pattern.sub(symbol, expression)
+        calc_result = self.calculator.calculate(expression)
+        if not calc_result['success']:
+            return None
+        return {
+            'answer': f"{calc_result['expression']} = {calc_result['formatted_result']}",
+            'tools_used': ["Calculator"],
+            'tool_only': True
         }
-        
-        for word_op, symbol in word_ops.items():
-            if word_op in query_lower:
-                query = query.replace(word_op, symbol)
-        
-        # Handle basic arithmetic
-        match = re.search(r'(\d+(?:\.\d+)?)\s*([\+\-\*×÷\/])\s*(\d+(?:\.\d+)?)', query)
-        if match:
-            num1, op, num2 = match.groups()
-            op = op.replace('×', '*').replace('÷', '/')
-            return f"{num1} {op} {num2}"
-
-        # Handle exponentiation
-        power_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:\*\*|\^)\s*(\d+(?:\.\d+)?)', query)
-        if power_match:
-            base, exponent = power_match.groups()
-            return f"{base} ** {exponent}"
-
-        # Fallback for other calculations
-        calc_match = re.search(r'(?:calculate|solve|compute|evaluate|what is|find)\s+([^?]+)', query_lower)
-        return calc_match.group(1).strip() if calc_match else query
 
-    async def handle_query(self, query: str) -> Dict[str, Any]:
+    def _prepare(self, query: str) -> Tuple[PromptBuilder, List[str]]:
+        """Run the tools and collect their output as prompt context"""
         tools_used = []
-        calc_info = ""
+        prompt = PromptBuilder(PROMPT, query=query)
 
         if self._needs_calculation(query):
             tools_used.append("Calculator")
-            expression = self._extract_calculation(query)
-            calc_result = self.calculator.calculate(expression)
+            with tool_call("Calculator") as call:
+                expression = self._extract_calculation(query)
+                calc_result = self.calculator.calculate(expression)
+                call.hit = calc_result['success']
             if calc_result['success']:
-                calc_info = f"Calculation result: {calc_result['result']}"
-
-        prompt = f"""
-        You are a mathematics tutor. A student asked: "{query}"
-
-        {calc_info}
-
-        Provide a response that:
-        1. Shows step-by-step solution
-        2. Explains the mathematical concept
-        3. Includes the final answer
-        4. Is educational and clear
-        """
-        response = self.client.models.generate_content(
-            model='gemini-2.0-flash-001',
-            contents=prompt
-        )
-        return {'answer': response.text, 'tools_used': tools_used}
\ No newline at end of file
+                prompt.add("Calculation result", str(calc_result['result']))
+
+        return prompt, tools_used
+
+    def _build_prompt(self, query: str) -> Tuple[str, List[str]]:
+        with stage_seconds.time('tools'):
+            prompt, tools_used = self._prepare(query)
+        return prompt.build(), tools_used
+
+    def tool_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """The tools' results on their own, for when there is no time left to generate an answer"""
+        instant = self.instant_answer(query)
+        if instant is not None:
+            return instant
+        prompt, tools_used = self._prepare(query)
+        context = prompt.context()
+        if not context:
+            return None
+        return {'answer': context, 'tools_used': tools_used, 'tool_only': True}
+
+    async def handle_query(self, query: str) -> Dict[str, Any]:
+        prompt, tools_used = self._build_prompt(query)
+        answer = await self.llm.generate(prompt)
+        return {'answer': answer, 'tools_used': tools_used}
+
+    def stream_query(self, query: str) -> Tuple[List[str], AsyncIterator[str]]:
+        """Run the tools now and return them with an iterator over the streamed answer text"""
+        prompt, tools_used = self._build_prompt(query)
+        return tools_used, self.llm.stream(prompt)
\ No newline at end of file
@@ -1,38 +1,145 @@
-from google import genai
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple, List, AsyncIterator
 import re
+from llm.client import LLMClient
+from core.metrics import stage_seconds, tool_call
 from tools.physics_constants_tool import PhysicsConstantsTool
 from tools.unit_converter_tool import UnitConverterTool
 from tools.physics_formula_tool import PhysicsFormulaTool
+from tools.units import registry as units
+from .detectors import engine as detectors
+from .prompt_builder import PromptBuilder, PromptTemplate
+
+CONSTANT_KEYWORDS = [
+    # Speed of light variations
+    'speed of light', 'light speed', 'velocity of light', 'c =', 'c value',
+
+    # Gravitational constant variations
+    'gravitational constant', 'gravity constant', 'universal gravity',
+    'g =', 'G =', 'big g', 'newton gravity',
+
+    # Other constants
+    'planck', 'boltzmann', 'avogadro', 'stefan boltzmann',
+    'electron mass', 'proton mass', 'neutron mass',
+    'elementary charge', ' permittivity', 'permeability',
+    'gas constant', 'fine structure', 'vacuum',
+
+    # General constant queries
+    'physical constant', 'physics constant', 'fundamental constant',
+    'what is the value of', 'value of constant',
+    'constant equals', 'constant is'
+]
+
+UNIT_CONVERSION_PATTERNS = [
+    # Direct conversion requests
+    r'convert\s+\d+(?:\.\d+)?\s*\w+\s+to\s+\w+',
+    r'\d+(?:\.\d+)?\s*\w+\s+in\s+\w+',
+    r'\d+(?:\.\d+)?\s*\w+\s+to\s+\w+',
+    r'how many\s+\w+\s+in\s+\d+(?:\.\d+)?\s*\w+',
+
+    # Temperature conversions
+    r'\d+(?:\.\d+)?\s*(?:degrees?\s*)?(?:celsius|fahrenheit|kelvin)',
+    r'convert.*temperature',
+    r'celsius to fahrenheit',
+    r'fahrenheit to celsius',
+
+    # Length conversions
+    r'\d+(?:\.\d+)?\s*(?:meter|metre|kilometer|centimeter|millimeter|inch|foot|feet|yard|mile)',
+    r'convert.*(?:length|distance)',
+
+    # Speed conversions
+    r'\d+(?:\.\d+)?\s*(?:m/s|km/h|mph|ft/s)',
+    r'convert.*speed',
+    r'convert.*velocity',
+
+    # Mass conversions
+    r'\d+(?:\.\d+)?\s*(?:kg|gram|pound|ounce)',
+    r'convert.*(?:mass|weight)',
+
+    # Time conversions
+    r'\d+(?:\.\d+)?\s*(?:second|minute|hour|day)',
+    r'convert.*time',
+
+    # Energy conversions
+    r'\d+(?:\.\d+)?\s*(?:joule|calorie|watt|kwh)',
+    r'convert.*energy'
+]
+
+FORMULA_KEYWORDS = [
+    'force equals', 'f = ma', 'newton second law',
+    'kinetic energy', 'ke =', 'potential energy', 'pe =',
+    'momentum', 'p = mv', 'impulse',
+    'work done', 'w = fd', 'power', 'p = w/t',
+    'frequency', 'wavelength', 'wave equation',
+    'ohm law', 'v = ir', 'resistance',
+    'acceleration', 'velocity', 'displacement',
+    'gravity formula', 'gravitational force'
+]
+
+_NUMBER = r'\d+(?:\.\d+)?'
+
+# Extraction detectors, tried in this order by _extract_conversion
+CONVERSION_EXTRACTORS = {
+    'physics.convert': [rf'convert\s+(?P<value>{_NUMBER})\s*(?P<from_unit>\w+)\s+to\s+(?P<to_unit>\w+)'],
+    'physics.value_in': [rf'(?P<value>{_NUMBER})\s*(?P<from_unit>\w+)\s+in\s+(?P<to_unit>\w+)'],
+    'physics.value_to': [rf'(?P<value>{_NUMBER})\s*(?P<from_unit>\w+)\s+to\s+(?P<to_unit>\w+)'],
+    'physics.how_many': [rf'how many\s+(?P<to_unit>\w+)\s+in\s+(?P<value>{_NUMBER})\s*(?P<from_unit>\w+)'],
+}
+
+# Whole-question pattern for instant answers: a bare unit conversion
+INSTANT_PATTERNS = [
+    rf'^\s*(?:convert\s+)?(?P<value>-?{_NUMBER})\s*(?P<from_unit>[a-z/]+)\s+(?:to|in|into)\s+(?P<to_unit>[a-z/]+)\s*\??\s*$',
+    rf'^\s*how many\s+(?P<to_unit>[a-z/]+)\s+(?:are\s+)?in\s+(?P<value>-?{_NUMBER})\s*(?P<from_unit>[a-z/]+)\s*\??\s*$',
+]
+
+# A number with a unit ("2 kg", "3 m/s", "9.8 m/s^2"), matched on the original text
+_UNIT_TERM = r'[a-zA-Zµ°Ω]+(?:\^-?\d+|[²³])?'
+_QUANTITY = re.compile(
+    rf'(?<![\w.])(?P<value>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*(?P<unit>{_UNIT_TERM}(?:\s*[/*·]\s*{_UNIT_TERM})*)'
+)
+_NUMBERS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?')
+
+# The quantity a question asks for: "what is its kinetic energy", "find the force on ..."
+_ASKED = re.compile(
+    r"\b(?:what(?:'s|\s+is|\s+are|\s+was|\s+will\s+be)|find|calculate|compute|determine|solve\s+for)\s+"
+    r"(?:the\s+|its\s+|their\s+|an?\s+)?(?P<quantity>[a-z][a-z ]*?)"
+    r"(?=\s+(?:of|on|for|if|when|with|in|at|from|that|does|do|is|needed|required|given)\b|\s*[?.,!]|\s*$)",
+    re.IGNORECASE,
+)
+_HOW = re.compile(r'\bhow\s+(?P<how>fast|far|high|long|heavy|strong|much\s+\w+)', re.IGNORECASE)
+_HOW_QUANTITIES = {'fast': 'velocity', 'far': 'distance', 'high': 'height', 'long': 'time', 'heavy': 'mass',
+                   'strong': 'force'}
+_QUANTITY_SYNONYMS = {'speed': 'velocity', 'weight': 'force', 'ke': 'kinetic energy', 'pe': 'potential energy'}
+
+PROMPT = PromptTemplate('physics', """
+    You are a physics tutor. A student asked: "{query}"
+
+    {context}
+
+    Provide a response that:
+    1. Explains the physics concept clearly
+    2. Uses the provided constants and conversions
+    3. Shows step-by-step calculations if needed
+    4. Includes relevant formulas
+    5. Is educational and comprehensive
+""")
+
+detectors.register('physics.constants', [re.escape(keyword) for keyword in CONSTANT_KEYWORDS])
+detectors.register('physics.unit_conversion', UNIT_CONVERSION_PATTERNS)
+detectors.register('physics.instant_conversion', INSTANT_PATTERNS)
+detectors.register('physics.formula', [re.escape(keyword) for keyword in FORMULA_KEYWORDS])
+for _name, _patterns in CONVERSION_EXTRACTORS.items():
+    detectors.register(_name, _patterns, requires='physics.unit_conversion')
+
 
 class PhysicsAgent:
-    def __init__(self, client: genai.Client):
-        self.client = client
+    def __init__(self, llm: LLMClient):
+        self.llm = llm
         self.constants_tool = PhysicsConstantsTool()
         self.unit_converter = UnitConverterTool()
         self.formula_tool = PhysicsFormulaTool()
 
     def _needs_constants(self, query: str) -> bool:
-        constant_keywords = [
-            # Speed of light variations
-            'speed of light', 'light speed', 'velocity of light', 'c =', 'c value',
-            
-            # Gravitational constant variations
-            'gravitational constant', 'gravity constant', 'universal gravity',
-            'g =', 'G =', 'big g', 'newton gravity',
-            
-            # Other constants
-            'planck', 'boltzmann', 'avogadro', 'stefan boltzmann',
-            'electron mass', 'proton mass', 'neutron mass',
-            'elementary charge', ' permittivity', 'permeability',
-            'gas constant', 'fine structure', 'vacuum',
-            
-            # General constant queries
-            'physical constant', 'physics constant', 'fundamental constant',
-            'what is the value of', 'value of constant',
-            'constant equals', 'constant is'
-        ]
-        return any(keyword in query.lower() for keyword in constant_keywords)
+        return 'physics.constants' in detectors.scan(query)
 
     def _identify_constants_needed(self, query: str) -> list:
         constant_mapping = {
@@ -69,136 +176,199 @@ class PhysicsAgent:
         return list(set(found_constants))  # Remove duplicates
 
     def _needs_unit_conversion(self, query: str) -> bool:
-        patterns = [
-            # Direct conversion requests
-            r'convert\s+\d+(?:\.\d+)?\s*\w+\s+to\s+\w+',
-            r'\d+(?:\.\d+)?\s*\w+\s+in\s+\w+',
-            r'\d+(?:\.\d+)?\s*\w+\s+to\s+\w+',
-            r'how many\s+\w+\s+in\s+\d+(?:\.\d+)?\s*\w+',
-            
-            # Temperature conversions
-            r'\d+(?:\.\d+)?\s*(?:degrees?\s*)?(?:celsius|fahrenheit|kelvin)',
-            r'convert.*temperature',
-            r'celsius to fahrenheit',
-            r'fahrenheit to celsius',
-            
-            # Length conversions
-            r'\d+(?:\.\d+)?\s*(?:meter|metre|kilometer|centimeter|millimeter|inch|foot|feet|yard|mile)',
-            r'convert.*(?:length|distance)',
-            
-            # Speed conversions
-            r'\d+(?:\.\d+)?\s*(?:m/s|km/h|mph|ft/s)',
-            r'convert.*speed',
-            r'convert.*velocity',
-            
-            # Mass conversions
-            r'\d+(?:\.\d+)?\s*(?:kg|gram|pound|ounce)',
-            r'convert.*(?:mass|weight)',
-            
-            # Time conversions
-            r'\d+(?:\.\d+)?\s*(?:second|minute|hour|day)',
-            r'convert.*time',
-            
-            # Energy conversions
-            r'\d+(?:\.\d+)?\s*(?:joule|calorie|watt|kwh)',
-            r'convert.*energy'
-        ]
-        return any(re.search(pattern, query.lower()) for pattern in patterns)
+        return 'physics.unit_conversion' in detectors.scan(query)
 
     def _extract_conversion(self, query: str) -> tuple:
-        # Try different patterns for extraction
-        patterns = [
-            r'convert\s+(\d+(?:\.\d+)?)\s*(\w+)\s+to\s+(\w+)',
-            r'(\d+(?:\.\d+)?)\s*(\w+)\s+in\s+(\w+)',
-            r'(\d+(?:\.\d+)?)\s*(\w+)\s+to\s+(\w+)',
-            r'how many\s+(\w+)\s+in\s+(\d+(?:\.\d+)?)\s*(\w+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query.lower())
-            if match:
-                groups = match.groups()
-                if len(groups) == 3:
-                    try:
-                        value = float(groups[0])
-                        return value, groups[1], groups[2]
-                    except (ValueError, IndexError):
-                        continue
-        
-        return None, None, None
+        name, groups = detectors.scan(query).first(CONVERSION_EXTRACTORS)
+        if name is None:
+            return None, None, None
+        return float(groups['value']), groups['from_unit'], groups['to_unit']
 
     def _needs_physics_formula(self, query: str) -> bool:
-        formula_keywords = [
-            'force equals', 'f = ma', 'newton second law',
-            'kinetic energy', 'ke =', 'potential energy', 'pe =',
-            'momentum', 'p = mv', 'impulse',
-            'work done', 'w = fd', 'power', 'p = w/t',
-            'frequency', 'wavelength', 'wave equation',
-            'ohm law', 'v = ir', 'resistance',
-            'acceleration', 'velocity', 'displacement',
-            'gravity formula', 'gravitational force'
-        ]
-        return any(keyword in query.lower() for keyword in formula_keywords)
+        return 'physics.formula' in detectors.scan(query)
 
-    async def handle_query(self, query: str) -> Dict[str, Any]:
+    def _extract_quantities(self, query: str) -> List[Tuple[float, str]]:
+        quantities = []
+        for match in _QUANTITY.finditer(query):
+            unit = match.group('unit')
+            if units.parse(unit) is None:
+                # "2 kg ball": keep only the leading unit word
+                unit = re.match(_UNIT_TERM, unit).group(0)
+                if units.parse(unit) is None:
+                    continue
+            quantities.append((float(match.group('value')), unit))
+        return quantities
+
+    @staticmethod
+    def _asked_quantities(query: str) -> List[str]:
+        asked = [match.group('quantity').lower() for match in _ASKED.finditer(query)]
+        for match in _HOW.finditer(query):
+            how = match.group('how').lower()
+            asked.append(how.split()[-1] if how.startswith('much') else _HOW_QUANTITIES[how])
+        return [' '.join(_QUANTITY_SYNONYMS.get(word, word) for word in phrase.split()) for phrase in asked]
+
+    def _is_asked(self, query: str, formula_name: str, variable: str) -> bool:
+        """Whether the question asks for ``variable``, by its symbol or the name in the formula's description"""
+        description = self.formula_tool.formulas[formula_name]['variables'].get(variable, '')
+        name = description.split('(')[0].strip().lower()
+        for phrase in self._asked_quantities(query):
+            if phrase == variable.lower() or (name and (name in phrase or phrase in name)):
+                return True
+        return False
+
+    def _solve_formula(self, query: str, formula_names: List[str]) -> Optional[Dict[str, Any]]:
+        """Solve a matching formula whose one unknown is fixed by the quantities in the question.
+
+        A formula solved for the quantity the question asks for is preferred;
+        otherwise the first solvable one is returned with ``asked`` false.
+        """
+        quantities = self._extract_quantities(query)
+        if not quantities:
+            return None
+        fallback = None
+        for name in formula_names:
+            formula = self.formula_tool.compiled.get(name)
+            if formula is None:
+                continue
+            # give each quantity to the first free variable of the same dimension
+            values: Dict[str, Tuple[float, str]] = {}
+            for value, unit in quantities:
+                dimension = units.parse(unit).dimension
+                for variable in formula.variables:
+                    if variable not in values and formula.dimension(variable) == dimension:
+                        values[variable] = (value, unit)
+                        break
+            unknown = [v for v in formula.variables if v not in values and v not in formula.defaults]
+            if len(unknown) != 1:
+                continue
+            solution = formula.solve(unknown[0], values)
+            if solution['success']:
+                solution['formula_name'] = name
+                solution['inputs'] = values
+                # every number in the question went into the formula
+                solution['complete'] = len(values) == len(_NUMBERS.findall(query))
+                # and what came out is what the question wants
+                solution['asked'] = self._is_asked(query, name, unknown[0])
+                if solution['asked']:
+                    return solution
+                fallback = fallback or solution
+        return fallback
+
+    @staticmethod
+    def _describe_solution(solution: Dict[str, Any]) -> str:
+        inputs = ', '.join(f"{name} = {value:g} {unit}" for name, (value, unit) in solution['inputs'].items())
+        return (f"{solution['target']} = {solution['result']:.6g} {solution['unit']} "
+                f"(from {solution['solved_expression']} with {inputs})")
+
+    def instant_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """Answer bare unit conversions and formula plug-ins straight from the tools, without the LLM"""
+        groups = detectors.scan(query).get('physics.instant_conversion')
+        if groups is None:
+            return self._instant_formula_answer(query)
+        value = float(groups['value'])
+        result = self.unit_converter.convert(value, groups['from_unit'], groups['to_unit'])
+        if result is None:
+            return None
+        return {
+            'answer': f"{value:g} {groups['from_unit']} = {result:.6g} {groups['to_unit']}",
+            'tools_used': ["Unit Converter"],
+            'tool_only': True
+        }
+
+    def _instant_formula_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """Answer a plug-in-the-numbers formula question from the solver, without the LLM"""
+        if not self._needs_physics_formula(query):
+            return None
+        solution = self._solve_formula(query, list(self.formula_tool.search_formulas(query)))
+        if solution is None or not solution['complete'] or not solution['asked']:
+            return None
+        return {
+            'answer': self._describe_solution(solution),
+            'tools_used': ["Physics Formulas", "Formula Solver"],
+            'tool_only': True
+        }
+
+    def _prepare(self, query: str) -> Tuple[PromptBuilder, List[str]]:
+        """Run the tools and collect their output as prompt context"""
         tools_used = []
-        constants_info = ""
-        conversion_info = ""
-        formula_info = ""
+        prompt = PromptBuilder(PROMPT, query=query)
 
         # Check for constants
         if self._needs_constants(query):
-            needed_constants = self._identify_constants_needed(query)
-            if needed_constants:
-                constants_data = {}
-                for const_key in needed_constants:
-                    const_data = self.constants_tool.get_constant(const_key)
-                    if const_data:
-                        constants_data[const_key] = const_data
-                
-                if constants_data:
-                    constants_info = "Physical Constants:\n" + "\n".join(
-                        f"- {data['name']}: {data['value']} {data['unit']}" 
-                        for data in constants_data.values()
-                    )
-                    tools_used.append("Physics Constants")
+            with tool_call("Physics Constants") as call:
+                constants_data = [
+                    data for data in map(self.constants_tool.get_constant, self._identify_constants_needed(query)) if data
+                ]
+                call.hit = bool(constants_data)
+            if constants_data:
+                prompt.add("Physical Constants", [
+                    f"{data['name']}: {data['value']} {data['unit']}" for data in constants_data
+                ], relevance=0.8)
+                tools_used.append("Physics Constants")
 
         # Check for unit conversion
         if self._needs_unit_conversion(query):
-            value, from_unit, to_unit = self._extract_conversion(query)
-            if value is not None and from_unit and to_unit:
-                result = self.unit_converter.convert(value, from_unit, to_unit)
-                if result is not None:
-                    conversion_info = f"Unit Conversion: {value} {from_unit} = {result} {to_unit}"
-                    tools_used.append("Unit Converter")
+            with tool_call("Unit Converter") as call:
+                value, from_unit, to_unit = self._extract_conversion(query)
+                result = None
+                if value is not None and from_unit and to_unit:
+                    result = self.unit_converter.convert(value, from_unit, to_unit)
+                call.hit = result is not None
+            if result is not None:
+                prompt.add("Unit Conversion", f"{value} {from_unit} = {result} {to_unit}")
+                tools_used.append("Unit Converter")
 
         # Check for physics formulas
         if self._needs_physics_formula(query):
-            formula_matches = self.formula_tool.search_formulas(query)
+            with tool_call("Physics Formulas") as call:
+                formula_matches = self.formula_tool.search_formulas(query)
+                call.hit = bool(formula_matches)
             if formula_matches:
-                formula_info = "Relevant Physics Formulas:\n" + "\n".join(
-                    f"- {data['description']}: {data['formula']} (Variables: {', '.join(f'{k}: {v}' for k, v in data['variables'].items())})"
+                # best match first; later matches rank lower and are the first to go
+                prompt.add("Relevant Physics Formulas", [
+                    f"{data['description']}: {data['formula']} (Variables: {', '.join(f'{k}: {v}' for k, v in data['variables'].items())})"
                     for data in formula_matches.values()
-                )
+                ], relevance=0.9)
                 tools_used.append("Physics Formulas")
+                with tool_call("Formula Solver") as call:
+                    solution = self._solve_formula(query, list(formula_matches))
+                    call.hit = solution is not None
+                if solution is not None and solution['complete'] and solution['asked']:
+                    prompt.add("Computed result", self._describe_solution(solution))
+                    tools_used.append("Formula Solver")
+                elif solution is not None:
+                    # a given value was left out, or the solver found some other quantity:
+                    # a step towards the answer at best
+                    title = ("Partial computation (ignores some given values; check before using)"
+                             if not solution['complete'] else
+                             "Intermediate result (not the quantity asked for)")
+                    prompt.add(title, self._describe_solution(solution), relevance=0.5)
+                    tools_used.append("Formula Solver")
 
-        prompt = f"""
-        You are a physics tutor. A student asked: "{query}"
+        return prompt, tools_used
 
-        {constants_info}
-        {conversion_info}
-        {formula_info}
+    def _build_prompt(self, query: str) -> Tuple[str, List[str]]:
+        with stage_seconds.time('tools'):
+            prompt, tools_used = self._prepare(query)
+        return prompt.build(), tools_used
 
-        Provide a response that:
-        1. Explains the physics concept clearly
-        2. Uses the provided constants and conversions
-        3. Shows step-by-step calculations if needed
-        4. Includes relevant formulas
-        5. Is educational and comprehensive
-        """
-        
-        response = self.client.models.generate_content(
-            model='gemini-2.0-flash-001',
-            contents=prompt
-        )
-        return {'answer': response.text, 'tools_used': tools_used}
\ No newline at end of file
+    def tool_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """The tools' results on their own, for when there is no time left to generate an answer"""
+        instant = self.instant_answer(query)
+        if instant is not None:
+            return instant
+        prompt, tools_used = self._prepare(query)
+        context = prompt.context()
+        if not context:
+            return None
+        return {'answer': context, 'tools_used': tools_used, 'tool_only': True}
+
+    async def handle_query(self, query: str) -> Dict[str, Any]:
+        prompt, tools_used = self._build_prompt(query)
+        answer = await self.llm.generate(prompt)
+        return {'answer': answer, 'tools_used': tools_used}
+
+    def stream_query(self, query: str) -> Tuple[List[str], AsyncIterator[str]]:
+        """Run the tools now and return them with an iterator over the streamed answer text"""
+        prompt, tools_used = self._build_prompt(query)
+        return tools_used, self.llm.stream(prompt)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import math
+import os
+import re
+import textwrap
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate: a word costs one token per four characters (at least one), a symbol one.
+
+    Close to what subword tokenizers give English prose and formulas,
+    without loading a tokenizer.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PIECES.findall(text))
+
+
+class PromptTemplate:
+    """A prompt skeleton compiled once at import.
+
+    The text is dedented, blank lines are dropped, and its ``{fields}`` are
+    split out with ``string.Formatter`` so rendering is a join of literals
+    and values. ``{context}`` marks where tool context goes; the line is
+    removed when there is none.
+    """
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        lines = [line.rstrip() for line in textwrap.dedent(text).strip().splitlines()]
+        self.text = "\n".join(line for line in lines if line.strip())
+        self._parts: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(self.text)
+        ]
+        self.fixed_tokens = estimate_tokens("".join(literal for literal, _ in self._parts))
+
+    def render(self, **values: str) -> str:
+        rendered = "".join(literal + (values.get(field, '') if field else '') for literal, field in self._parts)
+        # a placeholder with nothing to show leaves no blank line behind
+        return "\n".join(line for line in rendered.split("\n") if line.strip())
+
+
+class PromptMetrics:
+    """Prompt sizes per agent, in estimated tokens"""
+
+    def __init__(self):
+        self._agents: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent: str, tokens: int, items_dropped: int) -> None:
+        stats = self._agents.setdefault(agent, {
+            'prompts': 0, 'tokens': 0, 'max_tokens': 0, 'trimmed_prompts': 0, 'items_dropped': 0
+        })
+        stats['prompts'] += 1
+        stats['tokens'] += tokens
+        stats['max_tokens'] = max(stats['max_tokens'], tokens)
+        stats['trimmed_prompts'] += items_dropped > 0
+        stats['items_dropped'] += items_dropped
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            agent: {**stats, 'mean_tokens': round(stats['tokens'] / stats['prompts'], 1)}
+            for agent, stats in self._agents.items()
+        }
+
+    def reset(self) -> None:
+        self._agents.clear()
+
+
+metrics = PromptMetrics()
+
+
+def default_token_budget() -> int:
+    return int(os.getenv("PROMPT_TOKEN_BUDGET", "600"))
+
+
+class PromptBuilder:
+    """Assemble one prompt from a template, the question and ranked tool context.
+
+    Tool output is added as sections of items, each with a relevance score.
+    ``build`` drops empty sections, orders sections and their items by
+    relevance, and keeps adding items while the estimated prompt size
+    stays within the token budget; whatever does not fit is left out (and
+    counted in the metrics) rather than cut mid-line. The template and the
+    values (the question) count against the budget but are never cut, so
+    the budget trims tool context only; callers cap the question's size
+    (``MAX_QUESTION_LENGTH`` in the API).
+    """
+
+    def __init__(self, template: PromptTemplate, token_budget: Optional[int] = None, **values: str):
+        self.template = template
+        self.token_budget = token_budget if token_budget is not None else default_token_budget()
+        self.values = values
+        self._sections: List[Tuple[str, List[Tuple[float, str]]]] = []
+
+    def add(self, title: str, items, relevance: float = 1.0) -> 'PromptBuilder':
+        """Add a section; ``items`` is a string, a list of strings (in relevance order) or ``(relevance, text)`` pairs"""
+        if isinstance(items, str):
+            items = [items]
+        ranked = []
+        for i, item in enumerate(items):
+            score, text = item if isinstance(item, tuple) else (relevance / (i + 1), item)
+            if text and text.strip():
+                ranked.append((score, text.strip()))
+        if ranked:
+            self._sections.append((title, ranked))
+        return self
+
+    def _assemble(self) -> Tuple[List[str], int]:
+        """Context blocks that fit the budget, best first, and how many items were left out"""
+        used = self.template.fixed_tokens + sum(estimate_tokens(value) for value in self.values.values())
+        sections = sorted(self._sections, key=lambda section: max(score for score, _ in section[1]), reverse=True)
+
+        blocks, dropped = [], 0
+        for title, items in sections:
+            kept = []
+            # the title is only paid for once the section's first item fits
+            cost = estimate_tokens(title) + 1
+            for _, text in sorted(items, key=lambda item: item[0], reverse=True):
+                item_tokens = estimate_tokens(text) + 1
+                if used + cost + item_tokens > self.token_budget:
+                    dropped += 1
+                    continue
+                used += cost + item_tokens
+                cost = 0
+                kept.append(text)
+            if not kept:
+                continue
+            if len(kept) == 1 and "\n" not in kept[0] and len(items) == 1:
+                blocks.append(f"{title}: {kept[0]}" if title else kept[0])
+            else:
+                blocks.append("\n".join(([f"{title}:"] if title else []) + [f"- {text}" for text in kept]))
+        return blocks, dropped
+
+    def context(self) -> str:
+        """Just the tool context, as it would appear in the prompt"""
+        return "\n".join(self._assemble()[0])
+
+    def build(self) -> str:
+        blocks, dropped = self._assemble()
+        prompt = self.template.render(context="\n".join(blocks), **self.values)
+        metrics.record(self.template.name, estimate_tokens(prompt), dropped)
+        return prompt
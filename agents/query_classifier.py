@@ -0,0 +1,152 @@
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'data', 'query_classifier.npz')
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an the is are was were be of to in on for and or what whats how do does did i you me my "
+    "can why which who when where with by it its this that at as from about tell explain please".split()
+)
+
+
+def _hash(feature: str, n_features: int) -> int:
+    # crc32 instead of hash(): Python's str hash is salted per process
+    return zlib.crc32(feature.encode('utf-8')) % n_features
+
+
+class LocalQueryClassifier:
+    """Hashed TF-IDF features with a softmax linear model, in plain NumPy.
+
+    Content-word unigrams, bigrams and character 4-grams are hashed into
+    ``n_features`` buckets, so the artifact stores only the idf vector and
+    the weight matrix. Character n-grams let unseen words such as
+    "thermodynamics" share evidence with "thermal".
+    """
+
+    def __init__(self, labels: Sequence[str], weights: np.ndarray, bias: np.ndarray,
+                 idf: np.ndarray, n_features: int):
+        self.labels = list(labels)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.idf = idf.astype(np.float32)
+        self.n_features = n_features
+        # idf-scaled weight rows for every feature the model actually uses
+        scaled = (self.weights * self.idf).T
+        used = np.flatnonzero(np.any(scaled != 0, axis=1))
+        self._rows = {int(i): tuple(scaled[i].tolist()) for i in used}
+        self._idf = self.idf.tolist()
+        self._bias = self.bias.tolist()
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        words = [word for word in _TOKEN.findall(text.lower()) if word not in _STOP_WORDS]
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 4] for i in range(len(padded) - 3))
+        return features
+
+    @staticmethod
+    def _term_counts(text: str, n_features: int) -> Dict[int, int]:
+        return Counter(_hash(token, n_features) for token in LocalQueryClassifier.tokenize(text))
+
+    def _scores(self, text: str) -> List[float]:
+        # Queries hit a few dozen features, so a plain loop over pre-scaled
+        # weight rows beats NumPy's per-call overhead by a wide margin.
+        counts = self._term_counts(text, self.n_features)
+        scores = [0.0] * len(self.labels)
+        squared_norm = 0.0
+        for index, count in counts.items():
+            tf = 1.0 + math.log(count) if count > 1 else 1.0
+            value = tf * self._idf[index]
+            squared_norm += value * value
+            row = self._rows.get(index)
+            if row is not None:
+                for k, weight in enumerate(row):
+                    scores[k] += tf * weight
+        norm = math.sqrt(squared_norm) or 1.0
+        return [score / norm + bias for score, bias in zip(scores, self._bias)]
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        scores = np.array(self._scores(text))
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return ``(label, confidence)`` for one query"""
+        scores = self._scores(text)
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        best = exps.index(1.0)
+        return self.labels[best], 1.0 / sum(exps)
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], n_features: int = 2 ** 14,
+              epochs: int = 400, learning_rate: float = 10.0, l2: float = 1e-4) -> 'LocalQueryClassifier':
+        """Fit a multinomial logistic regression with full-batch gradient descent"""
+        label_names = sorted(set(labels))
+        label_index = {label: i for i, label in enumerate(label_names)}
+        y = np.array([label_index[label] for label in labels])
+
+        rows = [cls._term_counts(text, n_features) for text in texts]
+        document_frequency = np.zeros(n_features, dtype=np.float64)
+        for counts in rows:
+            document_frequency[list(counts.keys())] += 1
+        idf = np.log((1 + len(rows)) / (1 + document_frequency)) + 1.0
+
+        X = np.zeros((len(rows), n_features), dtype=np.float32)
+        for i, counts in enumerate(rows):
+            for index, count in counts.items():
+                X[i, index] = (1.0 + math.log(count)) * idf[index]
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+        X /= np.where(norms == 0, 1.0, norms)
+
+        targets = np.eye(len(label_names), dtype=np.float32)[y]
+        weights = np.zeros((len(label_names), n_features), dtype=np.float32)
+        bias = np.zeros(len(label_names), dtype=np.float32)
+        for _ in range(epochs):
+            scores = X @ weights.T + bias
+            scores -= scores.max(axis=1, keepdims=True)
+            probabilities = np.exp(scores)
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            error = (probabilities - targets) / len(rows)
+            weights -= learning_rate * (error.T @ X + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        return cls(label_names, weights, bias, idf, n_features)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            weights=self.weights.astype(np.float16),
+            bias=self.bias,
+            idf=self.idf.astype(np.float16),
+            n_features=np.array(self.n_features)
+        )
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> 'LocalQueryClassifier':
+        with np.load(path) as data:
+            return cls(
+                labels=[str(label) for label in data['labels']],
+                weights=data['weights'],
+                bias=data['bias'],
+                idf=data['idf'],
+                n_features=int(data['n_features'])
+            )
+
+
+def load_default_classifier() -> Optional[LocalQueryClassifier]:
+    """Load the bundled artifact, or the one at QUERY_CLASSIFIER_PATH; None if unavailable"""
+    path = os.getenv("QUERY_CLASSIFIER_PATH", DEFAULT_MODEL_PATH)
+    if not path or not os.path.exists(path):
+        return None
+    return LocalQueryClassifier.load(path)
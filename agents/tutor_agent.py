@@ -1,20 +1,102 @@
 from google import genai
+import asyncio
 import os
-from typing import Dict, Any
+import re
+from contextlib import nullcontext
+from typing import Dict, Any, Optional, Tuple, AsyncIterator, List, ContextManager
+from llm.backends import GeminiBackend, LLMBackend
+from llm.cassette import RecordingBackend, ReplayBackend
+from llm.client import LLMClient
+from llm.fake import FakeBackend
+from llm.resilience import CircuitOpenError, is_retryable
+from llm.scheduler import current_priority
+from core.cache import AnswerCache, build_answer_cache, make_cache_key, normalize_question
+from core.coalescer import SingleFlight
+from core.deadline import DeadlineExceeded, current_deadline, deadline_scope, degrade, within_deadline
+from core.metrics import routes, stage_seconds
+from tools.batch_memo import batch_memo
 from .math_agent import MathAgent
 from .physics_agent import PhysicsAgent
 from .chemistry_agent import ChemistryAgent
+from .prompt_builder import PromptBuilder, PromptTemplate, metrics as prompt_metrics
+from .query_classifier import LocalQueryClassifier, load_default_classifier
+
+GENERAL_PROMPT = PromptTemplate('tutor', """
+    You are an AI tutor. Answer this question clearly and educationally.
+
+    Question: {query}
+
+    Provide a helpful response for a student.
+""")
+
+ROUTER_PROMPT = PromptTemplate('router', """
+    Classify this question into: math, physics, chemistry, or general.
+
+    Question: "{query}"
+
+    Guidelines:
+    - Math: arithmetic, algebra, geometry, calculations
+    - Physics: forces, motion, energy, constants
+    - Chemistry: elements, compounds, reactions
+    - General: anything else
+
+    Respond with one word: math, physics, chemistry, or general
+""")
+
+# a Gemini round trip is not worth starting with less time than this (seconds)
+MIN_STAGE_TIME = 0.2
+
+BATCH_ROUTER_PROMPT = PromptTemplate('router', """
+    Classify each question into: math, physics, chemistry, or general.
+
+    Questions:
+    {questions}
+
+    Guidelines:
+    - Math: arithmetic, algebra, geometry, calculations
+    - Physics: forces, motion, energy, constants
+    - Chemistry: elements, compounds, reactions
+    - General: anything else
+
+    Respond with one line per question in the form "<number>: <category>"
+""")
+
+
+def _flight_key(query: str) -> str:
+    # the same question as the answer cache sees it (operators, decimals and
+    # case kept), so "12 * 7" never joins a run of "12 / 7". A flight's LLM
+    # calls wait in the lane of the request that started it, so an
+    # interactive question never joins one queued behind bulk work either.
+    return f"{current_priority()[0]}:{normalize_question(query)}"
+
 
 class TutorAgent:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
-        
-        self.client = genai.Client(api_key=api_key)
-        self.math_agent = MathAgent(self.client)
-        self.physics_agent = PhysicsAgent(self.client)
-        self.chemistry_agent = ChemistryAgent(self.client)
+    def __init__(self, client: Optional[Any] = None, cache: Optional[AnswerCache] = None,
+                 classifier: Optional[LocalQueryClassifier] = None, instant_answers: Optional[bool] = None,
+                 backend: Optional[LLMBackend] = None):
+        """``backend`` (or a google-genai ``client``) is where completions come from; by default
+        the ``LLM_BACKEND`` setting picks Gemini (``gemini``) or the offline ``fake``"""
+        if backend is None and client is None:
+            backend = self._default_backend()
+
+        self.client = client
+        self.llm = LLMClient(backend if backend is not None else client)
+        self.math_agent = MathAgent(self.llm)
+        self.physics_agent = PhysicsAgent(self.llm)
+        self.chemistry_agent = ChemistryAgent(self.llm)
+        self.cache = cache if cache is not None else build_answer_cache()
+        self.answer_flight = SingleFlight()
+        self.local_classifier = classifier if classifier is not None else load_default_classifier()
+        self.classifier_threshold = float(os.getenv("CLASSIFIER_CONFIDENCE_THRESHOLD", "0.6"))
+        if instant_answers is None:
+            instant_answers = os.getenv("INSTANT_ANSWERS", "false").lower() in ("1", "true", "yes", "on")
+        self.instant_answers = instant_answers
+        self.classifier_flight = SingleFlight()
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
+        # request deadline and per-stage budgets, in seconds
+        self.request_timeout = float(os.getenv("REQUEST_TIMEOUT", "30"))
+        self.classify_timeout = float(os.getenv("CLASSIFY_TIMEOUT", "3"))
+        self.min_generation_time = float(os.getenv("MIN_GENERATION_TIME", "1"))
 
         self.math_keywords = [
             'calculate', 'solve', 'equation', 'math', 'mathematics',
@@ -31,7 +113,88 @@ class TutorAgent:
             'molecule', 'atom', 'periodic table', 'bond'
         ]
 
-    def _classify_query(self, query: str) -> str:                                                   # classify the query based on keywords
+    @staticmethod
+    def _default_backend() -> LLMBackend:
+        backend = TutorAgent._configured_backend()
+        record_path = os.getenv("LLM_RECORD_PATH")
+        # LLM_RECORD_PATH appends every call to a cassette that LLM_BACKEND=replay can serve later
+        return RecordingBackend(backend, record_path) if record_path else backend
+
+    @staticmethod
+    def _configured_backend() -> LLMBackend:
+        kind = os.getenv("LLM_BACKEND", "gemini").lower()
+        if kind == 'fake':
+            return FakeBackend.from_env()
+        if kind == 'replay':
+            missing = os.getenv("LLM_REPLAY_MISSING", "error").lower()
+            if missing not in ('error', 'fake'):
+                raise ValueError(f"Unknown LLM_REPLAY_MISSING '{missing}': use 'error' or 'fake'")
+            return ReplayBackend.from_env(fallback=FakeBackend.from_env() if missing == 'fake' else None)
+        if kind != 'gemini':
+            raise ValueError(f"Unknown LLM_BACKEND '{kind}': use 'gemini', 'fake' or 'replay'")
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is required (or set LLM_BACKEND=fake)")
+        base_url = os.getenv("GEMINI_BASE_URL")
+        # GEMINI_BASE_URL points the client at a proxy or a local fake server
+        http_options = {'base_url': base_url} if base_url else None
+        return GeminiBackend(genai.Client(api_key=api_key, http_options=http_options))
+
+    def _deadline(self, timeout: Optional[float]) -> ContextManager:
+        """Start the request deadline, unless the caller already runs under one"""
+        if current_deadline() is not None:
+            return nullcontext(current_deadline())
+        return deadline_scope(timeout if timeout is not None else self.request_timeout)
+
+    def _classifier_budget(self) -> Optional[float]:
+        """Time the Gemini classifier may use while leaving enough for generation; None means skip it"""
+        deadline = current_deadline()
+        if deadline is None:
+            return self.classify_timeout
+        # the margin keeps a classifier that uses its whole budget from leaving generation just short
+        budget = deadline.budget(self.classify_timeout, reserve=self.min_generation_time + MIN_STAGE_TIME)
+        if budget < MIN_STAGE_TIME:
+            degrade('classification')
+            return None
+        return budget
+
+    async def _classify_query(self, query: str) -> str:
+        with stage_seconds.time('classify'):
+            category, method = await self._route(query)
+        routes.inc(category, method)
+        return category
+
+    async def _route(self, query: str) -> Tuple[str, str]:
+        """The category and how it was decided: local, gemini or keyword (the fallback)"""
+        category = self._classify_locally(query)
+        if category is not None:
+            return category, 'local'
+        budget = self._classifier_budget()
+        if budget is None:
+            return self._keyword_route(query), 'keyword'
+        try:
+            return await within_deadline(self._classify_with_gemini(query), 'classification', limit=budget), 'gemini'
+        except (DeadlineExceeded, CircuitOpenError):
+            degrade('classification')
+            return self._keyword_route(query), 'keyword'
+
+    def _keyword_route(self, query: str) -> str:
+        """Best guess without Gemini: the top keyword score (ties go to math, then physics,
+        then chemistry), else the local model's guess at any confidence, else general"""
+        query_lower = query.lower()
+        scores = [
+            (sum(1 for keyword in keywords if keyword in query_lower), category)
+            for category, keywords in (('math', self.math_keywords), ('physics', self.physics_keywords),
+                                       ('chemistry', self.chemistry_keywords))
+        ]
+        best_score, best = max(scores, key=lambda score: score[0])
+        if best_score > 0:
+            return best
+        if self.local_classifier is not None:
+            return self.local_classifier.predict(query)[0]
+        return 'general'
+
+    def _classify_locally(self, query: str) -> Optional[str]:                                      # classify the query based on keywords
         query_lower = query.lower()
         math_score = sum(1 for keyword in self.math_keywords if keyword in query_lower)
         physics_score = sum(1 for keyword in self.physics_keywords if keyword in query_lower)
@@ -43,66 +206,398 @@ class TutorAgent:
             return 'physics'
         elif chemistry_score > max(math_score, physics_score) and chemistry_score > 0:
             return 'chemistry'
-        return self._classify_with_gemini(query)
 
-    def _classify_with_gemini(self, query: str) -> str:                             # use Gemini to classify the query
+        # keyword tie or no keywords: ask the local model before paying for a Gemini round trip
+        if self.local_classifier is not None:
+            category, confidence = self.local_classifier.predict(query)
+            if confidence >= self.classifier_threshold:
+                return category
+        return None
+
+    async def _classify_with_gemini(self, query: str) -> str:                             # use Gemini to classify the query
+        return await self.classifier_flight.do(
+            _flight_key(query), lambda: self._run_gemini_classifier(query), stage='classification'
+        )
+
+    async def _run_gemini_classifier(self, query: str) -> str:
+        cache_key = make_cache_key(query, 'router', self.llm.model)
+        if self.cache is not None:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return cached['category']
         try:
-            prompt = f"""
-            Classify this question into: math, physics, chemistry, or general.
-
-            Question: "{query}"
-
-            Guidelines:
-            - Math: arithmetic, algebra, geometry, calculations
-            - Physics: forces, motion, energy, constants
-            - Chemistry: elements, compounds, reactions
-            - General: anything else
-
-            Respond with one word: math, physics, chemistry, or general
-            """
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash-001',
-                contents=prompt
-            )
-            return response.text.strip().lower() if response.text.strip().lower() in ['math', 'physics', 'chemistry', 'general'] else 'general'
+            text = await self.llm.generate(PromptBuilder(ROUTER_PROMPT, query=query).build(), stage='gemini_classifier')
+            category = text.strip().lower() if text.strip().lower() in ['math', 'physics', 'chemistry', 'general'] else 'general'
+        except CircuitOpenError:
+            raise
         except Exception:
             return 'general'
+        if self.cache is not None:
+            await self.cache.aset(cache_key, {'category': category})
+        return category
+
+    async def _classify_batch_with_gemini(self, queries: List[str]) -> List[str]:
+        """Classify several questions with one Gemini prompt; unanswered lines fall back to 'general'"""
+        categories = ['general'] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            cached = await self.cache.aget(make_cache_key(query, 'router', self.llm.model)) if self.cache is not None else None
+            if cached is not None:
+                categories[i] = cached['category']
+            else:
+                pending.append(i)
+        if not pending:
+            return categories
+        if len(pending) == 1:
+            categories[pending[0]] = await self._classify_with_gemini(queries[pending[0]])
+            return categories
+
+        numbered = "\n".join(f"{n}. {queries[i]}" for n, i in enumerate(pending, 1))
+        prompt = PromptBuilder(BATCH_ROUTER_PROMPT, questions=numbered).build()
+        try:
+            text = await self.llm.generate(prompt, stage='gemini_classifier')
+        except CircuitOpenError:
+            raise
+        except Exception:
+            return categories
+        for number, category in re.findall(r'(\d+)\s*[:.)\-]\s*(math|physics|chemistry|general)', text.lower()):
+            n = int(number)
+            if 1 <= n <= len(pending):
+                i = pending[n - 1]
+                categories[i] = category
+                if self.cache is not None:
+                    await self.cache.aset(make_cache_key(queries[i], 'router', self.llm.model), {'category': category})
+        return categories
+
+    async def process_batch(self, queries: List[str], explain: bool = False,
+                            timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Answer a worksheet of questions; results keep the input order and carry per-item errors.
+
+        ``timeout`` bounds the shared routing step and then each question on
+        its own, counted from when it gets one of the ``batch_concurrency``
+        slots, so a long worksheet is not cut short by a deadline sized for
+        one answer.
+        """
+        item_timeout = timeout if timeout is not None else self.request_timeout
+        with self._deadline(timeout) as deadline:
+            batch = await self._process_batch(queries, explain, item_timeout)
+        batch['stats']['degraded'] = list(deadline.degraded) if deadline is not None else []
+        return batch
+
+    async def _process_batch(self, queries: List[str], explain: bool,
+                             item_timeout: Optional[float] = None) -> Dict[str, Any]:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+
+        # identical questions (up to whitespace and a trailing ?, . or !) are answered once;
+        # the key keeps operators, decimals and case, so "12 * 7" and "12 / 7" stay apart
+        unique: Dict[str, List[int]] = {}
+        for i, query in enumerate(queries):
+            unique.setdefault(normalize_question(query), []).append(i)
+        representatives = [queries[indices[0]] for indices in unique.values()]
+
+        answers: Dict[int, Dict[str, Any]] = {}
+        to_route = []
+        for u, query in enumerate(representatives):
+            instant = self._instant_answer(query) if self.instant_answers and not explain else None
+            if instant is not None:
+                answers[u] = instant
+            else:
+                to_route.append(u)
+
+        # local routing first; everything still ambiguous goes to Gemini in one prompt
+        categories: Dict[int, str] = {}
+        ambiguous = []
+        with stage_seconds.time('classify'):
+            for u in to_route:
+                category = self._classify_locally(representatives[u])
+                if category is None:
+                    ambiguous.append(u)
+                else:
+                    categories[u] = category
+                    routes.inc(category, 'local')
+            if ambiguous:
+                budget = self._classifier_budget()
+                method = 'gemini'
+                try:
+                    if budget is None:
+                        raise DeadlineExceeded('classification')
+                    routed = await within_deadline(
+                        self._classify_batch_with_gemini([representatives[u] for u in ambiguous]),
+                        'classification', limit=budget
+                    )
+                except (DeadlineExceeded, CircuitOpenError):
+                    degrade('classification')
+                    method = 'keyword'
+                    routed = [self._keyword_route(representatives[u]) for u in ambiguous]
+                categories.update(zip(ambiguous, routed))
+                for category in routed:
+                    routes.inc(category, method)
 
-    async def process_query(self, query: str) -> Dict[str, Any]:
-        category = self._classify_query(query)
+        semaphore = asyncio.Semaphore(max(1, self.batch_concurrency))
+        batch_deadline = current_deadline()
+
+        async def answer(u: int) -> None:
+            query = representatives[u]
+            async with semaphore:
+                with deadline_scope(item_timeout) as deadline:
+                    try:
+                        answers[u] = dict(await self.answer_flight.do(
+                            _flight_key(query), lambda: self._answer(query, categories[u])
+                        ))
+                    except Exception as e:
+                        answers[u] = {'error': str(e), 'query_category': categories[u]}
+            if deadline is not None and batch_deadline is not None:
+                # the question's own deadline already counted these in the metrics
+                for stage in deadline.degraded:
+                    if stage not in batch_deadline.degraded:
+                        batch_deadline.degraded.append(stage)
+
+        with batch_memo() as memo:
+            await asyncio.gather(*(answer(u) for u in to_route))
+
+        for u, indices in enumerate(unique.values()):
+            for i in indices:
+                results[i] = {'index': i, 'question': queries[i], **answers[u]}
+        return {
+            'results': results,
+            'stats': {
+                'questions': len(queries),
+                'unique_questions': len(representatives),
+                'gemini_classified': len(ambiguous),
+                'tool_lookups': memo.misses,
+                'tool_lookups_reused': memo.hits
+            }
+        }
+
+    async def process_query(self, query: str, explain: bool = False, timeout: Optional[float] = None,
+                            instant: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Answer a question; ``explain`` forces the full LLM tutoring answer even in instant mode.
+
+        The whole pipeline runs against a deadline ``timeout`` seconds away
+        (``REQUEST_TIMEOUT`` by default). When time runs short, or Gemini is
+        failing and its circuit is open, the Gemini classifier is skipped for
+        the keyword route and generation for the tools' own answer; the
+        response lists these in ``degraded``. ``instant`` is the result of
+        ``instant_answer`` when the caller already has it.
+        """
+        instant = self._take_instant(query, explain, instant)
+        if instant is not None:
+            return instant
+
+        with self._deadline(timeout):
+            # identical questions already in flight share one pipeline run; a
+            # request joining one still answers (or gives up) by its own deadline
+            result = await self.answer_flight.do(
+                _flight_key(query), lambda: self._process_query(query)
+            )
+        return dict(result)
+
+    def instant_answer(self, query: str, explain: bool = False) -> Optional[Dict[str, Any]]:
+        """The answer ``process_query`` would give from the tools alone, or None if it needs the LLM"""
+        if not self.instant_answers or explain:
+            return None
+        return self._instant_answer(query, count=False)
+
+    def _take_instant(self, query: str, explain: bool,
+                      instant: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not self.instant_answers or explain:
+            return None
+        if instant is None:
+            return self._instant_answer(query)
+        # computed earlier by instant_answer, which leaves the counting to the request that uses it
+        routes.inc(instant['query_category'], 'instant')
+        return dict(instant)
+
+    def _instant_answer(self, query: str, count: bool = True) -> Optional[Dict[str, Any]]:
+        # the instant detectors only fire on whole-question tool lookups, so
+        # they are unambiguous and can run before (and instead of) routing
+        for category, agent, agent_used in (
+            ('math', self.math_agent, 'Math Agent'),
+            ('physics', self.physics_agent, 'Physics Agent'),
+            ('chemistry', self.chemistry_agent, 'Chemistry Agent'),
+        ):
+            result = agent.instant_answer(query)
+            if result is not None:
+                if count:
+                    routes.inc(category, 'instant')
+                return {
+                    'answer': result['answer'],
+                    'agent_used': agent_used,
+                    'tools_used': result['tools_used'],
+                    'query_category': category,
+                    'cached': False,
+                    'tool_only': True
+                }
+        return None
+
+    def prompt_stats(self) -> Dict[str, Dict[str, float]]:
+        """Estimated prompt tokens per agent (and for the router)"""
+        return prompt_metrics.stats()
+
+    def llm_stats(self) -> Dict[str, Any]:
+        """Gemini call outcomes: retries, hedges, circuit breaker state and latency"""
+        return self.llm.stats()
+
+    def coalescing_stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            'answers': self.answer_flight.stats(),
+            'classifier': self.classifier_flight.stats()
+        }
+
+    def _agent_for(self, category: str) -> Tuple[Optional[Any], str]:
         if category == 'math':
-            result = await self.math_agent.handle_query(query)
-            agent_used = 'Math Agent'
-        elif category == 'physics':
-            result = await self.physics_agent.handle_query(query)
-            agent_used = 'Physics Agent'
-        elif category == 'chemistry':
-            result = await self.chemistry_agent.handle_query(query)
-            agent_used = 'Chemistry Agent'
+            return self.math_agent, 'Math Agent'
+        if category == 'physics':
+            return self.physics_agent, 'Physics Agent'
+        if category == 'chemistry':
+            return self.chemistry_agent, 'Chemistry Agent'
+        return None, 'Tutor Agent'
+
+    async def stream_query(self, query: str, explain: bool = False, timeout: Optional[float] = None,
+                           instant: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``('meta', ...)`` as soon as the agent and tools are known, then ``('token', ...)`` chunks"""
+        with self._deadline(timeout):
+            async for event in self._stream_query(query, explain, instant):
+                yield event
+
+    async def _stream_query(self, query: str, explain: bool,
+                            instant: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        instant = self._take_instant(query, explain, instant)
+        if instant is not None:
+            answer = instant.pop('answer')
+            yield 'meta', instant
+            yield 'token', {'text': answer}
+            return
+
+        deadline = current_deadline()
+        category = await self._classify_query(query)
+        degraded = list(deadline.degraded) if deadline is not None else []
+        cache_key = make_cache_key(query, category, self.llm.model)
+        if self.cache is not None:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                cached = dict(cached)
+                answer = cached.pop('answer')
+                yield 'meta', {**cached, 'cached': True, 'tool_only': False, 'degraded': degraded}
+                yield 'token', {'text': answer}
+                return
+
+        agent, agent_used = self._agent_for(category)
+        fallback = self._tool_fallback(query, category) if self._skip_generation() else None
+        if fallback is not None:
+            answer = fallback.pop('answer')
+            yield 'meta', fallback
+            yield 'token', {'text': answer}
+            return
+        if agent is not None:
+            tools_used, chunks = agent.stream_query(query)
         else:
-            result = await self._handle_general_query(query)
-            agent_used = 'Tutor Agent'
+            tools_used, chunks = [], self.llm.stream(self._build_general_prompt(query))
 
-        return {
+        yield 'meta', {
+            'agent_used': agent_used,
+            'tools_used': tools_used,
+            'query_category': category,
+            'cached': False,
+            'tool_only': False,
+            'degraded': degraded
+        }
+        parts = []
+        async for text in chunks:
+            parts.append(text)
+            yield 'token', {'text': text}
+
+        if self.cache is not None:
+            await self.cache.aset(cache_key, {
+                'answer': ''.join(parts),
+                'agent_used': agent_used,
+                'tools_used': tools_used,
+                'query_category': category
+            })
+
+    async def _process_query(self, query: str) -> Dict[str, Any]:
+        category = await self._classify_query(query)
+        return await self._answer(query, category)
+
+    async def _answer(self, query: str, category: str) -> Dict[str, Any]:
+        cache_key = make_cache_key(query, category, self.llm.model)
+        if self.cache is not None:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return {**cached, 'cached': True, 'tool_only': False}
+
+        agent, agent_used = self._agent_for(category)
+        if self._skip_generation():
+            fallback = self._tool_fallback(query, category)
+            if fallback is None:
+                if not self.llm.available():
+                    raise CircuitOpenError(self.llm.resilience.breaker.retry_after())
+                raise DeadlineExceeded('generation')
+            return fallback
+        try:
+            if agent is not None:
+                result = await agent.handle_query(query)
+            else:
+                result = await self._handle_general_query(query)
+        except Exception as e:
+            # out of time, or Gemini still failing after retries: the tools' answer beats an error
+            if not isinstance(e, (DeadlineExceeded, CircuitOpenError)) and not is_retryable(e):
+                raise
+            degrade('generation')
+            fallback = self._tool_fallback(query, category)
+            if fallback is None:
+                raise
+            return fallback
+
+        deadline = current_deadline()
+        degraded = list(deadline.degraded) if deadline is not None else []
+        response = {
             'answer': result['answer'],
             'agent_used': agent_used,
             'tools_used': result['tools_used'],
             'query_category': category
         }
+        if result.get('error'):
+            return {**response, 'cached': False, 'tool_only': False, 'degraded': degraded, 'error': result['error']}
+        if self.cache is not None:
+            await self.cache.aset(cache_key, response)
+        return {**response, 'cached': False, 'tool_only': False, 'degraded': degraded}
 
-    async def _handle_general_query(self, query: str) -> Dict[str, Any]:                # handle general queries that don't fit into math, physics, or chemistry
-        try:
-            prompt = f"""
-            You are an AI tutor. Answer this question clearly and educationally.
+    def _skip_generation(self) -> bool:
+        """Too little of the deadline is left to start generating an answer, or Gemini's circuit is open"""
+        deadline = current_deadline()
+        out_of_time = deadline is not None and deadline.remaining() < self.min_generation_time
+        if not out_of_time and self.llm.available():
+            return False
+        degrade('generation')
+        return True
+
+    def _tool_fallback(self, query: str, category: str) -> Optional[Dict[str, Any]]:
+        """The subject agent's tool results as the answer, when generation has to be skipped"""
+        agent, agent_used = self._agent_for(category)
+        result = agent.tool_answer(query) if agent is not None else None
+        if result is None:
+            return None
+        deadline = current_deadline()
+        # not cached: a full answer should replace it once there is time
+        return {
+            'answer': result['answer'],
+            'agent_used': agent_used,
+            'tools_used': result['tools_used'],
+            'query_category': category,
+            'cached': False,
+            'tool_only': True,
+            'degraded': list(deadline.degraded) if deadline is not None else []
+        }
 
-            Question: {query}
+    def _build_general_prompt(self, query: str) -> str:
+        return PromptBuilder(GENERAL_PROMPT, query=query).build()
 
-            Provide a helpful response for a student.
-            """
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash-001',
-                contents=prompt
-            )
-            return {'answer': response.text, 'tools_used': []}
+    async def _handle_general_query(self, query: str) -> Dict[str, Any]:                # handle general queries that don't fit into math, physics, or chemistry
+        try:
+            answer = await self.llm.generate(self._build_general_prompt(query))
+            return {'answer': answer, 'tools_used': []}
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
-            return {'answer': f"Error: {str(e)}", 'tools_used': []}
\ No newline at end of file
+            return {'answer': f"Error: {str(e)}", 'tools_used': [], 'error': str(e)}
\ No newline at end of file
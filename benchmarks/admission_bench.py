@@ -0,0 +1,112 @@
+"""Show that one client hammering /ask no longer starves everyone else.
+
+Runs the app in-process against the fake LLM backend. A "classroom
+script" keeps ``--script-concurrency`` requests in flight from a single
+API key while ``--users`` polite users each ask a question every
+``--think`` seconds under their own keys. Runs once with admission
+control off and once with per-client rate limits and the global
+concurrency limit on, and reports the users' latency and success rate
+next to what happened to the script's requests. The script shares the
+process (and CPU) with the server, so even refused requests cost the users
+something here; ``--script-backoff`` keeps it from spinning.
+
+    python benchmarks/admission_bench.py --seconds 10 --script-concurrency 200 --users 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+
+import httpx
+
+import main
+from agents.tutor_agent import TutorAgent
+from core.admission import ClientBuckets, ConcurrencyLimit
+from llm.fake import FakeBackend
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+async def scenario(args, enabled: bool):
+    main.tutor = TutorAgent(backend=FakeBackend(latency=args.latency))
+    admission = main.admission
+    admission.buckets = ClientBuckets(args.rate, args.burst) if enabled else None
+    admission.limit = ConcurrencyLimit(args.max_concurrent, args.max_queue, args.queue_timeout) if enabled else None
+    for name in admission.counters:
+        admission.counters[name] = 0
+
+    transport = httpx.ASGITransport(app=main.app)
+    stop = time.perf_counter() + args.seconds
+    script = {'ok': 0, 'limited': 0}
+    users = {'ok': 0, 'failed': 0, 'latencies': []}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def script_worker(w: int):
+            i = 0
+            while time.perf_counter() < stop:
+                i += 1
+                r = await client.post("/ask", json={"question": f"Explain homework {w}-{i}"},
+                                      headers={"X-API-Key": "classroom-script"})
+                if r.status_code == 200:
+                    script['ok'] += 1
+                else:
+                    script['limited'] += 1
+                    # a script that ignores Retry-After, but not a busy loop
+                    await asyncio.sleep(args.script_backoff)
+
+        async def user(u: int):
+            i = 0
+            while time.perf_counter() < stop:
+                i += 1
+                start = time.perf_counter()
+                r = await client.post("/ask", json={"question": f"Explain topic {u}-{i}"},
+                                      headers={"X-API-Key": f"user-{u}"})
+                if r.status_code == 200:
+                    users['ok'] += 1
+                    users['latencies'].append(time.perf_counter() - start)
+                else:
+                    users['failed'] += 1
+                await asyncio.sleep(args.think)
+
+        await asyncio.gather(*(script_worker(w) for w in range(args.script_concurrency)),
+                             *(user(u) for u in range(args.users)))
+
+    latencies = users['latencies']
+    label = "admission on " if enabled else "admission off"
+    print(f"{label}  users: {users['ok']:4d} ok {users['failed']:3d} failed  "
+          f"p50 {statistics.median(latencies) * 1000 if latencies else float('nan'):7.0f} ms  "
+          f"p95 {percentile(latencies, 0.95) * 1000:7.0f} ms   "
+          f"script: {script['ok']:5d} answered {script['limited']:6d} turned away")
+
+
+async def run(args) -> None:
+    print(f"fake LLM latency {args.latency:.2f}s, LLM_MAX_CONCURRENCY {os.getenv('LLM_MAX_CONCURRENCY', '16')}")
+    for enabled in (False, True):
+        await scenario(args, enabled)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM seconds per completion")
+    parser.add_argument("--script-concurrency", type=int, default=200)
+    parser.add_argument("--script-backoff", type=float, default=0.1, help="script's pause after a 429")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--think", type=float, default=0.5, help="users' pause between questions")
+    parser.add_argument("--rate", type=float, default=5.0, help="per-client requests per second")
+    parser.add_argument("--burst", type=float, default=20.0)
+    parser.add_argument("--max-concurrent", type=int, default=32)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--queue-timeout", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,164 @@
+"""Fuzz the calculator's expression evaluator and check that worst-case time stays bounded.
+
+Three parts:
+  * adversarial inputs (huge powers, factorials, long products, deep nesting)
+    must each finish, usually with a structured error, well under --budget-ms;
+  * random expressions built from the calculator's grammar must never raise
+    or exceed the budget, and where they succeed must agree with eval;
+  * throughput of the AST evaluator against the old eval-based path on a
+    realistic mix of repeated expressions.
+
+    python benchmarks/calculator_fuzz_bench.py --cases 20000 --budget-ms 100
+
+Exits non-zero if any case breaks the time budget or disagrees with eval.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.calculator_tool import CalculatorTool
+
+ADVERSARIAL = [
+    "9**9**9",
+    "2**2**2**2**2**2",
+    "10**100000",
+    "(-7)**123456789",
+    "factorial(100000)",
+    "factorial(factorial(10))",
+    "factorial(999) * factorial(999) * factorial(999)",
+    "*".join(["99999999999"] * 80),
+    "**".join(["9"] * 60),
+    "-" * 900 + "1",
+    "(" * 150 + "1" + ")" * 150,
+    "1" + "+1" * 499,
+    "gcd(10**5000, 10**4000) ** 50",
+    "pow(10, 400)",
+    "exp(100000)",
+    "99999999999999999999 ** 9999",
+]
+
+FUNCTIONS = ["sqrt", "abs", "floor", "ceil", "sin", "cos", "log10", "factorial"]
+OPERATORS = ["+", "-", "*", "/", "**", "%", "//"]
+
+
+def random_expression(rng, depth=0):
+    roll = rng.random()
+    if depth > 4 or roll < 0.3:
+        return str(rng.choice([rng.randint(0, 50), rng.randint(0, 10 ** 6), round(rng.uniform(0, 100), 3)]))
+    if roll < 0.45:
+        return f"{rng.choice(FUNCTIONS)}({random_expression(rng, depth + 1)})"
+    if roll < 0.55:
+        return f"-({random_expression(rng, depth + 1)})"
+    return f"({random_expression(rng, depth + 1)} {rng.choice(OPERATORS)} {random_expression(rng, depth + 1)})"
+
+
+def legacy_eval(calculator, expression):
+    return float(eval(expression, {'__builtins__': {}, **calculator.safe_functions}))
+
+
+def close(a, b):
+    if math.isnan(a) and math.isnan(b):
+        return True
+    return a == b or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def run_adversarial(calculator, budget):
+    worst = 0.0
+    failures = 0
+    for expression in ADVERSARIAL:
+        start = time.perf_counter()
+        result = calculator.calculate(expression)
+        elapsed = time.perf_counter() - start
+        worst = max(worst, elapsed)
+        outcome = result.get('formatted_result') or f"{result.get('error_type', 'error')}: {result['error'][:60]}"
+        flag = "SLOW " if elapsed > budget else ""
+        failures += elapsed > budget
+        print(f"  {flag}{elapsed * 1000:7.2f} ms  {expression[:40]:<40}  {outcome}")
+    return worst, failures
+
+
+def run_fuzz(calculator, cases, budget, seed):
+    rng = random.Random(seed)
+    worst = 0.0
+    slow = mismatches = expensive = 0
+    for _ in range(cases):
+        expression = random_expression(rng)
+        start = time.perf_counter()
+        result = calculator.calculate(expression)
+        elapsed = time.perf_counter() - start
+        worst = max(worst, elapsed)
+        if elapsed > budget:
+            slow += 1
+            print(f"  SLOW {elapsed * 1000:.1f} ms: {expression}")
+        if not result['success']:
+            expensive += result.get('error_type') == 'too_expensive'
+            continue
+        # only compare against eval when the evaluator accepted the work,
+        # eval itself may not terminate on the rejected cases
+        try:
+            expected = legacy_eval(calculator, result['expression'])
+        except Exception:
+            mismatches += 1
+            print(f"  MISMATCH (eval failed): {expression}")
+            continue
+        if not close(result['result'], expected):
+            mismatches += 1
+            print(f"  MISMATCH {result['result']!r} != {expected!r}: {expression}")
+    return worst, slow, mismatches, expensive
+
+
+def run_throughput(calculator, rounds):
+    mix = [
+        "2 + 2", "15 * 4", "144 / 12", "2 ** 10", "sqrt(16) + 3", "sin(pi / 2)",
+        "(3 + 4) * (5 - 2)", "factorial(10)", "log10(1000) * 7", "0.15 * 240",
+    ]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for expression in mix:
+            legacy_eval(calculator, expression)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for expression in mix:
+            calculator._safe_eval(expression)
+    compiled = time.perf_counter() - start
+    return len(mix) * rounds, legacy, compiled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculator evaluator fuzz and benchmark")
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    calculator = CalculatorTool()
+    budget = args.budget_ms / 1000
+
+    print("adversarial inputs:")
+    adversarial_worst, adversarial_slow = run_adversarial(calculator, budget)
+
+    fuzz_worst, fuzz_slow, mismatches, expensive = run_fuzz(calculator, args.cases, budget, args.seed)
+    print(f"fuzz cases:         {args.cases} ({expensive} rejected as too expensive)")
+    print(f"worst case:         {max(adversarial_worst, fuzz_worst) * 1000:.2f} ms (budget {args.budget_ms:g} ms)")
+    print(f"mismatches vs eval: {mismatches}")
+
+    evaluations, legacy, compiled = run_throughput(calculator, args.rounds)
+    print(f"eval path:          {legacy / evaluations * 1e6:.2f} us/expression")
+    print(f"AST evaluator:      {compiled / evaluations * 1e6:.2f} us/expression")
+    print(f"speedup:            {legacy / compiled:.1f}x")
+
+    if adversarial_slow or fuzz_slow or mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Show that concurrent /ask requests overlap instead of queueing.
+
+Runs the FastAPI app in-process against the fake LLM backend with
+completions taking a fixed delay, fires N concurrent requests and compares the
+wall time with a single request. With a non-blocking LLM path both numbers
+should be roughly the same.
+
+    python benchmarks/concurrent_ask_bench.py --requests 20 --delay 0.5
+
+Lower ``--max-concurrency`` to see the in-flight cap (LLM_MAX_CONCURRENCY)
+turn the overlap back into waves.
+
+Exits non-zero if a request fails, if /health waits behind a completion,
+or if the concurrent run takes more than ``--max-ratio`` times a single
+request per wave of ``--max-concurrency`` (serialized requests would take
+``--requests`` times as long).
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+from typing import Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["RATE_LIMIT_RATE"] = "0"
+# measure the LLM path itself, not the answer cache
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+
+import httpx
+
+import main
+from agents.tutor_agent import TutorAgent
+from llm.fake import FakeBackend
+
+
+async def run(requests: int, delay: float, max_concurrency: int) -> Tuple[float, int, float]:
+    os.environ["LLM_MAX_CONCURRENCY"] = str(max_concurrency)
+    main.tutor = TutorAgent(backend=FakeBackend(latency=delay))
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        payload = {"question": "What is 25 + 17?"}
+
+        start = time.perf_counter()
+        response = await client.post("/ask", json=payload)
+        single = time.perf_counter() - start
+        response.raise_for_status()
+
+        # distinct questions, so single-flight coalescing does not merge them
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/ask", json={"question": f"What is 25 + {i}?"}) for i in range(requests)
+        ))
+        concurrent = time.perf_counter() - start
+        failures = sum(1 for r in responses if r.status_code != 200)
+
+        # /health must not wait behind an in-flight completion
+        pending = asyncio.ensure_future(client.post("/ask", json=payload))
+        await asyncio.sleep(delay / 10)
+        start = time.perf_counter()
+        health = await client.get("/health")
+        health_latency = time.perf_counter() - start
+        await pending
+
+    print(f"llm delay:             {delay:.3f}s")
+    print(f"1 request:             {single:.3f}s")
+    print(f"{requests} concurrent requests: {concurrent:.3f}s ({failures} failed)")
+    print(f"ratio:                 {concurrent / single:.2f}x")
+    print(f"/health under load:    {health.status_code} in {health_latency:.3f}s")
+    return concurrent / single, failures, health_latency
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-ratio", type=float, default=3.0,
+                        help="slowest allowed concurrent/single ratio per wave of --max-concurrency")
+    args = parser.parse_args()
+    ratio, failures, health_latency = asyncio.run(run(args.requests, args.delay, args.max_concurrency))
+
+    allowed = args.max_ratio * math.ceil(args.requests / max(1, args.max_concurrency))
+    problems = []
+    if failures:
+        problems.append(f"{failures} requests failed")
+    if ratio > allowed:
+        problems.append(f"ratio {ratio:.2f}x is above {allowed:.2f}x: requests are queueing")
+    if health_latency > args.delay / 2:
+        problems.append(f"/health took {health_latency:.3f}s behind a completion")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
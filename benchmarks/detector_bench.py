@@ -0,0 +1,112 @@
+"""Compare the shared detector engine with the old per-pattern regex loops.
+
+The legacy path is what the agents did before the engine existed: every
+detector rebuilt its pattern list, lowercased the query again and called
+re.search once per pattern, then the extractor searched the text again.
+The engine path is one uncached DetectorEngine scan per question.
+
+    python benchmarks/detector_bench.py --questions 100000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agents import chemistry_agent, math_agent, physics_agent
+from agents.detectors import engine
+
+TEMPLATES = [
+    "What is {a} + {b}?",
+    "Calculate {a} * {b}",
+    "what is {a} percent of {b}",
+    "What is the square root of {a}?",
+    "{a} squared",
+    "Convert {a} km to m",
+    "How many feet in {a} miles?",
+    "What is {a} celsius in fahrenheit?",
+    "What is the speed of light?",
+    "Explain the kinetic energy of a {a} kg ball",
+    "Tell me about {element}",
+    "What is the atomic number of {element}?",
+    "What is the molar mass of water?",
+    "Balance the equation for burning methane",
+    "Why is the sky blue?",
+    "How do I study effectively for my exams?",
+    "What elements are in group {small}?",
+]
+ELEMENTS = ["hydrogen", "carbon", "oxygen", "iron", "gold", "neon", "sodium", "copper"]
+
+
+def build_corpus(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            a=rng.randint(1, 999), b=rng.randint(1, 999),
+            element=rng.choice(ELEMENTS), small=rng.randint(1, 18)
+        )
+        for _ in range(size)
+    ]
+
+
+def legacy_scan(query):
+    """The pre-engine detection and extraction work for one question"""
+    lower = query.lower()
+    needs_calc = any(re.search(p, query.lower()) for p in list(math_agent.CALCULATION_PATTERNS))
+    if needs_calc:
+        for patterns in math_agent.EXTRACTION_PATTERNS.values():
+            if re.search(patterns[0], lower):
+                break
+    needs_conversion = any(re.search(p, query.lower()) for p in list(physics_agent.UNIT_CONVERSION_PATTERNS))
+    if needs_conversion:
+        for patterns in physics_agent.CONVERSION_EXTRACTORS.values():
+            if re.search(patterns[0], query.lower()):
+                break
+    any(keyword in query.lower() for keyword in list(physics_agent.CONSTANT_KEYWORDS))
+    any(keyword in query.lower() for keyword in list(physics_agent.FORMULA_KEYWORDS))
+    needs_table = any(re.search(p, query.lower()) for p in list(chemistry_agent.PERIODIC_TABLE_PATTERNS))
+    if needs_table:
+        for patterns in chemistry_agent.ELEMENT_EXTRACTORS.values():
+            if re.search(patterns[0], query.lower()):
+                break
+        else:
+            any(element in query.lower() for element in chemistry_agent.ELEMENT_NAMES)
+    any(re.search(p, query.lower()) for p in list(chemistry_agent.CHEMICAL_CALCULATION_PATTERNS))
+
+
+def engine_scan(query):
+    detections = engine.scan_uncached(query)
+    detections.first(math_agent.EXTRACTION_PATTERNS)
+    detections.first(physics_agent.CONVERSION_EXTRACTORS)
+    detections.first(chemistry_agent.ELEMENT_EXTRACTORS)
+
+
+def timed(fn, corpus):
+    start = time.perf_counter()
+    for query in corpus:
+        fn(query)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector engine micro-benchmark")
+    parser.add_argument("--questions", type=int, default=100000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.questions)
+    engine.scan_uncached(corpus[0])  # compile outside the timed loop
+
+    legacy = timed(legacy_scan, corpus)
+    combined = timed(engine_scan, corpus)
+    print(f"questions:          {len(corpus)}")
+    print(f"per-pattern loops:  {legacy:.2f}s ({legacy / len(corpus) * 1e6:.1f} us/question)")
+    print(f"detector engine:    {combined:.2f}s ({combined / len(corpus) * 1e6:.1f} us/question)")
+    print(f"speedup:            {legacy / combined:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
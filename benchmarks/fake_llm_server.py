@@ -0,0 +1,126 @@
+"""A local stand-in for the Gemini API that injects latency and errors.
+
+Serves ``generateContent`` and ``streamGenerateContent`` in the shape the
+google-genai client expects, so the real client (retries, hedging and the
+circuit breaker included) can be pointed at it with GEMINI_BASE_URL:
+
+    python benchmarks/fake_llm_server.py --port 8765 --latency 0.2 --error-rate 0.2
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake uvicorn main:app
+
+Answers, latency and errors come from ``llm.fake.FakeBackend`` (the same
+fake that LLM_BACKEND=fake runs in-process): latency drawn from
+``--distribution`` around ``--latency`` seconds, a ``--slow-rate`` share
+taking ``--slow-latency`` for a long tail worth hedging, and an
+``--error-rate`` share failing with ``--error-status``.
+``GET/POST /fake/config`` reads or changes these while the server runs
+(e.g. ``{"error_rate": 1}`` for an outage) and ``GET /fake/stats`` counts
+what was served.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from llm.fake import DISTRIBUTIONS, FakeBackend, FakeLLMError
+
+app = FastAPI(title="Fake LLM server")
+backend = FakeBackend(latency=0.05)
+
+
+def configure(**settings: Any) -> Dict[str, Any]:
+    return backend.configure(**settings)
+
+
+def _prompt(body: Dict[str, Any]) -> str:
+    return "".join(part.get('text', '') for content in body.get('contents', [])
+                   for part in content.get('parts', []))
+
+
+def _payload(text: str, prompt_tokens=None, completion_tokens=None) -> Dict[str, Any]:
+    payload = {
+        'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP'}],
+        'modelVersion': 'fake',
+    }
+    if prompt_tokens is not None:
+        payload['usageMetadata'] = {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': completion_tokens,
+                                    'totalTokenCount': prompt_tokens + completion_tokens}
+    return payload
+
+
+@app.exception_handler(HTTPException)
+async def _error(request: Request, exc: HTTPException):
+    # Google APIs wrap errors as {"error": {...}}
+    body = {'error': exc.detail} if isinstance(exc.detail, dict) else {'error': {'message': exc.detail}}
+    return JSONResponse(body, status_code=exc.status_code)
+
+
+@app.post("/{version}/models/{model_action}")
+async def models(version: str, model_action: str, request: Request):
+    model, _, action = model_action.partition(':')
+    prompt = _prompt(await request.json())
+    try:
+        if action == 'generateContent':
+            return _payload(*await backend.generate(prompt, model))
+        if action == 'streamGenerateContent':
+            chunks = await backend.open_stream(prompt, model)
+
+            async def events():
+                async for chunk in chunks:
+                    yield f"data: {json.dumps(_payload(*chunk))}\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+    except FakeLLMError as e:
+        raise HTTPException(status_code=e.code, detail={
+            'code': e.code, 'message': 'Injected failure', 'status': e.status
+        })
+    raise HTTPException(status_code=404, detail=f"Unknown action '{action}' for {model}")
+
+
+@app.get("/fake/config")
+async def get_config():
+    return backend.settings()
+
+
+@app.post("/fake/config")
+async def set_config(values: Dict[str, Any]):
+    try:
+        return configure(**values)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/fake/stats")
+async def stats():
+    stats = backend.stats()
+    return {'requests': stats['calls'], 'errors': stats['errors']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini API with injected latency and errors")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="typical seconds per response")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--spread", type=float, default=0.0, help="uniform half-width or lognormal sigma")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of slow responses")
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of failed responses")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    configure(latency=args.latency, distribution=args.distribution, spread=args.spread,
+              slow_rate=args.slow_rate, slow_latency=args.slow_latency, error_rate=args.error_rate,
+              error_status=args.error_status, seed=args.seed)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
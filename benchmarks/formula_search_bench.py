@@ -0,0 +1,92 @@
+"""Formula search over a large synthetic library: BM25 index vs the old substring scan.
+
+Pads the bundled formulas with generated entries up to --formulas, then
+times the old search (every query word against every field of every
+formula) against the inverted index, and reports how many formulas each
+returns per query, which is what ends up in the physics prompt.
+
+    python benchmarks/formula_search_bench.py --formulas 5000 --queries 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.physics_formula_tool import DEFAULT_FORMULAS_PATH, PhysicsFormulaTool
+
+WORDS = ("thermal flux density pressure volume charge current field magnetic induction "
+         "orbital period angular torque inertia buoyancy viscosity entropy heat capacity "
+         "photon intensity lens focal refraction decay half life nuclear fission").split()
+CATEGORIES = ["Mechanics", "Thermodynamics", "Electromagnetism", "Optics", "Modern Physics", "Fluids"]
+QUERIES = [
+    "what is the kinetic energy of a 2 kg ball moving at 3 m/s",
+    "explain ohm's law", "how do I find the momentum of a car",
+    "the force on a spring", "gravitational force between two masses",
+    "what is the wavelength of a wave", "power of a motor doing work",
+    "magnetic field of a current", "half life of nuclear decay",
+]
+
+
+def synthetic_library(size, seed=0):
+    rng = random.Random(seed)
+    with open(DEFAULT_FORMULAS_PATH, encoding='utf-8') as f:
+        formulas = json.load(f)
+    while len(formulas) < size:
+        words = rng.sample(WORDS, 3)
+        formulas[f"{'_'.join(words)}_{len(formulas)}"] = {
+            'formula': 'X = a * b',
+            'description': f"{words[0].title()} {words[1]} in terms of {words[2]}",
+            'variables': {'X': f"{words[0].title()} ({rng.choice(['J', 'N', 'W', 'm'])})", 'a': words[1], 'b': words[2]},
+            'category': rng.choice(CATEGORIES),
+        }
+    return formulas
+
+
+def legacy_search(formulas, query):
+    matching = {}
+    for name, data in formulas.items():
+        for word in query.lower().strip().split():
+            if (word in name or word in data['description'].lower() or word in data['category'].lower()
+                    or any(word in var.lower() for var in data['variables'].values())
+                    or any(word in key.lower() for key in data['variables'].keys())):
+                matching[name] = data
+                break
+    return matching
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Formula search benchmark")
+    parser.add_argument("--formulas", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    formulas = synthetic_library(args.formulas)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+        json.dump(formulas, f)
+    start = time.perf_counter()
+    tool = PhysicsFormulaTool(path=f.name)
+    build = time.perf_counter() - start
+    os.unlink(f.name)
+
+    queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+    start = time.perf_counter()
+    legacy_hits = [len(legacy_search(formulas, q)) for q in queries]
+    legacy = time.perf_counter() - start
+    start = time.perf_counter()
+    index_hits = [len(tool.search_formulas(q)) for q in queries]
+    indexed = time.perf_counter() - start
+
+    print(f"formulas:            {len(formulas)} (index built in {build * 1000:.0f} ms)")
+    print(f"substring scan:      {legacy / len(queries) * 1e3:.2f} ms/query, {sum(legacy_hits) / len(queries):.0f} formulas returned")
+    print(f"BM25 index:          {indexed / len(queries) * 1e3:.3f} ms/query, {sum(index_hits) / len(queries):.1f} formulas returned")
+    print(f"speedup:             {legacy / indexed:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
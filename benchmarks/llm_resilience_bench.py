@@ -0,0 +1,174 @@
+"""Compare the LLM client with and without retries, hedging and the circuit breaker.
+
+Starts benchmarks/fake_llm_server.py in a background thread and points the
+real google-genai client at it, then runs three scenarios:
+
+  * transient errors: a share of calls fail with a retryable status;
+    retries with jittered backoff should turn most of them into successes;
+  * long tail: a few calls are very slow; hedging after the p95 latency
+    should cut the p99;
+  * outage: every call fails; with the breaker, requests stop waiting on
+    the upstream and math questions come back as tool-only answers.
+
+    python benchmarks/llm_resilience_bench.py --calls 500 --error-rate 0.2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+
+import uvicorn
+from google import genai
+
+from benchmarks import fake_llm_server
+from agents.tutor_agent import TutorAgent
+from llm.client import LLMClient
+from llm.resilience import CircuitBreaker, ResilientCaller, RetryPolicy
+
+
+def start_server(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(fake_llm_server.app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def gateway(port: int, resilience: ResilientCaller) -> LLMClient:
+    client = genai.Client(api_key="fake", http_options={'base_url': f"http://127.0.0.1:{port}"})
+    return LLMClient(client, max_concurrency=64, resilience=resilience)
+
+
+def no_resilience() -> ResilientCaller:
+    # one attempt and a breaker that never opens: the client as it was
+    return ResilientCaller(retry=RetryPolicy(max_attempts=1), breaker=CircuitBreaker(failure_threshold=10 ** 9))
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def fire(llm: LLMClient, calls: int, concurrency: int):
+    """Run ``calls`` completions, ``concurrency`` at a time; latencies of successes and the failure count"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await llm.generate(f"Question {i}")
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return latencies, failures
+
+
+def report(label: str, latencies, failures: int, calls: int, llm: LLMClient) -> None:
+    stats = llm.stats()
+    if latencies:
+        timing = (f"p50 {statistics.median(latencies) * 1e3:6.0f}ms  p95 {percentile(latencies, 0.95) * 1e3:6.0f}ms  "
+                  f"p99 {percentile(latencies, 0.99) * 1e3:6.0f}ms")
+    else:
+        timing = "no successes"
+    print(f"  {label:<16} ok {calls - failures:>4}/{calls}  {timing}  "
+          f"retries {stats['retries']:>3}  hedges {stats['hedges']:>3}")
+
+
+async def transient_errors(port: int, args) -> None:
+    print(f"transient errors ({args.error_rate:.0%} fail with 503)")
+    for label, resilience in (
+        ("no retries", no_resilience()),
+        ("retries", ResilientCaller(retry=RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=0.5),
+                                    breaker=CircuitBreaker(failure_threshold=50))),
+    ):
+        fake_llm_server.configure(latency=args.latency, distribution='uniform', spread=args.latency / 4,
+                                  slow_rate=0.0, error_rate=args.error_rate, error_status=503, seed=args.seed)
+        llm = gateway(port, resilience)
+        latencies, failures = await fire(llm, args.calls, args.concurrency)
+        report(label, latencies, failures, args.calls, llm)
+
+
+async def long_tail(port: int, args) -> None:
+    print(f"long tail ({args.slow_rate:.0%} of calls take {args.slow_latency:.1f}s)")
+    for label, hedge in (("no hedging", False), ("hedging", True)):
+        fake_llm_server.configure(latency=args.latency, distribution='uniform', spread=args.latency / 4,
+                                  slow_rate=args.slow_rate, slow_latency=args.slow_latency, error_rate=0.0,
+                                  seed=args.seed)
+        resilience = ResilientCaller(hedge=hedge, hedge_min_delay=args.latency * 2)
+        llm = gateway(port, resilience)
+        # warm up the latency window the hedge delay is taken from
+        await fire(llm, resilience.hedge_min_samples, args.concurrency)
+        resilience.counters.update(dict.fromkeys(resilience.counters, 0))
+        latencies, failures = await fire(llm, args.calls, args.concurrency)
+        report(label, latencies, failures, args.calls, llm)
+
+
+async def outage(port: int, args) -> None:
+    print("outage (every call fails), math questions through the tutor")
+    fake_llm_server.configure(latency=args.latency, distribution='fixed', slow_rate=0.0, error_rate=1.0,
+                              error_status=503, seed=args.seed)
+    questions = [f"Calculate {n} * 17 and explain the steps" for n in range(2, 2 + args.outage_requests)]
+    os.environ["GEMINI_API_KEY"] = "fake"
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{port}"
+    for label, settings in (
+        ("no breaker", {"LLM_MAX_ATTEMPTS": "1", "LLM_BREAKER_FAILURES": str(10 ** 9)}),
+        ("breaker", {"LLM_MAX_ATTEMPTS": "2", "LLM_RETRY_BASE_DELAY": "0.05", "LLM_BREAKER_FAILURES": "3"}),
+    ):
+        # configured the way a deployment would be, through the environment
+        os.environ.update(settings)
+        tutor = TutorAgent()
+        latencies, answered, tool_only = [], 0, 0
+        for question in questions:
+            start = time.perf_counter()
+            try:
+                result = await tutor.process_query(question)
+                answered += 1
+                tool_only += result.get('tool_only', False)
+            except Exception:
+                pass
+            latencies.append(time.perf_counter() - start)
+        stats = tutor.llm.stats()
+        print(f"  {label:<16} answered {answered:>3}/{len(questions)} (tool-only {tool_only:>3})  "
+              f"mean {statistics.mean(latencies) * 1e3:6.0f}ms  upstream attempts {stats['attempts']:>3}  "
+              f"breaker {stats['breaker_state']}")
+
+
+async def run(args) -> None:
+    server = start_server(args.port)
+    try:
+        await transient_errors(args.port, args)
+        await long_tail(args.port, args)
+        await outage(args.port, args)
+    finally:
+        server.should_exit = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM client resilience benchmark")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="typical fake LLM latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--outage-requests", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
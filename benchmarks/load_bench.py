@@ -0,0 +1,326 @@
+"""Load-test /ask at fixed concurrency levels, offline.
+
+Runs the FastAPI app against the fake LLM backend (``llm.fake.FakeBackend``:
+no key, no network) either in-process over ASGI or as a uvicorn server in
+a subprocess on a local socket (LLM_BACKEND=fake, configured through the
+FAKE_LLM_* variables). At each level ``--concurrency`` clients keep one request in
+flight each until ``--requests`` have been answered. Reports throughput,
+p50/p95/p99 latency and where the time went per pipeline stage (from the
+``tutor_stage_duration_seconds`` histogram on /metrics), and can store the results as
+JSON and compare them with an earlier run:
+
+    python benchmarks/load_bench.py --mode asgi,socket --concurrency 1,8,32,64 --requests 400 \
+        --latency 0.05 --output benchmarks/results/load.json
+    python benchmarks/load_bench.py --compare benchmarks/results/load.json
+
+The answer cache is off unless ``--cache`` is given, and every question is
+distinct, so single-flight coalescing does not merge requests either.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ["LLM_BACKEND"] = "fake"
+# every request comes from one client, which the per-client rate limit would throttle
+os.environ.setdefault("RATE_LIMIT_RATE", "0")
+
+import httpx
+
+# question templates across the agents; {n} keeps every request distinct
+QUESTIONS = [
+    "Calculate {n} * 17 and explain the steps",
+    "What is the square root of {n}?",
+    "Convert {n} meters to feet",
+    "What force accelerates a {n} kg mass at 2 m/s^2?",
+    "What is the molar mass of H2SO4 for {n} moles?",
+    "Tell me about element number {m}",
+    "How many hours should I study for exam number {n}?",
+    "Explain photosynthesis to student {n}",
+]
+
+
+def question(i: int) -> str:
+    return QUESTIONS[i % len(QUESTIONS)].format(n=i + 1, m=i % 100 + 1)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+_STAGE_SAMPLE = re.compile(
+    r'^tutor_stage_duration_seconds_(bucket|sum)\{stage="([^"]+)"(?:,le="([^"]+)")?\} (\S+)$', re.MULTILINE)
+
+Snapshot = Dict[str, Dict[str, float]]
+
+
+async def stage_snapshot(client: httpx.AsyncClient) -> Snapshot:
+    """{stage: {bucket bound or 'sum': value}} scraped from /metrics (bucket counts are cumulative)"""
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    stages: Snapshot = {}
+    for kind, stage, le, value in _STAGE_SAMPLE.findall(response.text):
+        stages.setdefault(stage, {})[le if kind == 'bucket' else 'sum'] = float(value)
+    return stages
+
+
+def stage_breakdown(before: Snapshot, after: Snapshot) -> Dict[str, Dict[str, Any]]:
+    """Count, mean and bucket-resolution p95 per stage between two snapshots"""
+    stages = {}
+    for stage, samples in after.items():
+        old = before.get(stage, {})
+        count = samples.get('+Inf', 0) - old.get('+Inf', 0)
+        if not count:
+            continue
+        p95 = None
+        for le in sorted((le for le in samples if le != 'sum'), key=float):
+            if samples[le] - old.get(le, 0) >= 0.95 * count:
+                # the upper bound of the bucket the 95th percentile falls in
+                p95 = round(float(le) * 1000, 3) if le != '+Inf' else None
+                break
+        stages[stage] = {
+            'count': int(count),
+            'mean_ms': round((samples.get('sum', 0) - old.get('sum', 0)) / count * 1000, 3),
+            'p95_ms': p95,
+        }
+    return stages
+
+
+async def drive(client: httpx.AsyncClient, concurrency: int, requests: int, offset: int) -> Tuple[List[float], int, float]:
+    """Closed loop: ``concurrency`` workers, each sending its next request when the last one returns"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post("/ask", json={"question": question(offset + i)})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def fake_env(args) -> Dict[str, str]:
+    """The FAKE_LLM_* settings for this run, as LLM_BACKEND=fake reads them"""
+    return {
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "FAKE_LLM_DISTRIBUTION": args.distribution,
+        "FAKE_LLM_SPREAD": str(args.spread),
+        "FAKE_LLM_SLOW_RATE": str(args.slow_rate),
+        "FAKE_LLM_SLOW_LATENCY": str(args.slow_latency),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "FAKE_LLM_SEED": str(args.seed),
+    }
+
+
+async def run_level(client: httpx.AsyncClient, args, concurrency: int, offset: int) -> Dict[str, Any]:
+    # warm up, then measure
+    await drive(client, concurrency, min(concurrency, args.requests), offset)
+    before = await stage_snapshot(client)
+    latencies, errors, seconds = await drive(client, concurrency, args.requests, offset + concurrency)
+    stages = stage_breakdown(before, await stage_snapshot(client))
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(seconds, 4),
+        'throughput_rps': round(len(latencies) / seconds, 2),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+        'stages': stages,
+    }
+
+
+async def run_asgi(args, concurrency: int, offset: int) -> Dict[str, Any]:
+    import main
+    from agents.tutor_agent import TutorAgent
+    # a fresh agent per level, so one level's queue never spills into the next
+    main.tutor = TutorAgent()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+        return await run_level(client, args, concurrency, offset)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServerProcess:
+    """``uvicorn main:app`` in its own process, so the server never competes with the client for the GIL"""
+
+    def __init__(self, env: Dict[str, str]):
+        self.port = free_port()
+        self.env = env
+        self.log = tempfile.TemporaryFile()
+        self.process: Optional[subprocess.Popen] = None
+
+    async def __aenter__(self) -> str:
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=ROOT, env=self.env, stdout=self.log, stderr=subprocess.STDOUT)
+        base_url = f"http://127.0.0.1:{self.port}"
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            for _ in range(300):
+                if self.process.poll() is not None:
+                    self.log.seek(0)
+                    raise RuntimeError(f"server exited with {self.process.returncode}:\n"
+                                       + self.log.read().decode(errors='replace')[-2000:])
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        return base_url
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+        raise RuntimeError("server did not start within 30s")
+
+    async def __aexit__(self, *exc) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+async def run_socket(args, concurrency: int, offset: int) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with ServerProcess(dict(os.environ)) as base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            return await run_level(client, args, concurrency, offset)
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'mode':<7}{'conc':>5}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}  stages (mean ms)")
+    for r in results:
+        latency = r['latency_ms']
+        stages = ", ".join(f"{name} {s['mean_ms']:.2f}" for name, s in sorted(r['stages'].items()))
+        print(f"{r['mode']:<7}{r['concurrency']:>5}{r['throughput_rps']:>10.1f}{latency['p50']:>10.1f}"
+              f"{latency['p95']:>10.1f}{latency['p99']:>10.1f}{r['errors']:>8}  {stages}")
+
+
+def print_comparison(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    """Change from ``old`` to ``new`` for every (mode, concurrency) level both runs have"""
+    previous = {(r['mode'], r['concurrency']): r for r in old['results']}
+    print(f"\ncompared with {old.get('commit', '?')} ({old.get('timestamp', '?')})")
+    print(f"{'mode':<7}{'conc':>5}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+
+    def change(before: float, after: float) -> str:
+        return f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+
+    for r in new['results']:
+        base = previous.get((r['mode'], r['concurrency']))
+        if base is None:
+            continue
+        print(f"{r['mode']:<7}{r['concurrency']:>5}{change(base['throughput_rps'], r['throughput_rps']):>10}"
+              + "".join(f"{change(base['latency_ms'][q], r['latency_ms'][q]):>10}" for q in ('p50', 'p95', 'p99')))
+
+
+async def run(args) -> Dict[str, Any]:
+    if not args.cache:
+        os.environ["ANSWER_CACHE_BACKEND"] = "none"
+    if args.max_concurrency:
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    # the in-process app and the server subprocess both build their fake from these
+    os.environ.update(fake_env(args))
+    runners = {'asgi': run_asgi, 'socket': run_socket}
+    results = []
+    offset = 0
+    for mode in args.mode.split(','):
+        for concurrency in (int(level) for level in args.concurrency.split(',')):
+            result = await runners[mode](args, concurrency, offset)
+            results.append({'mode': mode, **result})
+            # later levels ask new questions, in case the cache is on
+            offset += args.requests + concurrency
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'config': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')},
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline /ask load benchmark")
+    parser.add_argument("--mode", default="asgi,socket", help="comma-separated: asgi, socket")
+    parser.add_argument("--concurrency", default="1,8,32,64", help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=400, help="measured requests per level")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM seconds per completion")
+    parser.add_argument("--distribution", default="lognormal", help="fixed, uniform, exponential or lognormal")
+    parser.add_argument("--spread", type=float, default=0.3, help="uniform half-width or lognormal sigma")
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-concurrency", type=int, default=None, help="LLM_MAX_CONCURRENCY for the run")
+    parser.add_argument("--cache", action="store_true", help="leave the answer cache on")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--compare", help="a results JSON from an earlier run to compare with")
+    args = parser.parse_args()
+    if any(mode not in ('asgi', 'socket') for mode in args.mode.split(',')):
+        parser.error("--mode takes asgi and/or socket")
+
+    results = asyncio.run(run(args))
+    print_results(results['results'])
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Measure what the /metrics instrumentation costs per request.
+
+Times the individual operations (counter increment, histogram observation,
+stage timer, tool timer), then runs the same questions through the tutor
+pipeline against the zero-latency fake LLM backend with metrics enabled
+and disabled, alternating, and reports the difference per request. The
+HTTP middleware is timed separately around a bare ASGI app.
+
+    python benchmarks/metrics_overhead_bench.py --requests 500 --rounds 21 --budget-us 5
+
+Exits non-zero if the per-request overhead exceeds ``--budget-us``.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import timeit
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# measure the pipeline itself, not the answer cache
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+
+from agents.tutor_agent import TutorAgent
+from core.metrics import HTTPMetricsMiddleware, registry, routes, stage_seconds, tool_call
+from llm.fake import FakeBackend
+
+QUESTIONS = [
+    "Calculate 12 * 17 and explain the steps",
+    "Tell me about hydrogen",
+    "What is the speed of light?",
+    "What is the molar mass of H2SO4?",
+    "How do I study effectively?",
+]
+
+
+def per_operation(number: int) -> None:
+    timer = stage_seconds.time('tools')
+
+    def timed_stage():
+        with timer:
+            pass
+
+    def timed_tool():
+        with tool_call('Calculator') as call:
+            call.hit = True
+
+    for label, statement in (
+        ("counter inc", lambda: routes.inc('math', 'local')),
+        ("histogram observe", lambda: stage_seconds.observe(0.0123, 'tools')),
+        ("stage timer", timed_stage),
+        ("tool timer", timed_tool),
+    ):
+        seconds = min(timeit.repeat(statement, number=number, repeat=5)) / number
+        print(f"  {label:<18} {seconds * 1e9:7.0f} ns")
+
+
+async def pipeline_seconds(tutor: TutorAgent, requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        await tutor.process_query(QUESTIONS[i % len(QUESTIONS)])
+    return (time.perf_counter() - start) / requests
+
+
+async def bare_app(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def asgi_seconds(app, requests: int) -> float:
+    scope = {'type': 'http', 'path': '/ask', 'route': SimpleNamespace(path='/ask')}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+async def compare(measure, requests: int, rounds: int):
+    """Per-request time with metrics on and off, in back-to-back pairs so drift hits both.
+
+    Returns the median of each and the median paired difference.
+    """
+    on, off = [], []
+    for _ in range(rounds):
+        for enabled, results in ((True, on), (False, off)):
+            registry.enabled = enabled
+            results.append(await measure(requests))
+    registry.enabled = True
+    return statistics.median(on), statistics.median(off), statistics.median(a - b for a, b in zip(on, off))
+
+
+async def run(args) -> None:
+    print("per operation")
+    per_operation(args.operations)
+
+    tutor = TutorAgent(backend=FakeBackend())
+    await pipeline_seconds(tutor, len(QUESTIONS) * 20)
+    on, off, pipeline_overhead = await compare(lambda n: pipeline_seconds(tutor, n), args.requests, args.rounds)
+    print(f"pipeline: {off * 1e6:8.1f} us/request without metrics, {on * 1e6:8.1f} us with "
+          f"({pipeline_overhead * 1e6:+.2f} us)")
+
+    # the middleware's wrapping costs even with the registry off, so compare against no middleware at all
+    middleware = HTTPMetricsMiddleware(bare_app)
+    with_middleware, without = [], []
+    for _ in range(args.rounds):
+        with_middleware.append(await asgi_seconds(middleware, args.requests * 10))
+        without.append(await asgi_seconds(bare_app, args.requests * 10))
+    middleware_overhead = statistics.median(a - b for a, b in zip(with_middleware, without))
+    print(f"http middleware: {middleware_overhead * 1e6:+.2f} us/request")
+
+    total = pipeline_overhead + middleware_overhead
+    print(f"total overhead: {total * 1e6:.2f} us/request (budget {args.budget_us:.1f} us)")
+    if total * 1e6 > args.budget_us:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics instrumentation overhead benchmark")
+    parser.add_argument("--requests", type=int, default=500, help="pipeline requests per round")
+    parser.add_argument("--rounds", type=int, default=21)
+    parser.add_argument("--operations", type=int, default=200000, help="iterations per operation timing")
+    parser.add_argument("--budget-us", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Show interactive latency and tenant fairness while bulk batch jobs run.
+
+Runs the app in-process against the fake LLM backend. Two tenants run
+batch jobs through /ask/batch for ``--seconds`` (school-a with
+``--heavy-jobs`` jobs at once, school-b with one) while ``--users``
+interactive users each ask a question every ``--think`` seconds. Runs once
+with LLM_SCHEDULER=fifo (one queue for every LLM call) and once with the
+priority scheduler, and reports the users' latency, how many LLM calls
+each batch tenant got and the queue wait from the metrics.
+
+    python benchmarks/priority_bench.py --seconds 15 --latency 0.5 --users 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+# this compares LLM scheduling; keep the HTTP admission limits out of the way
+os.environ["RATE_LIMIT_RATE"] = "0"
+os.environ["ADMISSION_MAX_CONCURRENT"] = "0"
+
+import httpx
+
+import main
+from agents.tutor_agent import TutorAgent
+from core.metrics import llm_queue_seconds
+from llm.fake import FakeBackend
+from llm.scheduler import current_priority
+
+
+class TenantCountingBackend(FakeBackend):
+    """The fake, counting completions per tenant"""
+
+    def __init__(self, **settings):
+        super().__init__(**settings)
+        self.per_tenant = {}
+
+    async def generate(self, prompt, model):
+        tenant = current_priority()[1]
+        self.per_tenant[tenant] = self.per_tenant.get(tenant, 0) + 1
+        return await super().generate(prompt, model)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+def mean_wait(before, lane: str) -> str:
+    series = llm_queue_seconds.labels(lane)
+    count = sum(series.counts) - before[lane][0]
+    return f"{(series.sum - before[lane][1]) / count * 1000:5.0f} ms" if count else "    -   "
+
+
+async def scenario(args, mode: str) -> None:
+    os.environ["LLM_SCHEDULER"] = mode
+    backend = TenantCountingBackend(latency=args.latency)
+    main.tutor = TutorAgent(backend=backend)
+    lanes = ('interactive', 'batch')
+    before = {lane: (sum(llm_queue_seconds.labels(lane).counts), llm_queue_seconds.labels(lane).sum) for lane in lanes}
+    transport = httpx.ASGITransport(app=main.app)
+    stop = time.perf_counter() + args.seconds
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def job(tenant: str, j: int):
+            n = 0
+            while time.perf_counter() < stop:
+                questions = [f"Explain worksheet item {tenant[-1]}{j}-{n}-{q}" for q in range(args.batch_size)]
+                n += 1
+                await client.post("/ask/batch", json={"questions": questions}, headers={"X-API-Key": tenant})
+
+        async def user(u: int):
+            i = 0
+            # let the batch jobs fill the queue first
+            await asyncio.sleep(1.0)
+            while time.perf_counter() < stop:
+                i += 1
+                start = time.perf_counter()
+                r = await client.post("/ask", json={"question": f"Explain topic {u}-{i}"},
+                                      headers={"X-API-Key": f"user-{u}"})
+                if r.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(args.think)
+
+        await asyncio.gather(*(job('school-a', j) for j in range(args.heavy_jobs)), job('school-b', 0),
+                             *(user(u) for u in range(args.users)))
+
+    print(f"{mode:<9} users: {len(latencies):3d} answers  p50 {statistics.median(latencies) * 1000:6.0f} ms  "
+          f"p95 {percentile(latencies, 0.95) * 1000:6.0f} ms   "
+          f"LLM calls school-a {backend.per_tenant.get('key:school-a', 0):4d} school-b {backend.per_tenant.get('key:school-b', 0):4d}   "
+          f"mean queue wait interactive {mean_wait(before, 'interactive')} batch {mean_wait(before, 'batch')}")
+
+
+async def run(args) -> None:
+    print(f"fake LLM latency {args.latency:.2f}s, LLM_MAX_CONCURRENCY {os.getenv('LLM_MAX_CONCURRENCY', '16')}, "
+          f"batches of {args.batch_size}")
+    for mode in ('fifo', 'priority'):
+        await scenario(args, mode)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM seconds per completion")
+    parser.add_argument("--batch-size", type=int, default=40)
+    parser.add_argument("--heavy-jobs", type=int, default=3, help="concurrent batch jobs of school-a")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--think", type=float, default=1.0, help="users' pause between questions")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,136 @@
+"""Benchmark the equation balancer on reactions with up to ~20 species.
+
+Random reactions are generated with a known balance: reactants with random
+compositions and coefficients, whose atoms are split among the products.
+Each one is balanced cold (caches cleared) and then again from the
+reaction cache, and the coefficients are checked against the known
+solution. A few textbook reactions are checked against their published
+coefficients first.
+
+    python benchmarks/reaction_balance_bench.py --reactions 200 --max-species 20
+
+Exits non-zero if any reaction comes back with the wrong coefficients.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.chemical_formula import parse_formula
+from tools.reactions import ReactionError, _balance_normalized, balance, normalize_reaction
+
+KNOWN = {
+    "H2 + O2 -> H2O": (2, 1, 2),
+    "C6H12O6 + O2 -> CO2 + H2O": (1, 6, 6, 6),
+    "KMnO4 + HCl -> KCl + MnCl2 + H2O + Cl2": (2, 16, 2, 2, 8, 5),
+    "Cu + HNO3 -> Cu(NO3)2 + NO + H2O": (3, 8, 3, 2, 4),
+    "MnO4- + Fe2+ + H+ -> Mn2+ + Fe3+ + H2O": (1, 5, 8, 1, 5, 4),
+    "K4Fe(CN)6 + KMnO4 + H2SO4 -> KHSO4 + Fe2(SO4)3 + MnSO4 + HNO3 + CO2 + H2O": (10, 122, 299, 162, 5, 122, 60, 60, 188),
+}
+
+SYMBOLS = ["C", "H", "O", "N", "S", "P", "K", "Na", "Cl", "Ca", "Mg", "Fe", "Cu", "Zn", "Mn",
+           "Al", "Si", "Br", "I", "F", "B", "Li", "Ba", "Cr", "Co", "Ni", "Sn", "Pb", "Ag"]
+
+
+def write_formula(counts):
+    return "".join(f"{symbol}{count if count > 1 else ''}" for symbol, count in counts.items())
+
+
+def random_reaction(rng, species):
+    """A reaction with ``species`` species and the coefficients that balance it"""
+    elements = rng.sample(SYMBOLS, species - 1)
+    reactant_count = rng.randint(max(1, species // 3), species - 1)
+    reactants, coefficients, totals = [], [], {}
+    for i in range(reactant_count):
+        chosen = {elements[i]} if i < len(elements) else set()
+        chosen |= set(rng.sample(elements, rng.randint(1, min(3, len(elements)))))
+        counts = {symbol: rng.randint(1, 4) for symbol in elements if symbol in chosen}
+        coefficient = rng.randint(1, 6)
+        reactants.append(counts)
+        coefficients.append(coefficient)
+        for symbol, count in counts.items():
+            totals[symbol] = totals.get(symbol, 0) + coefficient * count
+    # every element must occur; put leftovers into the first reactant
+    for symbol in elements:
+        if symbol not in totals:
+            reactants[0][symbol] = 1
+            totals[symbol] = coefficients[0]
+
+    # split the atoms among the products (each product coefficient 1)
+    product_count = species - reactant_count
+    products = [dict() for _ in range(product_count)]
+    for symbol, total in totals.items():
+        cuts = sorted(rng.randint(0, total) for _ in range(product_count - 1))
+        shares = [b - a for a, b in zip([0] + cuts, cuts + [total])]
+        for product, share in zip(products, shares):
+            if share:
+                product[symbol] = share
+    if any(not product for product in products):
+        return None
+    names = [write_formula(counts) for counts in reactants + products]
+    if len(set(names)) != len(names):
+        return None
+    reaction = " + ".join(names[:reactant_count]) + " -> " + " + ".join(names[reactant_count:])
+    return reaction, tuple(coefficients + [1] * product_count)
+
+
+def proportional(a, b):
+    return len(a) == len(b) and all(x * b[0] == y * a[0] for x, y in zip(a, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Equation balancer benchmark")
+    parser.add_argument("--reactions", type=int, default=200, help="random reactions per species count")
+    parser.add_argument("--max-species", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures = 0
+    for reaction, expected in KNOWN.items():
+        coefficients = balance(reaction).coefficients
+        ok = coefficients == expected
+        failures += not ok
+        print(f"  {'ok  ' if ok else 'FAIL'} {balance(reaction).equation}")
+
+    rng = random.Random(args.seed)
+    print(f"{'species':>7}  {'reactions':>9}  {'cold p50':>9}  {'cold max':>9}  {'cached':>8}")
+    for species in range(4, args.max_species + 1, 2):
+        cold, warm = [], []
+        done = 0
+        while done < args.reactions:
+            generated = random_reaction(rng, species)
+            if generated is None:
+                continue
+            reaction, expected = generated
+            _balance_normalized.cache_clear()
+            normalize_reaction.cache_clear()
+            parse_formula.cache_clear()
+            start = time.perf_counter()
+            try:
+                coefficients = balance(reaction).coefficients
+            except ReactionError:
+                # a random composition can leave several independent balances
+                continue
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            balance(reaction)
+            warm.append(time.perf_counter() - start)
+            if not proportional(coefficients, expected):
+                failures += 1
+                print(f"  WRONG {coefficients} for {reaction}")
+            done += 1
+        print(f"{species:>7}  {done:>9}  {statistics.median(cold) * 1e3:>7.2f}ms  "
+              f"{max(cold) * 1e3:>7.2f}ms  {statistics.median(warm) * 1e6:>6.1f}us")
+
+    print(f"wrong balances: {failures}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Record a query log's LLM traffic once, then replay it against any build.
+
+``--record`` runs every question through the tutor with the configured
+backend (LLM_BACKEND, the offline fake unless set) and appends each LLM
+call to a cassette. ``--replay`` answers the same questions from that
+cassette instead, with the recorded latencies (or none, ``--no-latency``),
+and reports throughput, latency percentiles, cassette misses (prompts that
+changed since the recording) and the route and tool path of every
+question. Store a run with ``--output`` and diff a later build against it
+with ``--compare``:
+
+    python benchmarks/replay_bench.py --record benchmarks/results/cassette.jsonl
+    python benchmarks/replay_bench.py --replay benchmarks/results/cassette.jsonl --output benchmarks/results/replay.json
+    python benchmarks/replay_bench.py --replay benchmarks/results/cassette.jsonl --compare benchmarks/results/replay.json
+
+The query log is one question per line, or JSON lines with a ``question``
+(or ``query``) field; it defaults to the classifier's labeled queries.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("LLM_BACKEND", "fake")
+# a hedge would take a second recording of the same prompt out of turn
+os.environ["LLM_HEDGE"] = "false"
+
+
+def read_queries(path: str, limit: int) -> List[str]:
+    questions = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                line = record.get('question') or record.get('query') or ''
+            if line:
+                questions.append(line)
+    return questions[:limit] if limit else questions
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def answer_all(tutor, questions: List[str], concurrency: int) -> List[Dict[str, Any]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(question: str) -> Dict[str, Any]:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await tutor.process_query(question)
+                outcome = {
+                    'agent': result.get('agent_used'),
+                    'tools': result.get('tools_used', []),
+                    'tool_only': result.get('tool_only', False),
+                    'degraded': result.get('degraded', []),
+                    'error': None,
+                }
+            except Exception as e:
+                outcome = {'agent': None, 'tools': [], 'tool_only': False, 'degraded': [],
+                           'error': type(e).__name__}
+            return {'question': question, 'ms': round((time.perf_counter() - start) * 1000, 3), **outcome}
+
+    return await asyncio.gather(*(answer(q) for q in questions))
+
+
+def summarize(answers: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+    latencies = sorted(a['ms'] for a in answers)
+    return {
+        'questions': len(answers),
+        'errors': dict(Counter(a['error'] for a in answers if a['error'])),
+        'seconds': round(seconds, 4),
+        'throughput_qps': round(len(answers) / seconds, 2) if seconds else None,
+        'latency_ms': {q: percentile(latencies, p) for q, p in (('p50', .5), ('p95', .95), ('p99', .99))},
+        'routes': dict(Counter(a['agent'] or 'error' for a in answers)),
+        'tool_paths': dict(Counter(' + '.join(a['tools']) or 'none' for a in answers)),
+        'tool_only': sum(a['tool_only'] for a in answers),
+    }
+
+
+def print_summary(summary: Dict[str, Any], backend: Dict[str, Any]) -> None:
+    latency = summary['latency_ms']
+    print(f"{summary['questions']} questions in {summary['seconds']:.2f}s ({summary['throughput_qps']} q/s), "
+          f"p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, p99 {latency['p99']:.1f} ms")
+    print(f"backend: {backend}")
+    if summary['errors']:
+        print(f"errors: {summary['errors']}")
+    print("routes: " + ", ".join(f"{agent} {n}" for agent, n in sorted(summary['routes'].items())))
+    print("tool paths: " + ", ".join(f"{path} {n}" for path, n in sorted(summary['tool_paths'].items())))
+
+
+def print_comparison(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    """Throughput and latency change, then every question whose route, tools or outcome differs"""
+    before, after = old['summary'], new['summary']
+    print(f"\ncompared with {old.get('commit', '?')} ({old.get('timestamp', '?')})")
+
+    def change(a, b) -> str:
+        return f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+
+    print(f"  throughput {change(before['throughput_qps'], after['throughput_qps'])}, "
+          + ", ".join(f"{q} {change(before['latency_ms'][q], after['latency_ms'][q])}" for q in ('p50', 'p95', 'p99')))
+    previous = {a['question']: a for a in old['answers']}
+    changed = 0
+    for answer in new['answers']:
+        base = previous.get(answer['question'])
+        if base is None:
+            continue
+        fields = [f for f in ('agent', 'tools', 'tool_only', 'error') if base[f] != answer[f]]
+        if fields:
+            changed += 1
+            if changed <= 20:
+                diffs = "; ".join(f"{f} {base[f]!r} -> {answer[f]!r}" for f in fields)
+                print(f"  {answer['question'][:60]!r}: {diffs}")
+    print(f"  {changed} of {len(new['answers'])} questions changed route, tools or outcome")
+
+
+async def run(args) -> Dict[str, Any]:
+    if not args.cache:
+        os.environ["ANSWER_CACHE_BACKEND"] = "none"
+    if args.record:
+        os.environ["LLM_RECORD_PATH"] = args.record
+    else:
+        os.environ.update({
+            "LLM_BACKEND": "replay",
+            "LLM_REPLAY_PATH": args.replay,
+            "LLM_REPLAY_LATENCY": "false" if args.no_latency else "true",
+            "LLM_REPLAY_SPEED": str(args.speed),
+            "LLM_REPLAY_MISSING": "fake" if args.fallback else "error",
+        })
+    from agents.tutor_agent import TutorAgent
+
+    questions = read_queries(args.queries, args.limit)
+    tutor = TutorAgent()
+    start = time.perf_counter()
+    answers = await answer_all(tutor, questions, args.concurrency)
+    seconds = time.perf_counter() - start
+    backend = tutor.llm_stats()['backend']
+    tutor.llm.close()
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'config': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')},
+        'backend': backend,
+        'summary': summarize(answers, seconds),
+        'answers': answers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay the LLM traffic of a query log")
+    cassette = parser.add_mutually_exclusive_group(required=True)
+    cassette.add_argument("--record", metavar="CASSETTE", help="answer with the configured backend and record")
+    cassette.add_argument("--replay", metavar="CASSETTE", help="answer from a recorded cassette")
+    parser.add_argument("--queries", default="agents/data/labeled_queries.jsonl", help="query log")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N questions")
+    parser.add_argument("--concurrency", type=int, default=8, help="questions in flight at once")
+    parser.add_argument("--no-latency", action="store_true", help="replay without the recorded latencies")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay latencies divided by this")
+    parser.add_argument("--fallback", action="store_true", help="answer unrecorded prompts with the fake")
+    parser.add_argument("--cache", action="store_true", help="leave the answer cache on")
+    parser.add_argument("--output", help="write the run as JSON to this path")
+    parser.add_argument("--compare", help="a JSON run from an earlier build to compare with")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_summary(results['summary'], results['backend'])
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
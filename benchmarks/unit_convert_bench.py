@@ -0,0 +1,57 @@
+"""Compare bulk unit conversion with convert_array against looping convert.
+
+Converts the same column of values (default 1M) three ways: a Python loop
+over UnitConverterTool.convert, convert_array into a new array, and
+convert_array in place on an array.array buffer. Results are checked to
+agree before timings are printed.
+
+    python benchmarks/unit_convert_bench.py --values 1000000
+"""
+import argparse
+import array
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.unit_converter_tool import UnitConverterTool
+
+PAIRS = [("km/h", "m/s"), ("c", "f"), ("mm", "ft")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk unit conversion benchmark")
+    parser.add_argument("--values", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    converter = UnitConverterTool()
+    values = np.random.default_rng(0).uniform(-100, 100, args.values)
+    as_list = values.tolist()
+
+    for from_unit, to_unit in PAIRS:
+        start = time.perf_counter()
+        looped = [converter.convert(value, from_unit, to_unit) for value in as_list]
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = converter.convert_array(values, from_unit, to_unit)
+        array_time = time.perf_counter() - start
+
+        buffer = array.array('d', as_list)
+        start = time.perf_counter()
+        converter.convert_array(buffer, from_unit, to_unit, out=buffer)
+        in_place_time = time.perf_counter() - start
+
+        assert np.allclose(looped, vectorized) and np.allclose(vectorized, np.frombuffer(buffer))
+        print(f"{from_unit} -> {to_unit} ({args.values} values)")
+        print(f"  convert loop:          {loop_time * 1000:8.1f} ms")
+        print(f"  convert_array:         {array_time * 1000:8.1f} ms ({loop_time / array_time:.0f}x)")
+        print(f"  convert_array in place:{in_place_time * 1000:8.1f} ms ({loop_time / in_place_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
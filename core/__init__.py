@@ -0,0 +1,19 @@
+from .cache import (
+    AnswerCache,
+    MemoryAnswerCache,
+    SQLiteAnswerCache,
+    build_answer_cache,
+    make_cache_key,
+    normalize_question,
+)
+from .coalescer import SingleFlight
+
+__all__ = [
+    'AnswerCache',
+    'MemoryAnswerCache',
+    'SQLiteAnswerCache',
+    'SingleFlight',
+    'build_answer_cache',
+    'make_cache_key',
+    'normalize_question',
+]
@@ -0,0 +1,324 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """A request was turned away; ``retry_after`` is a hint in seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{reason}, retry in {retry_after:.1f}s")
+
+
+class ClientBuckets:
+    """Per-client token buckets in two plain dicts of one float each.
+
+    Each client's bucket is kept as the time it will next be full (GCRA,
+    the "theoretical arrival time"): a request of ``cost`` pushes that time
+    ``cost / rate`` seconds later and is refused if it would land more than
+    ``burst / rate`` seconds in the future. A client that has been quiet
+    for ``burst / rate`` seconds has a full bucket, which is the same as
+    having none, so entries live in a current and a previous generation
+    and the previous one is dropped wholesale every ``burst / rate``
+    seconds: memory follows the clients active in the last two windows,
+    not every client ever seen. Past ``max_clients`` the generations turn
+    over early, which can forget a few buckets, always in the client's
+    favour. Clients are stored by the hash of their key, so API keys are
+    not kept in memory.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 100000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.interval = 1.0 / rate
+        self.window = self.burst * self.interval
+        self.max_clients = max_clients
+        self.clock = clock
+        self._current: Dict[int, float] = {}
+        self._previous: Dict[int, float] = {}
+        self._rotated_at = clock()
+        self.limited = 0
+
+    def _rotate(self, now: float) -> None:
+        if now - self._rotated_at >= self.window or len(self._current) >= self.max_clients:
+            # two windows idle (or no room): every bucket left in the previous generation is full
+            self._previous = self._current if now - self._rotated_at < 2 * self.window else {}
+            self._current = {}
+            self._rotated_at = now
+
+    def take(self, client: str, cost: float = 1.0) -> float:
+        """Spend ``cost`` tokens; returns 0 when allowed, else the seconds until it would be"""
+        now = self.clock()
+        self._rotate(now)
+        key = hash(client)
+        full_at = self._current.get(key)
+        if full_at is None:
+            full_at = self._previous.pop(key, now)
+        # a request larger than the whole bucket is let through once the bucket is full
+        cost = min(cost, self.burst)
+        new_full_at = max(full_at, now) + cost * self.interval
+        wait = new_full_at - now - self.window
+        if wait > 1e-9:
+            self.limited += 1
+            if full_at > now:
+                self._current[key] = full_at
+            return wait
+        self._current[key] = new_full_at
+        return 0.0
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+
+class ConcurrencyLimit:
+    """At most ``limit`` requests at once, ``max_queue`` more waiting in order, the rest refused.
+
+    A waiter gives up after ``queue_timeout`` seconds. ``retry_after``
+    estimates how long the queue would take to drain, from a moving
+    average of how long admitted requests held their slot.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.hold_seconds = 1.0
+        self.shed = 0
+        self.timed_out = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        return max(1.0, self.hold_seconds * (len(self._waiters) + 1) / self.limit)
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise Overloaded("Server busy", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise Overloaded("Server busy", self.retry_after())
+            raise
+
+    def release(self, held: Optional[float] = None) -> None:
+        if held is not None:
+            self.hold_seconds += 0.1 * (held - self.hold_seconds)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # hand the slot straight to the next waiter, so newcomers cannot jump the queue
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def _client_key(scope, trust_forwarded: bool) -> str:
+    headers = dict(scope.get('headers') or ())
+    api_key = headers.get(b'x-api-key')
+    if api_key:
+        return 'key:' + api_key.decode('latin-1')
+    if trust_forwarded:
+        forwarded = headers.get(b'x-forwarded-for')
+        if forwarded:
+            return 'ip:' + forwarded.decode('latin-1').split(',')[0].strip()
+    client = scope.get('client')
+    return 'ip:' + (client[0] if client else 'unknown')
+
+
+class Admission:
+    """Who gets into the answering routes: per-client rate limits and load shedding.
+
+    Every request to ``paths`` takes tokens from its client's bucket (by
+    X-API-Key, else the client address; a batch costs one token per
+    question) and then a slot under the global concurrency limit, waiting
+    in a bounded queue for one if needed. A refused request gets 429 with
+    Retry-After at once instead of piling up behind the LLM. ``fast_path``,
+    given the parsed JSON body of a single question, returns its answer
+    when it needs no LLM (instant tool answers) and None otherwise; those
+    requests still count against the client's bucket but skip the
+    concurrency limit, and the answer is left in ``scope['fast_path']`` so
+    the route does not compute it again. ``AdmissionMiddleware`` applies
+    it to an app.
+    """
+
+    def __init__(self, buckets: Optional[ClientBuckets] = None, limit: Optional[ConcurrencyLimit] = None,
+                 paths: Iterable[str] = ('/ask', '/ask/stream', '/ask/batch'),
+                 batch_paths: Iterable[str] = ('/ask/batch',),
+                 fast_path: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 trust_forwarded: bool = False, max_body: int = 65536):
+        self.buckets = buckets
+        self.limit = limit
+        self.paths = frozenset(paths)
+        self.batch_paths = frozenset(batch_paths)
+        self.fast_path = fast_path
+        self.trust_forwarded = trust_forwarded
+        self.max_body = max_body
+        self.counters = {'admitted': 0, 'bypassed': 0, 'rate_limited': 0, 'shed': 0}
+
+    @classmethod
+    def from_env(cls, fast_path: Optional[Callable[[Dict[str, Any]], Any]] = None) -> 'Admission':
+        """RATE_LIMIT_* and ADMISSION_* settings; a rate or limit of 0 turns that part off"""
+        rate = float(os.getenv("RATE_LIMIT_RATE", "5"))
+        max_concurrent = int(os.getenv("ADMISSION_MAX_CONCURRENT", "64"))
+        paths = [p.strip() for p in os.getenv("ADMISSION_PATHS", "/ask,/ask/stream,/ask/batch").split(',') if p.strip()]
+        return cls(
+            buckets=ClientBuckets(rate, float(os.getenv("RATE_LIMIT_BURST", "50")),
+                                  max_clients=int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))) if rate > 0 else None,
+            limit=ConcurrencyLimit(max_concurrent, int(os.getenv("ADMISSION_MAX_QUEUE", "256")),
+                                   float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))) if max_concurrent > 0 else None,
+            paths=paths,
+            fast_path=fast_path,
+            trust_forwarded=os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes", "on"),
+        )
+
+    def client(self, scope) -> str:
+        """The key a request's client is known by: its API key, else its address"""
+        return _client_key(scope, self.trust_forwarded)
+
+    def _parse(self, body: bytes) -> Optional[Dict[str, Any]]:
+        if len(body) > self.max_body:
+            return None
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.counters)
+        if self.buckets is not None:
+            stats.update(rate=self.buckets.rate, burst=self.buckets.burst, clients=len(self.buckets))
+        if self.limit is not None:
+            stats.update(max_concurrent=self.limit.limit, in_flight=self.limit.in_flight,
+                         waiting=self.limit.waiting, max_queue=self.limit.max_queue,
+                         queue_timeouts=self.limit.timed_out)
+        return stats
+
+
+class AdmissionMiddleware:
+    """ASGI middleware enforcing an ``Admission`` before requests reach their route"""
+
+    def __init__(self, app, admission: Admission):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        admission = self.admission
+        path = scope.get('path')
+        if scope['type'] != 'http' or path not in admission.paths or scope.get('method') != 'POST':
+            await self.app(scope, receive, send)
+            return
+
+        cost, bypass, payload = 1.0, False, None
+        batch = path in admission.batch_paths
+        if batch or admission.fast_path is not None:
+            body, receive = await _read_body(receive)
+            payload = admission._parse(body)
+            if payload is not None and batch and isinstance(payload.get('questions'), list):
+                cost = max(1, len(payload['questions']))
+
+        if admission.buckets is not None:
+            wait = admission.buckets.take(admission.client(scope), cost)
+            if wait:
+                admission.counters['rate_limited'] += 1
+                await _reject(scope, send, "Rate limit exceeded", wait)
+                return
+
+        # only a client within its rate gets the tool work of the fast path check
+        if (payload is not None and not batch and admission.fast_path is not None
+                and isinstance(payload.get('question'), str)):
+            try:
+                answer = admission.fast_path(payload)
+            except Exception:
+                # the route will hit (and report) the same problem; admit it the normal way
+                logger.warning("Admission fast path check failed", exc_info=True)
+                answer = None
+            if answer is not None:
+                scope['fast_path'] = answer
+                bypass = True
+
+        limit = admission.limit
+        if bypass or limit is None:
+            admission.counters['bypassed' if bypass else 'admitted'] += 1
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limit.acquire()
+        except Overloaded as e:
+            admission.counters['shed'] += 1
+            await _reject(scope, send, e.reason, e.retry_after)
+            return
+        admission.counters['admitted'] += 1
+        start = limit.clock()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release(limit.clock() - start)
+
+
+async def _read_body(receive) -> Tuple[bytes, Callable]:
+    """The whole request body, and a ``receive`` that hands it to the app again"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            # the client went away before sending its body; let the app see it
+            return b''.join(chunks), _replay([message], receive)
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    body = b''.join(chunks)
+    return body, _replay([{'type': 'http.request', 'body': body, 'more_body': False}], receive)
+
+
+def _replay(messages, receive):
+    pending = list(messages)
+
+    async def replayed():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+    return replayed
+
+
+async def _reject(scope, send, reason: str, retry_after: float) -> None:
+    # the metrics middleware reads this for requests that never reached a route
+    scope['metrics_route'] = scope.get('path')
+    body = json.dumps({'detail': f"{reason}. Retry after {math.ceil(retry_after)}s."}).encode()
+    await send({'type': 'http.response.start', 'status': 429, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+        (b'retry-after', str(math.ceil(retry_after)).encode()),
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+# a closing "!" after a number or bracket is a factorial, not punctuation
+_TRAILING_PUNCTUATION = re.compile(r'(?:[\s?.]|(?<![\d)])!)+$')
+
+
+def normalize_question(question: str) -> str:
+    """Collapse whitespace and drop trailing ``?``, ``.`` and ``!`` so trivially different phrasings share a key.
+
+    Case, operators and decimal points inside the question are kept: they
+    change what is asked ("12 * 7" vs "12 / 7", "CO" vs "Co").
+    """
+    return _TRAILING_PUNCTUATION.sub('', _WHITESPACE.sub(' ', question).strip())
+
+
+def make_cache_key(question: str, agent: str, model: str) -> str:
+    return f"{agent}|{model}|{normalize_question(question)}"
+
+
+class AnswerCache:
+    """Base class for answer caches.
+
+    Values are JSON-serialisable dicts (the result of ``process_query``).
+    Subclasses implement ``_get``/``_set``/``clear``/``__len__``; hit and miss
+    counting lives here. Async code uses ``aget``/``aset``, which run the
+    lookups of a ``blocking`` (disk-backed) cache on a worker thread so they
+    never stall the event loop.
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 3600.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        self._set(key, value, expires_at)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.blocking:
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if self.blocking:
+            await asyncio.to_thread(self.set, key, value, ttl)
+        else:
+            self.set(key, value, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self).__name__,
+            'entries': len(self),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Dict[str, Any], expires_at: Optional[float]) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryAnswerCache(AnswerCache):
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 3600.0):
+        super().__init__(max_entries, ttl)
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Dict[str, Any]]]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: Dict[str, Any], expires_at: Optional[float]) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteAnswerCache(AnswerCache):
+    """On-disk cache that survives restarts and is shared by workers on one host.
+
+    Recency is tracked in a ``last_access`` column. Rather than counting the
+    table on every insert, it is trimmed back to ``max_entries`` (least
+    recently used rows first) once every ``trim_interval`` writes, so it can
+    run that many rows over between trims.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl: Optional[float] = 86400.0,
+                 trim_interval: Optional[int] = None):
+        super().__init__(max_entries, ttl)
+        self.trim_interval = trim_interval or max(1, min(256, self.max_entries // 16))
+        self._writes = 0
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_access ON answers(last_access)")
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def _set(self, key: str, value: Dict[str, Any], expires_at: Optional[float]) -> None:
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, time.time())
+            )
+            self._writes += 1
+            if self._writes >= self.trim_interval:
+                self._writes = 0
+                self._trim()
+
+    def _trim(self) -> None:
+        overflow = self._count() - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def build_answer_cache() -> Optional[AnswerCache]:
+    """Create the answer cache configured through environment variables"""
+    backend = os.getenv("ANSWER_CACHE_BACKEND", "memory").lower()
+    if backend in ("", "none", "off", "disabled"):
+        return None
+
+    max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+    ttl = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    if backend == "memory":
+        return MemoryAnswerCache(max_entries=max_entries, ttl=ttl)
+    if backend == "sqlite":
+        path = os.getenv("ANSWER_CACHE_PATH", "cache/answers.sqlite3")
+        return SQLiteAnswerCache(path, max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unknown ANSWER_CACHE_BACKEND '{backend}'")
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, List, Optional, TypeVar
+
+from .metrics import degraded as degraded_stages
+
+T = TypeVar('T')
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """A stage ran out of the request's remaining time"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """The point in time a request must be answered by, and the stages cut short to make it"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, limit: Optional[float] = None, reserve: float = 0.0) -> float:
+        """Time a stage may use: what is left after ``reserve`` for later stages, capped at ``limit``"""
+        available = max(0.0, self.remaining() - reserve)
+        return available if limit is None else min(limit, available)
+
+    def degrade(self, stage: str) -> None:
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+            degraded_stages.inc(stage)
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar('request_deadline', default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def degrade(stage: str) -> None:
+    """Note on the current deadline, if any, that ``stage`` was skipped or cut short"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.degrade(stage)
+
+
+@contextmanager
+def deadline_scope(timeout: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Give everything awaited inside the block (tasks included) a shared deadline; None for no deadline"""
+    deadline = Deadline(timeout) if timeout is not None else None
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+async def within_deadline(awaitable: Awaitable[T], stage: str, limit: Optional[float] = None,
+                          reserve: float = 0.0) -> T:
+    """Await with the stage's budget from the current deadline (or just ``limit`` without one)"""
+    deadline = current_deadline()
+    timeout = deadline.budget(limit, reserve) if deadline is not None else limit
+    if timeout is None:
+        return await awaitable
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except DeadlineExceeded:
+        # an inner stage's own budget ran out first
+        raise
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage) from None
@@ -0,0 +1,326 @@
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# a metric never grows more label combinations than this; later ones are counted under "other"
+MAX_SERIES = 64
+
+# seconds; spans an in-process tool lookup (tens of microseconds) up to a slow completion
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _CounterSeries:
+    __slots__ = ('registry', 'value')
+
+    def __init__(self, registry: 'Registry'):
+        self.registry = registry
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if self.registry.enabled:
+            self.value += amount
+
+
+class _HistogramSeries:
+    """Bucket counts (not cumulative; the last bucket is +Inf) and the sum of one label set"""
+    __slots__ = ('registry', 'bounds', 'counts', 'sum')
+
+    def __init__(self, registry: 'Registry', bounds: Tuple[float, ...]):
+        self.registry = registry
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        if self.registry.enabled:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.sum += value
+
+    def time(self) -> '_Timer':
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('series', 'start')
+
+    def __init__(self, series: _HistogramSeries):
+        self.series = series
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.series.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    """A metric family: one series per label set, created on first use.
+
+    ``labels(...)`` returns the series itself, so hot paths can look it up
+    once and then just ``inc``/``observe`` it.
+    """
+    kind = ''
+
+    def __init__(self, registry: 'Registry', name: str, help: str, labels: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels_names = tuple(labels)
+        self._series: Dict[Labels, object] = {}
+
+    def labels(self, *values: str):
+        try:
+            return self._series[values]
+        except KeyError:
+            pass
+        if len(values) != len(self.labels_names):
+            raise ValueError(f"{self.name} takes labels {self.labels_names}, got {values}")
+        if len(self._series) >= MAX_SERIES:
+            # a full metric folds new label sets into one "other" series
+            return self._series.setdefault(('other',) * len(values), self._new_series())
+        return self._series.setdefault(values, self._new_series())
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_series(self) -> _CounterSeries:
+        return _CounterSeries(self.registry)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.labels(*labels).inc(amount)
+
+    def value(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series.value if series is not None else 0.0
+
+    def samples(self) -> Iterable[str]:
+        for values, series in self._series.items():
+            yield f"{self.name}{_format_labels(self.labels_names, values)} {_format_value(series.value)}"
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry: 'Registry', name: str, help: str, labels: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self) -> _HistogramSeries:
+        return _HistogramSeries(self.registry, self.buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.labels(*labels).observe(value)
+
+    def time(self, *labels: str) -> _Timer:
+        """``with histogram.time('stage'):`` observes the block's duration in seconds"""
+        return _Timer(self.labels(*labels))
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series.counts) if series is not None else 0
+
+    def samples(self) -> Iterable[str]:
+        bounds = self.buckets + (float('inf'),)
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels_names, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels_names, values)} {_format_value(series.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labels_names, values)} {cumulative}"
+
+
+class _Collected:
+    """A metric read from existing stats at scrape time: ``collect()`` returns {label values: value}"""
+
+    def __init__(self, name: str, help: str, kind: str, labels: Sequence[str],
+                 collect: Callable[[], Dict[Labels, float]]):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels_names = tuple(labels)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for values, value in self.collect().items():
+            if value is not None:
+                yield f"{self.name}{_format_labels(self.labels_names, values)} {_format_value(value)}"
+
+    def clear(self) -> None:
+        pass
+
+
+class Registry:
+    """Process-wide metrics rendered in the Prometheus text format.
+
+    Updates are plain dict operations on the event loop thread, cheap
+    enough to leave on every request (see ``benchmarks/metrics_overhead_bench.py``).
+    Label values must come from small fixed sets (stage, agent, tool,
+    status code), never from user input; past ``MAX_SERIES`` combinations
+    a metric counts new ones under "other".
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+        self.enabled = enabled
+        self._metrics: Dict[str, object] = {}
+        self._series_caches: List[dict] = []
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def collector(self, name: str, help: str, kind: str, labels: Sequence[str],
+                  collect: Callable[[], Dict[Labels, float]]) -> None:
+        """Expose numbers another component already keeps (cache and breaker stats, ...)"""
+        self._metrics.pop(name, None)
+        self._register(_Collected(name, help, kind, labels, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def series_cache(self) -> dict:
+        """A dict for keeping series outside the registry (hot paths skip ``labels``); ``reset`` empties it too"""
+        cache: dict = {}
+        self._series_caches.append(cache)
+        return cache
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+        # cached series would otherwise keep counting into series no longer rendered
+        for cache in self._series_caches:
+            cache.clear()
+
+
+registry = Registry()
+
+# the tutor pipeline's metrics; see the README's Metrics section for what each label can be
+http_requests = registry.counter(
+    'tutor_http_requests_total', 'HTTP requests by route template and status code', ['route', 'status'])
+http_seconds = registry.histogram(
+    'tutor_http_request_duration_seconds', 'HTTP request latency by route template', ['route'])
+stage_seconds = registry.histogram(
+    'tutor_stage_duration_seconds',
+    'Latency of one pipeline stage: classify, gemini_classifier, tools, generation', ['stage'])
+routes = registry.counter(
+    'tutor_routes_total', 'Questions routed to each agent, by how the route was decided', ['agent', 'method'])
+tool_calls = registry.counter(
+    'tutor_tool_calls_total', 'Tool invocations and whether they produced a result (hit) or not (miss)',
+    ['tool', 'result'])
+tool_seconds = registry.histogram(
+    'tutor_tool_duration_seconds', 'Latency of one tool invocation', ['tool'])
+degraded = registry.counter(
+    'tutor_degraded_total', 'Pipeline stages skipped or cut short to meet a deadline or while the LLM is down',
+    ['stage'])
+llm_queue_seconds = registry.histogram(
+    'tutor_llm_queue_wait_seconds', 'Time LLM calls waited for a concurrency slot, per priority lane', ['lane'])
+llm_tokens = registry.counter(
+    'tutor_llm_tokens_total', 'Tokens reported by the LLM, prompt and completion', ['kind'])
+
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template ("/ask", never the raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+        # route -> (latency series, {status: request counter}), so a request costs two dict lookups
+        self._routes: Dict[str, Tuple[_HistogramSeries, Dict[int, _CounterSeries]]] = registry.series_cache()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # requests turned away before routing (admission control) name their path themselves
+            route = getattr(scope.get('route'), 'path', None) or scope.get('metrics_route') or 'unmatched'
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = (http_seconds.labels(route), {})
+            seconds, statuses = entry
+            seconds.observe(time.perf_counter() - start)
+            counter = statuses.get(status)
+            if counter is None:
+                counter = statuses[status] = http_requests.labels(route, str(status))
+            counter.inc()
+
+
+_tools: Dict[str, Tuple[_HistogramSeries, _CounterSeries, _CounterSeries]] = registry.series_cache()
+
+
+class tool_call:
+    """``with tool_call('Calculator') as call: ...; call.hit = ok`` times a tool and counts hits and misses"""
+    __slots__ = ('series', 'hit', 'start')
+
+    def __init__(self, tool: str):
+        series = _tools.get(tool)
+        if series is None:
+            series = _tools[tool] = (tool_seconds.labels(tool), tool_calls.labels(tool, 'hit'),
+                                     tool_calls.labels(tool, 'miss'))
+        self.series = series
+        self.hit = False
+
+    def __enter__(self) -> 'tool_call':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        seconds, hits, misses = self.series
+        seconds.observe(time.perf_counter() - self.start)
+        (hits if self.hit else misses).inc()
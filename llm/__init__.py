@@ -0,0 +1,12 @@
+from .backends import Completion, GeminiBackend, LLMBackend
+from .cassette import CassetteMissError, RecordingBackend, ReplayBackend, ReplayedError
+from .client import LLMClient, DEFAULT_MODEL
+from .fake import FakeBackend, FakeLLMError
+from .resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, RetryPolicy
+from .scheduler import LLMScheduler, llm_priority
+
+__all__ = [
+    'LLMClient', 'DEFAULT_MODEL', 'LLMBackend', 'GeminiBackend', 'Completion', 'FakeBackend', 'FakeLLMError',
+    'RecordingBackend', 'ReplayBackend', 'CassetteMissError', 'ReplayedError',
+    'CircuitBreaker', 'CircuitOpenError', 'ResilientCaller', 'RetryPolicy', 'LLMScheduler', 'llm_priority',
+]
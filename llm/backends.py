@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional
+
+
+class Completion(NamedTuple):
+    """Generated text (a whole answer or one streamed chunk) and the token usage reported with it"""
+    text: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+class LLMBackend:
+    """Where completions come from. ``LLMClient`` adds concurrency limits, deadlines,
+    retries and metrics on top, so a backend only has to produce text."""
+
+    async def generate(self, prompt: str, model: str) -> Completion:
+        raise NotImplementedError
+
+    async def open_stream(self, prompt: str, model: str) -> AsyncIterator[Completion]:
+        """Start a streamed completion and return its chunks; only the opening is retried"""
+        completion = await self.generate(prompt, model)
+
+        async def single() -> AsyncIterator[Completion]:
+            yield completion
+        return single()
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+def _completion(response: Any) -> Completion:
+    usage = getattr(response, 'usage_metadata', None)
+    return Completion(
+        text=getattr(response, 'text', None) or '',
+        prompt_tokens=getattr(usage, 'prompt_token_count', None),
+        completion_tokens=getattr(usage, 'candidates_token_count', None),
+    )
+
+
+class GeminiBackend(LLMBackend):
+    """A ``google-genai`` client (or anything shaped like one).
+
+    Uses the client's native async API (``client.aio``) when it exists and
+    falls back to a bounded thread pool for sync-only clients, so a slow
+    completion never blocks the event loop.
+    """
+
+    def __init__(self, client: Any, max_workers: int = 16):
+        self.client = client
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _async_models(self) -> Optional[Any]:
+        aio = getattr(self.client, 'aio', None)
+        return getattr(aio, 'models', None) if aio is not None else None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='llm')
+        return self._executor
+
+    async def generate(self, prompt: str, model: str) -> Completion:
+        async_models = self._async_models()
+        if async_models is not None:
+            response = await async_models.generate_content(model=model, contents=prompt)
+        else:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                self._get_executor(),
+                lambda: self.client.models.generate_content(model=model, contents=prompt)
+            )
+        return _completion(response)
+
+    async def open_stream(self, prompt: str, model: str) -> AsyncIterator[Completion]:
+        async_models = self._async_models()
+        if async_models is None or not hasattr(async_models, 'generate_content_stream'):
+            # no async streaming API: the whole completion as a single chunk
+            return await super().open_stream(prompt, model)
+        chunks = await async_models.generate_content_stream(model=model, contents=prompt)
+
+        async def completions() -> AsyncIterator[Completion]:
+            async for chunk in chunks:
+                yield _completion(chunk)
+        return completions()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from .backends import Completion, LLMBackend
+from .resilience import is_retryable, status_code
+
+
+def prompt_key(prompt: str, model: str) -> str:
+    return hashlib.sha1(f"{model}\0{prompt}".encode()).hexdigest()[:16]
+
+
+class CassetteMissError(LookupError):
+    """Replay was asked for a prompt the cassette never recorded"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"No recorded completion for prompt {key}")
+
+
+class ReplayedError(RuntimeError):
+    """A failure as it was recorded; ``code`` is its HTTP status (None for a dropped connection)"""
+
+    def __init__(self, code: Optional[int], name: str):
+        self.code = code
+        super().__init__(f"Replayed {name}" + (f" ({code})" if code else ""))
+
+
+class RecordingBackend(LLMBackend):
+    """Passes every call through to ``backend`` and appends it to a cassette.
+
+    The cassette is a JSON-lines file, one line per upstream attempt in
+    the order they finished: the prompt key (model + prompt digest), the
+    completion text or the error status, token usage and how long the
+    call took (``s``; streams also keep each chunk and its offset). A
+    prompt's text is stored only on the first line for its key in a
+    process, which keeps logs of repetitive traffic small. Lines are
+    flushed as they are written, so a crash loses at most the calls still
+    in flight, and recording into an existing file appends to it.
+    """
+
+    def __init__(self, backend: LLMBackend, path: str):
+        self.backend = backend
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._seen = set()
+        self.recorded = 0
+
+    def _write(self, prompt: str, model: str, entry: Dict[str, Any]) -> None:
+        key = prompt_key(prompt, model)
+        line = {'k': key, 'm': model}
+        if key not in self._seen:
+            self._seen.add(key)
+            line['p'] = prompt
+        line.update(entry)
+        with self._lock:
+            self._file.write(json.dumps(line, ensure_ascii=False, separators=(',', ':')) + '\n')
+            self._file.flush()
+            self.recorded += 1
+
+    def _failure(self, error: Exception, seconds: float) -> Dict[str, Any]:
+        entry = {'e': status_code(error), 'x': type(error).__name__, 's': round(seconds, 4)}
+        if entry['e'] is None:
+            # without a status, whether it was worth retrying (a dropped connection) has to be kept
+            entry['r'] = is_retryable(error)
+        return entry
+
+    async def generate(self, prompt: str, model: str) -> Completion:
+        start = time.perf_counter()
+        try:
+            completion = await self.backend.generate(prompt, model)
+        except Exception as e:
+            self._write(prompt, model, self._failure(e, time.perf_counter() - start))
+            raise
+        self._write(prompt, model, {
+            't': completion.text, 'pt': completion.prompt_tokens, 'ct': completion.completion_tokens,
+            's': round(time.perf_counter() - start, 4),
+        })
+        return completion
+
+    async def open_stream(self, prompt: str, model: str) -> AsyncIterator[Completion]:
+        start = time.perf_counter()
+        try:
+            chunks = await self.backend.open_stream(prompt, model)
+        except Exception as e:
+            self._write(prompt, model, self._failure(e, time.perf_counter() - start))
+            raise
+
+        async def recorded() -> AsyncIterator[Completion]:
+            texts: List[str] = []
+            offsets: List[float] = []
+            last = Completion('')
+            try:
+                async for chunk in chunks:
+                    texts.append(chunk.text)
+                    offsets.append(round(time.perf_counter() - start, 4))
+                    last = chunk
+                    yield chunk
+            finally:
+                # a stream abandoned halfway is still recorded as far as it got
+                self._write(prompt, model, {
+                    't': ''.join(texts), 'c': texts, 'o': offsets,
+                    'pt': last.prompt_tokens, 'ct': last.completion_tokens,
+                    's': offsets[-1] if offsets else round(time.perf_counter() - start, 4),
+                })
+        return recorded()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'path': self.path, 'recorded': self.recorded}
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+        self.backend.close()
+
+
+class ReplayBackend(LLMBackend):
+    """Serves completions from a cassette written by ``RecordingBackend``.
+
+    Calls are matched on model and prompt; a prompt recorded several times
+    gets its recordings in order (failures included, so retries replay
+    too) and starts over once they run out. With ``latency`` each call
+    sleeps as long as the recorded one took, divided by ``speed``; without
+    it answers come back at once. A prompt that was never recorded goes to
+    ``fallback`` if one is given and raises ``CassetteMissError``
+    otherwise, since a changed prompt is usually what a replay is meant to
+    catch.
+    """
+
+    def __init__(self, path: str, latency: bool = True, speed: float = 1.0,
+                 fallback: Optional[LLMBackend] = None):
+        self.path = path
+        self.latency = latency
+        self.speed = speed if speed > 0 else 1.0
+        self.fallback = fallback
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._queues: Dict[str, Deque[Dict[str, Any]]] = {}
+        self.prompts: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.load(path)
+
+    @classmethod
+    def from_env(cls, fallback: Optional[LLMBackend] = None) -> 'ReplayBackend':
+        path = os.getenv("LLM_REPLAY_PATH")
+        if not path:
+            raise ValueError("LLM_REPLAY_PATH is required with LLM_BACKEND=replay")
+        return cls(
+            path,
+            latency=os.getenv("LLM_REPLAY_LATENCY", "true").lower() in ("1", "true", "yes", "on"),
+            speed=float(os.getenv("LLM_REPLAY_SPEED", "1")),
+            fallback=fallback,
+        )
+
+    def load(self, path: str) -> None:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line of a cassette recorded by a killed process may be cut short
+                    continue
+                if 'p' in entry:
+                    self.prompts[entry['k']] = entry['p']
+                self._entries.setdefault(entry['k'], []).append(entry)
+
+    def _next(self, prompt: str, model: str) -> Optional[Dict[str, Any]]:
+        key = prompt_key(prompt, model)
+        entries = self._entries.get(key)
+        if not entries:
+            self.misses += 1
+            if self.fallback is None:
+                raise CassetteMissError(key)
+            return None
+        self.hits += 1
+        queue = self._queues.get(key)
+        if not queue:
+            queue = self._queues[key] = deque(entries)
+        return queue.popleft()
+
+    async def _sleep(self, seconds: float) -> None:
+        if self.latency and seconds > 0:
+            await asyncio.sleep(seconds / self.speed)
+
+    @staticmethod
+    def _raise_if_failed(entry: Dict[str, Any]) -> None:
+        if 'x' not in entry:
+            return
+        if entry.get('e') is None and entry.get('r'):
+            raise ConnectionError(f"Replayed {entry['x']}")
+        raise ReplayedError(entry.get('e'), entry['x'])
+
+    async def generate(self, prompt: str, model: str) -> Completion:
+        entry = self._next(prompt, model)
+        if entry is None:
+            return await self.fallback.generate(prompt, model)
+        await self._sleep(entry.get('s', 0))
+        self._raise_if_failed(entry)
+        return Completion(entry.get('t', ''), entry.get('pt'), entry.get('ct'))
+
+    async def open_stream(self, prompt: str, model: str) -> AsyncIterator[Completion]:
+        entry = self._next(prompt, model)
+        if entry is None:
+            return await self.fallback.open_stream(prompt, model)
+        if 'x' in entry:
+            await self._sleep(entry.get('s', 0))
+            self._raise_if_failed(entry)
+        # a completion recorded with generate streams as one chunk
+        texts = entry.get('c') or [entry.get('t', '')]
+        offsets = entry.get('o') or [entry.get('s', 0)]
+        await self._sleep(offsets[0])
+
+        async def chunks() -> AsyncIterator[Completion]:
+            for i, text in enumerate(texts):
+                if i:
+                    await self._sleep(offsets[i] - offsets[i - 1])
+                if i == len(texts) - 1:
+                    yield Completion(text, entry.get('pt'), entry.get('ct'))
+                else:
+                    yield Completion(text)
+        return chunks()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'path': self.path, 'prompts': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def close(self) -> None:
+        if self.fallback is not None:
+            self.fallback.close()
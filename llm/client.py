@@ -0,0 +1,131 @@
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from core.deadline import within_deadline
+from core.metrics import llm_tokens, stage_seconds
+
+from .backends import Completion, GeminiBackend, LLMBackend
+from .resilience import ResilientCaller
+from .scheduler import LLMScheduler
+
+DEFAULT_MODEL = 'gemini-2.0-flash-001'
+
+
+def _count_tokens(completion: Optional[Completion]) -> None:
+    """Add the prompt and completion tokens the backend reported, if it reported them"""
+    if completion is None:
+        return
+    if completion.prompt_tokens:
+        llm_tokens.inc('prompt', amount=completion.prompt_tokens)
+    if completion.completion_tokens:
+        llm_tokens.inc('completion', amount=completion.completion_tokens)
+
+
+class LLMClient:
+    """Async gateway to the LLM backend shared by every agent.
+
+    ``backend`` is an ``LLMBackend`` (``GeminiBackend``, or ``FakeBackend``
+    for offline runs); anything else is taken to be a google-genai client
+    and wrapped in a ``GeminiBackend``. An ``LLMScheduler`` caps how many
+    completions are in flight at once and decides who gets a free slot:
+    interactive calls before bulk ones, tenants in turn (see
+    ``llm_priority``).
+
+    Every call goes through a ``ResilientCaller``: transient errors are
+    retried with jittered backoff, slow calls can be hedged, and after
+    repeated failures the circuit opens and calls fail fast with
+    ``CircuitOpenError`` instead of waiting on a dead upstream.
+    """
+
+    def __init__(self, backend: Any, model: str = DEFAULT_MODEL, max_concurrency: Optional[int] = None,
+                 resilience: Optional[ResilientCaller] = None, scheduler: Optional[LLMScheduler] = None):
+        self.model = model
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        self.max_concurrency = max(1, max_concurrency)
+        if not isinstance(backend, LLMBackend):
+            backend = GeminiBackend(backend, max_workers=self.max_concurrency)
+        self.backend = backend
+        self.scheduler = scheduler or LLMScheduler.from_env(self.max_concurrency)
+        self.in_flight = 0
+        self.resilience = resilience or ResilientCaller.from_env()
+
+    async def _call(self, prompt: str, model: str) -> str:
+        completion = await self.backend.generate(prompt, model)
+        _count_tokens(completion)
+        return completion.text
+
+    def available(self) -> bool:
+        """False while the circuit breaker is refusing calls"""
+        return not self.resilience.breaker.is_open()
+
+    async def generate(self, prompt: str, model: Optional[str] = None, stage: str = 'generation') -> str:
+        """Run one completion and return its text.
+
+        Waiting for a slot, the call itself and any retries are bounded by
+        the request deadline, if one is set (``DeadlineExceeded`` when it
+        runs out). ``stage`` names the call in deadline errors and in the
+        stage latency metrics.
+        """
+        model = model or self.model
+        with stage_seconds.time(stage):
+            return await within_deadline(
+                self.resilience.call(lambda: self._generate(prompt, model)), stage
+            )
+
+    async def _generate(self, prompt: str, model: str) -> str:
+        lane = await self.scheduler.acquire()
+        self.in_flight += 1
+        try:
+            return await self._call(prompt, model)
+        finally:
+            self.in_flight -= 1
+            self.scheduler.release(lane)
+
+    async def stream(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the completion text chunk by chunk as the model produces it.
+
+        Backends without streaming give the whole completion as a single
+        chunk. The concurrency slot is held until the stream ends.
+        Every wait (for the slot, the stream and each chunk) is bounded by
+        the request deadline, if one is set. Opening the stream is retried
+        like ``generate``; once text has been sent it cannot be taken back,
+        so errors mid-stream are raised as they are.
+        """
+        model = model or self.model
+        start = time.perf_counter()
+        lane = await within_deadline(self.scheduler.acquire(), 'generation')
+        self.in_flight += 1
+        try:
+            chunks = await within_deadline(
+                self.resilience.call(lambda: self.backend.open_stream(prompt, model)), 'generation'
+            )
+            iterator = chunks.__aiter__()
+            chunk = None
+            while True:
+                try:
+                    chunk = await within_deadline(iterator.__anext__(), 'generation')
+                except StopAsyncIteration:
+                    break
+                if chunk.text:
+                    yield chunk.text
+            # the last chunk carries the usage for the whole stream
+            _count_tokens(chunk)
+        finally:
+            self.in_flight -= 1
+            self.scheduler.release(lane)
+            stage_seconds.observe(time.perf_counter() - start, 'generation')
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'model': self.model,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            **self.resilience.stats(),
+            'lanes': self.scheduler.stats(),
+            'backend': {'type': type(self.backend).__name__, **self.backend.stats()},
+        }
+
+    def close(self) -> None:
+        self.backend.close()
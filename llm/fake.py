@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import math
+import os
+import random
+import re
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .backends import Completion, LLMBackend
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+_STATUS_NAMES = {429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 502: 'UNAVAILABLE', 503: 'UNAVAILABLE',
+                 504: 'DEADLINE_EXCEEDED', 400: 'INVALID_ARGUMENT'}
+_NUMBERED = re.compile(r"^\s*(\d+)\.\s", re.MULTILINE)
+
+
+class FakeLLMError(RuntimeError):
+    """An injected upstream failure; ``code`` is the HTTP status it stands for"""
+
+    def __init__(self, code: int):
+        self.code = code
+        self.status = _STATUS_NAMES.get(code, 'UNKNOWN')
+        super().__init__(f"{code} {self.status}. Injected failure")
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class FakeBackend(LLMBackend):
+    """A deterministic local stand-in for Gemini: no network, no key.
+
+    The answer depends only on the prompt (routing prompts get a category,
+    anything else a stock tutoring answer carrying a digest of the prompt).
+    Latency is drawn from ``distribution`` around ``latency`` seconds
+    (``spread`` is the uniform half-width, or the lognormal sigma); a
+    ``slow_rate`` share of calls take ``slow_latency`` instead. An
+    ``error_rate`` share fail with ``FakeLLMError(error_status)``.
+    Streams send ``chunk_words`` words per chunk, ``chunk_delay`` seconds
+    apart, after the first-chunk latency. With a ``seed`` the sequence of
+    latencies and errors repeats exactly from run to run.
+    """
+
+    def __init__(self, latency: float = 0.0, distribution: str = 'fixed', spread: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 1.0,
+                 error_rate: float = 0.0, error_status: int = 503,
+                 chunk_words: int = 4, chunk_delay: float = 0.0, answer_words: int = 40,
+                 seed: Optional[int] = 0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}'; use one of {', '.join(DISTRIBUTIONS)}")
+        self.latency = latency
+        self.distribution = distribution
+        self.spread = spread
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.chunk_words = max(1, chunk_words)
+        self.chunk_delay = chunk_delay
+        self.answer_words = answer_words
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> 'FakeBackend':
+        """Configured by FAKE_LLM_* variables, for running the app with LLM_BACKEND=fake"""
+        seed = os.getenv("FAKE_LLM_SEED", "0")
+        return cls(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.05")),
+            distribution=os.getenv("FAKE_LLM_DISTRIBUTION", "fixed"),
+            spread=float(os.getenv("FAKE_LLM_SPREAD", "0")),
+            slow_rate=float(os.getenv("FAKE_LLM_SLOW_RATE", "0")),
+            slow_latency=float(os.getenv("FAKE_LLM_SLOW_LATENCY", "1")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            error_status=int(os.getenv("FAKE_LLM_ERROR_STATUS", "503")),
+            chunk_delay=float(os.getenv("FAKE_LLM_CHUNK_DELAY", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def configure(self, **settings: Any) -> Dict[str, Any]:
+        """Change settings on a running backend (e.g. ``error_rate=1`` for an outage)"""
+        if 'seed' in settings:
+            self._rng.seed(settings.pop('seed'))
+        for name, value in settings.items():
+            if name.startswith('_') or not hasattr(self, name) or name in ('calls', 'errors'):
+                raise ValueError(f"Unknown setting '{name}'")
+            setattr(self, name, value)
+        if self.distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{self.distribution}'")
+        return self.settings()
+
+    def settings(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in (
+            'latency', 'distribution', 'spread', 'slow_rate', 'slow_latency', 'error_rate',
+            'error_status', 'chunk_words', 'chunk_delay', 'answer_words')}
+
+    def stats(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'errors': self.errors}
+
+    def sample_latency(self) -> float:
+        rng = self._rng
+        if self.slow_rate and rng.random() < self.slow_rate:
+            return self.slow_latency
+        if self.distribution == 'uniform':
+            return max(0.0, rng.uniform(self.latency - self.spread, self.latency + self.spread))
+        if self.distribution == 'exponential':
+            return rng.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+        if self.distribution == 'lognormal':
+            # ``latency`` is the median
+            return self.latency * math.exp(rng.gauss(0, self.spread)) if self.latency > 0 else 0.0
+        return self.latency
+
+    def answer(self, prompt: str) -> str:
+        text = prompt.lstrip()
+        if text.startswith("Classify each question"):
+            count = len(_NUMBERED.findall(prompt))
+            return "\n".join(f"{n}: general" for n in range(1, count + 1))
+        if text.startswith("Classify this question"):
+            return "general"
+        digest = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+        filler = " ".join(["step"] * max(0, self.answer_words - 6))
+        return f"Fake answer {digest} for {_estimate_tokens(prompt)} prompt tokens: {filler}".strip()
+
+    async def _wait(self) -> None:
+        """Sleep one latency sample, then maybe fail"""
+        self.calls += 1
+        delay = self.sample_latency()
+        fail = self.error_rate and self._rng.random() < self.error_rate
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if fail:
+            self.errors += 1
+            raise FakeLLMError(self.error_status)
+
+    async def generate(self, prompt: str, model: str) -> Completion:
+        await self._wait()
+        text = self.answer(prompt)
+        return Completion(text, _estimate_tokens(prompt), _estimate_tokens(text))
+
+    async def open_stream(self, prompt: str, model: str) -> AsyncIterator[Completion]:
+        await self._wait()
+        words = self.answer(prompt).split(" ")
+        pieces = [" ".join(words[i:i + self.chunk_words]) for i in range(0, len(words), self.chunk_words)]
+
+        async def chunks() -> AsyncIterator[Completion]:
+            for i, piece in enumerate(pieces):
+                if i and self.chunk_delay > 0:
+                    await asyncio.sleep(self.chunk_delay)
+                last = i == len(pieces) - 1
+                text = piece if last else piece + " "
+                # usage comes with the last chunk, as with Gemini
+                yield Completion(text, _estimate_tokens(prompt), _estimate_tokens(" ".join(words))) if last \
+                    else Completion(text)
+        return chunks()
@@ -0,0 +1,266 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from core.deadline import DeadlineExceeded, current_deadline
+
+T = TypeVar('T')
+
+# HTTP statuses worth another attempt: rate limiting and server-side failures
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream LLM is failing and calls are being refused until it recovers"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM upstream unavailable, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of an API error (google-genai's ``code``, httpx's ``status_code``), if it has one"""
+    for attribute in ('code', 'status_code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'status_code', None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient failures: retryable HTTP statuses, dropped connections and transport timeouts"""
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    if isinstance(error, DeadlineExceeded):
+        # the request is out of time; another attempt cannot help
+        return False
+    if isinstance(error, (ConnectionError, asyncio.TimeoutError)):
+        return True
+    # httpx transport errors (connect/read timeouts, protocol errors) without importing httpx
+    return any(cls.__name__ == 'TransportError' for cls in type(error).__mro__)
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter: attempt n waits uniform(0, min(cap, base * 2**n))"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def delay(self, attempt: int) -> float:
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures; open -> half-open after
+    ``reset_timeout`` seconds, when one trial call decides between closing and reopening."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - self._clock())
+
+    def is_open(self) -> bool:
+        """Calls would be refused right now"""
+        return self.state == 'open' and self.retry_after() > 0
+
+    def allow(self) -> None:
+        """Raise ``CircuitOpenError`` unless a call may go through now"""
+        if self.state == 'open' and self.retry_after() <= 0:
+            self.state = 'half_open'
+        if self.state == 'closed':
+            return
+        if self.state == 'half_open' and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.retry_after() or self.reset_timeout)
+
+    def record_success(self) -> None:
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.opens += 1
+            self.state = 'open'
+            self.opened_at = self._clock()
+
+    def release(self) -> None:
+        """The call ended without telling us anything about the upstream (cancelled, bad request)"""
+        self._trial_in_flight = False
+
+
+class LatencyWindow:
+    """Recent successful call latencies, for percentiles"""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class ResilientCaller:
+    """Retries, hedging and a circuit breaker around one kind of upstream call.
+
+    ``call(make_attempt)`` runs ``make_attempt()`` (a coroutine factory):
+      * the breaker refuses immediately while open (``CircuitOpenError``);
+      * retryable errors are retried up to ``retry.max_attempts`` times with
+        jittered backoff; other errors are raised at once;
+      * with hedging on, if an attempt is still running after the p95 of
+        recent latencies (at least ``hedge_min_delay``), a duplicate is
+        started and the first success wins, the loser is cancelled.
+    """
+
+    def __init__(self, retry: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 hedge: bool = False, hedge_quantile: float = 0.95, hedge_min_delay: float = 0.5,
+                 hedge_min_samples: int = 20):
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyWindow()
+        self.counters: Dict[str, int] = {
+            'calls': 0, 'successes': 0, 'failures': 0, 'attempts': 0, 'retries': 0,
+            'hedges': 0, 'hedge_wins': 0, 'rejected': 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> 'ResilientCaller':
+        return cls(
+            retry=RetryPolicy(
+                max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+                base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.2")),
+                max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "2")),
+            ),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+            ),
+            hedge=os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes", "on"),
+            hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5")),
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long to wait before hedging, or None when hedging is off or latency is not known yet"""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.percentile(self.hedge_quantile))
+
+    async def _attempt(self, make_attempt: Callable[[], Awaitable[T]]) -> T:
+        self.counters['attempts'] += 1
+        delay = self.hedge_delay()
+        if delay is None:
+            return await make_attempt()
+
+        primary = asyncio.ensure_future(make_attempt())
+        # cancelled at any point (deadline, disconnect), no attempt may outlive the caller
+        pending = {primary}
+        error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                pending = set()
+                return primary.result()
+            self.counters['hedges'] += 1
+            self.counters['attempts'] += 1
+            hedge = asyncio.ensure_future(make_attempt())
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.counters['hedge_wins'] += task is hedge
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, make_attempt: Callable[[], Awaitable[T]]) -> T:
+        self.counters['calls'] += 1
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self.counters['rejected'] += 1
+            raise
+
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                result = await self._attempt(make_attempt)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    self.counters['failures'] += 1
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.retry.max_attempts or self.breaker.state == 'open':
+                    self.counters['failures'] += 1
+                    raise
+                delay = self.retry.delay(attempt)
+                deadline = current_deadline()
+                if deadline is not None and deadline.remaining() <= delay:
+                    # no time left for the backoff, let alone another attempt
+                    self.counters['failures'] += 1
+                    raise
+                self.counters['retries'] += 1
+                await asyncio.sleep(delay)
+                continue
+            self.latency.add(time.monotonic() - start)
+            self.breaker.record_success()
+            self.counters['successes'] += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        hedge_delay = self.hedge_delay()
+        return {
+            **self.counters,
+            'breaker_state': self.breaker.state,
+            'breaker_opens': self.breaker.opens,
+            'latency_p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'latency_p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'hedge_delay_ms': round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+        }
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+from core.metrics import llm_queue_seconds, registry
+
+LANES = ('interactive', 'batch', 'background')
+DEFAULT_WEIGHTS = {'interactive': 8, 'batch': 2, 'background': 1}
+
+# (lane, tenant) of the LLM calls made in the current request
+_priority: ContextVar[Tuple[str, str]] = ContextVar('llm_priority', default=('interactive', 'default'))
+
+
+@contextmanager
+def llm_priority(lane: str, tenant: Optional[str] = None) -> Iterator[None]:
+    """Run the LLM calls inside the block in ``lane``, queued fairly with other ``tenant``s"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}'; use one of {', '.join(LANES)}")
+    token = _priority.set((lane, tenant or 'default'))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Tuple[str, str]:
+    return _priority.get()
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in value.split(','):
+        if item.strip():
+            lane, _, weight = item.partition('=')
+            if lane.strip() not in LANES:
+                raise ValueError(f"Unknown lane '{lane.strip()}' in LLM_LANE_WEIGHTS")
+            weights[lane.strip()] = float(weight)
+    return weights
+
+
+class LLMScheduler:
+    """Hands out the LLM concurrency slots by lane, weight and tenant.
+
+    Each call waits in its lane (``interactive``, ``batch`` or
+    ``background``, from ``llm_priority``) and, within the lane, in its
+    tenant's queue. When a slot frees up the lanes take turns in
+    proportion to their weights (stride scheduling: the waiting lane that
+    has been served least relative to its weight goes next) and a lane's
+    tenants take turns one call each, so one tenant's thousand-question
+    job cannot push another's to the back. ``reserved`` slots are only
+    ever given to interactive calls, so bulk work can never fill the
+    whole capacity. ``fifo`` turns all of this off: one queue, first come
+    first served.
+    """
+
+    def __init__(self, capacity: int, reserved: int = 0, weights: Optional[Dict[str, float]] = None,
+                 fifo: bool = False):
+        self.capacity = max(1, capacity)
+        self.reserved = min(max(0, reserved), self.capacity - 1)
+        self.weights = {lane: max(1e-6, float(weight)) for lane, weight in (weights or DEFAULT_WEIGHTS).items()}
+        self.fifo = fifo
+        self.in_flight = {lane: 0 for lane in LANES}
+        self.waiting = {lane: 0 for lane in LANES}
+        self.dispatched = {lane: 0 for lane in LANES}
+        # lane -> tenant -> waiters; tenants are served round robin by moving to the end
+        self._queues: Dict[str, 'OrderedDict[str, Deque[asyncio.Future]]'] = {lane: OrderedDict() for lane in LANES}
+        self._pass = {lane: 0.0 for lane in LANES}
+        self._virtual_time = 0.0
+        self._wait_series = registry.series_cache()
+
+    @classmethod
+    def from_env(cls, capacity: int) -> 'LLMScheduler':
+        """LLM_INTERACTIVE_RESERVED, LLM_LANE_WEIGHTS and LLM_SCHEDULER (priority or fifo)"""
+        mode = os.getenv("LLM_SCHEDULER", "priority").lower()
+        if mode not in ('priority', 'fifo'):
+            raise ValueError(f"Unknown LLM_SCHEDULER '{mode}': use 'priority' or 'fifo'")
+        return cls(
+            capacity,
+            reserved=int(os.getenv("LLM_INTERACTIVE_RESERVED", str(capacity // 4))),
+            weights=_parse_weights(os.getenv("LLM_LANE_WEIGHTS", "")),
+            fifo=mode == 'fifo',
+        )
+
+    @property
+    def total_in_flight(self) -> int:
+        return sum(self.in_flight.values())
+
+    def _has_room(self, lane: str) -> bool:
+        total = self.total_in_flight
+        if total >= self.capacity:
+            return False
+        if lane == 'interactive':
+            return True
+        return total - self.in_flight['interactive'] < self.capacity - self.reserved
+
+    def _grant(self, lane: str) -> None:
+        self.in_flight[lane] += 1
+        self.dispatched[lane] += 1
+        self._virtual_time = self._pass[lane]
+        self._pass[lane] += 1.0 / self.weights.get(lane, 1.0)
+
+    def _dispatch(self) -> None:
+        """Give free slots to waiters, lane by weighted turn, tenant by round robin"""
+        while True:
+            ready = [lane for lane in LANES if self.waiting[lane] and self._has_room(lane)]
+            if not ready:
+                return
+            lane = min(ready, key=self._pass.__getitem__)
+            tenants = self._queues[lane]
+            tenant, waiters = next(iter(tenants.items()))
+            waiter = waiters.popleft()
+            self.waiting[lane] -= 1
+            if waiters:
+                tenants.move_to_end(tenant)
+            else:
+                del tenants[tenant]
+            if waiter.done():
+                continue
+            self._grant(lane)
+            waiter.set_result(None)
+
+    async def acquire(self) -> str:
+        """Wait for a slot; returns the lane to pass to ``release``"""
+        lane, tenant = ('interactive', 'default') if self.fifo else current_priority()
+        if not any(self.waiting.values()) and self._has_room(lane):
+            self._grant(lane)
+            self._observe_wait(lane, 0.0)
+            return lane
+
+        if not self.waiting[lane]:
+            # a lane coming back from idle does not get credit for the time it was away
+            self._pass[lane] = max(self._pass[lane], self._virtual_time)
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[lane].setdefault(tenant, deque()).append(waiter)
+        self.waiting[lane] += 1
+        start = time.perf_counter()
+        self._dispatch()
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # granted just as the caller gave up (deadline, disconnect): free the slot again
+                self.release(lane)
+            else:
+                waiter.cancel()
+                self._remove(lane, tenant, waiter)
+            raise
+        self._observe_wait(lane, time.perf_counter() - start)
+        return lane
+
+    def _observe_wait(self, lane: str, seconds: float) -> None:
+        series = self._wait_series.get(lane)
+        if series is None:
+            series = self._wait_series[lane] = llm_queue_seconds.labels(lane)
+        series.observe(seconds)
+
+    def _remove(self, lane: str, tenant: str, waiter: asyncio.Future) -> None:
+        waiters = self._queues[lane].get(tenant)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self.waiting[lane] -= 1
+            if not waiters:
+                del self._queues[lane][tenant]
+
+    def release(self, lane: str) -> None:
+        self.in_flight[lane] -= 1
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            lane: {
+                'weight': self.weights.get(lane, 1.0),
+                'in_flight': self.in_flight[lane],
+                'waiting': self.waiting[lane],
+                'tenants_waiting': len(self._queues[lane]),
+                'dispatched': self.dispatched[lane],
+            }
+            for lane in LANES
+        }
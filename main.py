@@ -1,11 +1,20 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from agents.tutor_agent import TutorAgent
+from core.admission import Admission, AdmissionMiddleware
+from core.deadline import DeadlineExceeded
+from core.metrics import HTTPMetricsMiddleware, registry as metrics
+from llm.resilience import CircuitOpenError
+from llm.scheduler import llm_priority
 from dotenv import load_dotenv
+import json
 import logging
-from typing import List
+import math
+import os
+import time
+from typing import List, Optional
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -15,17 +24,72 @@ load_dotenv()
 
 app = FastAPI(title="AI Tutor Multi-Agent System")
 app.mount("/static", StaticFiles(directory="static"), name="static")
+# per-client rate limits and load shedding on the answering routes; instant tool
+# answers skip the concurrency limit (and are handed to the route in the scope).
+# Added first so the metrics middleware sees its 429s.
+admission = Admission.from_env(
+    fast_path=lambda body: tutor.instant_answer(body['question'], explain=bool(body.get('explain')))
+)
+app.add_middleware(AdmissionMiddleware, admission=admission)
+app.add_middleware(HTTPMetricsMiddleware)
 
 # Initialize tutor agent
 tutor = TutorAgent()
 
 class QueryRequest(BaseModel):
     question: str
+    explain: bool = False
 
 class QueryResponse(BaseModel):
     answer: str
     agent_used: str
     tools_used: List[str]
+    cached: bool = False
+    tool_only: bool = False
+    degraded: List[str] = []
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    explain: bool = False
+    # LLM lane: "batch" for bulk jobs, "background" for cache warm-up
+    priority: str = "batch"
+
+class BatchItem(BaseModel):
+    index: int
+    question: str
+    answer: Optional[str] = None
+    agent_used: Optional[str] = None
+    tools_used: List[str] = []
+    cached: bool = False
+    tool_only: bool = False
+    degraded: List[str] = []
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchItem]
+    stats: dict
+
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "200"))
+# the prompt token budget only trims tool context, so the question's own size is capped here
+MAX_QUESTION_LENGTH = int(os.getenv("MAX_QUESTION_LENGTH", "2000"))
+# clients may ask for a shorter (or longer) deadline with X-Request-Timeout, in seconds
+MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT", "120"))
+
+def _request_timeout(header: Optional[str]) -> Optional[float]:
+    """The deadline asked for in the header, clamped to MAX_REQUEST_TIMEOUT; None for the default"""
+    if header is None:
+        return None
+    try:
+        timeout = float(header)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Request-Timeout must be a number of seconds.")
+    if timeout <= 0:
+        raise HTTPException(status_code=400, detail="X-Request-Timeout must be positive.")
+    return min(timeout, MAX_REQUEST_TIMEOUT)
+
+def _check_question_length(*questions: str) -> None:
+    if any(len(question) > MAX_QUESTION_LENGTH for question in questions):
+        raise HTTPException(status_code=413, detail=f"A question may be at most {MAX_QUESTION_LENGTH} characters.")
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
@@ -34,24 +98,156 @@ async def read_root():
     return HTMLResponse(content=content)
 
 @app.post("/ask", response_model=QueryResponse)
-async def ask_question(request: QueryRequest):
+async def ask_question(request: QueryRequest, http_request: Request, x_request_timeout: Optional[str] = Header(None)):
+    _check_question_length(request.question)
+    timeout = _request_timeout(x_request_timeout)
     try:
-        result = await tutor.process_query(request.question)
+        with llm_priority('interactive', tenant=admission.client(http_request.scope)):
+            result = await tutor.process_query(request.question, explain=request.explain, timeout=timeout,
+                                               instant=http_request.scope.get('fast_path'))
         
         if not result:
-            logger.warning(f"No answer found for question: {request.question}")
+            logger.warning("No answer found for a %d-character question", len(request.question))
             raise HTTPException(status_code=404, detail="No answer found for the question.")
         
-        logger.info(f"Question: {request.question}, Agent Used: {result['agent_used']}, Tools Used: {result['tools_used']}")
+        # the question itself stays out of the per-request log lines
+        logger.info("Answered by %s, tools: %s", result['agent_used'], result['tools_used'])
         
         return QueryResponse(
             answer=result["answer"],
             agent_used=result["agent_used"],
-            tools_used=result["tools_used"]
+            tools_used=result["tools_used"],
+            cached=result.get("cached", False),
+            tool_only=result.get("tool_only", False),
+            degraded=result.get("degraded", [])
         )
+    except DeadlineExceeded as e:
+        logger.warning("Deadline exceeded during %s for a %d-character question", e.stage, len(request.question))
+        raise HTTPException(status_code=504, detail=str(e))
+    except CircuitOpenError as e:
+        logger.warning("LLM unavailable, retry in %.1fs", e.retry_after)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    except Exception as e:
+        logger.error("Error processing a %d-character question: %s", len(request.question), e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/ask/batch", response_model=BatchQueryResponse)
+async def ask_batch(request: BatchQueryRequest, http_request: Request, x_request_timeout: Optional[str] = Header(None)):
+    if not request.questions:
+        raise HTTPException(status_code=422, detail="At least one question is required.")
+    if request.priority not in ('batch', 'background'):
+        raise HTTPException(status_code=422, detail="priority must be 'batch' or 'background'.")
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_QUESTIONS} questions.")
+    _check_question_length(*request.questions)
+    timeout = _request_timeout(x_request_timeout)
+    try:
+        # bulk work queues behind interactive questions, and fairly against other clients' batches
+        with llm_priority(request.priority, tenant=admission.client(http_request.scope)):
+            batch = await tutor.process_batch(request.questions, explain=request.explain, timeout=timeout)
     except Exception as e:
-        logger.error(f"Error processing question: {request.question}, Error: {str(e)}")
+        logger.error("Error processing batch of %d questions: %s", len(request.questions), e)
         raise HTTPException(status_code=500, detail=str(e))
+    logger.info("Batch of %d questions answered, stats: %s", len(request.questions), batch['stats'])
+    return BatchQueryResponse(
+        results=[BatchItem(**{k: v for k, v in item.items() if k in BatchItem.model_fields}) for item in batch['results']],
+        stats=batch['stats']
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest, http_request: Request,
+                              x_request_timeout: Optional[str] = Header(None)):
+    """Stream the answer as Server-Sent Events: meta, then token chunks, then done (or error)"""
+    _check_question_length(request.question)
+    timeout = _request_timeout(x_request_timeout)
+    tenant = admission.client(http_request.scope)
+    instant = http_request.scope.get('fast_path')
+
+    async def events():
+        start = time.perf_counter()
+        ttfb_ms = None
+        try:
+            with llm_priority('interactive', tenant=tenant):
+                async for event, data in tutor.stream_query(request.question, explain=request.explain,
+                                                            timeout=timeout, instant=instant):
+                    if event == 'token' and ttfb_ms is None:
+                        ttfb_ms = (time.perf_counter() - start) * 1000
+                    yield _sse(event, data)
+        except Exception as e:
+            logger.error("Error streaming answer: %s", e)
+            yield _sse('error', {'detail': str(e)})
+            return
+        total_ms = (time.perf_counter() - start) * 1000
+        logger.info("Streamed answer: ttfb %.0f ms, total %.0f ms", ttfb_ms or total_ms, total_ms)
+        yield _sse('done', {'ttfb_ms': ttfb_ms if ttfb_ms is not None else total_ms, 'total_ms': total_ms})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if tutor.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **tutor.cache.stats()}
+
+@app.get("/coalescing/stats")
+async def coalescing_stats():
+    return tutor.coalescing_stats()
+
+@app.get("/prompts/stats")
+async def prompt_stats():
+    return tutor.prompt_stats()
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return tutor.llm_stats()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+# numbers the cache, coalescer and LLM client already keep, read at scrape time
+metrics.collector('tutor_cache_lookups_total', 'Answer and routing cache lookups', 'counter', ['result'],
+                  lambda: {('hit',): tutor.cache.hits, ('miss',): tutor.cache.misses} if tutor.cache is not None else {})
+metrics.collector('tutor_cache_hit_ratio', 'Share of cache lookups that were hits', 'gauge', [],
+                  lambda: {(): tutor.cache.stats()['hit_ratio']} if tutor.cache is not None else {})
+metrics.collector('tutor_cache_entries', 'Entries in the answer cache', 'gauge', [],
+                  lambda: {(): len(tutor.cache)} if tutor.cache is not None else {})
+metrics.collector('tutor_coalesced_total', 'Calls that joined an identical run already in flight', 'counter', ['flight'],
+                  lambda: {(flight,): stats['coalesced'] for flight, stats in tutor.coalescing_stats().items()})
+metrics.collector('tutor_llm_calls_total', 'LLM calls by outcome', 'counter', ['outcome'],
+                  lambda: {(outcome,): tutor.llm.resilience.counters[key] for outcome, key in
+                           (('success', 'successes'), ('failure', 'failures'), ('rejected', 'rejected'))})
+metrics.collector('tutor_llm_attempts_total', 'LLM attempts, retries and hedges included', 'counter', ['kind'],
+                  lambda: {(kind,): tutor.llm.resilience.counters[key] for kind, key in
+                           (('all', 'attempts'), ('retry', 'retries'), ('hedge', 'hedges'))})
+metrics.collector('tutor_llm_in_flight', 'LLM completions in flight', 'gauge', [],
+                  lambda: {(): tutor.llm.in_flight})
+metrics.collector('tutor_llm_circuit_open', '1 while the LLM circuit breaker refuses calls', 'gauge', [],
+                  lambda: {(): int(not tutor.llm.available())})
+metrics.collector('tutor_llm_queue_depth', 'LLM calls waiting for a slot, per priority lane', 'gauge', ['lane'],
+                  lambda: {(lane,): stats['waiting'] for lane, stats in tutor.llm.scheduler.stats().items()})
+metrics.collector('tutor_llm_lane_in_flight', 'LLM calls in flight, per priority lane', 'gauge', ['lane'],
+                  lambda: {(lane,): stats['in_flight'] for lane, stats in tutor.llm.scheduler.stats().items()})
+metrics.collector('tutor_admission_total', 'Requests to the answering routes by admission outcome', 'counter', ['outcome'],
+                  lambda: {(outcome,): count for outcome, count in admission.counters.items()})
+metrics.collector('tutor_admission_in_flight', 'Requests holding an admission slot', 'gauge', [],
+                  lambda: {(): admission.limit.in_flight} if admission.limit is not None else {})
+metrics.collector('tutor_admission_queue_depth', 'Requests waiting for an admission slot', 'gauge', [],
+                  lambda: {(): admission.limit.waiting} if admission.limit is not None else {})
+metrics.collector('tutor_prompt_tokens_total', 'Estimated prompt tokens built, per prompt template', 'counter', ['template'],
+                  lambda: {(name,): stats['tokens'] for name, stats in tutor.prompt_stats().items()})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition of the request, stage, routing, tool, cache and LLM metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Health check endpoint
 @app.get("/health")
@@ -0,0 +1,93 @@
+"""Train and evaluate the local query classifier used by TutorAgent.
+
+Reads a JSON-lines file of ``{"query": ..., "label": ...}`` rows, reports
+hold-out accuracy and per-query classification latency, then refits on the
+full file and writes the artifact loaded at startup.
+
+    python scripts/train_classifier.py --data agents/data/labeled_queries.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from agents.query_classifier import DEFAULT_MODEL_PATH, LocalQueryClassifier
+
+
+def load_rows(path):
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [row["query"] for row in rows], [row["label"] for row in rows]
+
+
+def evaluate(model, texts, labels, threshold, repeat):
+    predictions = [model.predict(text) for text in texts]
+    correct = sum(1 for (label, _), expected in zip(predictions, labels) if label == expected)
+    confident = [(label, expected) for (label, confidence), expected in zip(predictions, labels)
+                 if confidence >= threshold]
+    confident_correct = sum(1 for label, expected in confident if label == expected)
+
+    timings = []
+    for _ in range(repeat):
+        for text in texts:
+            start = time.perf_counter()
+            model.predict(text)
+            timings.append(time.perf_counter() - start)
+    timings_us = np.array(timings) * 1e6
+
+    print(f"accuracy:             {correct / len(texts):.3f} ({correct}/{len(texts)})")
+    if confident:
+        print(f"confident (>= {threshold:.2f}):   {len(confident) / len(texts):.1%} of queries, "
+              f"accuracy {confident_correct / len(confident):.3f}")
+    for label in sorted(set(labels)):
+        total = sum(1 for expected in labels if expected == label)
+        hits = sum(1 for (predicted, _), expected in zip(predictions, labels)
+                   if expected == label and predicted == label)
+        print(f"  {label:<10} {hits}/{total}")
+    print(f"latency p50/p99/max:  {np.percentile(timings_us, 50):.1f} / "
+          f"{np.percentile(timings_us, 99):.1f} / {timings_us.max():.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local query classifier")
+    parser.add_argument("--data", default=os.path.join(ROOT, "agents", "data", "labeled_queries.jsonl"))
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction of rows kept for evaluation")
+    parser.add_argument("--threshold", type=float, default=0.5, help="confidence reported as 'confident'")
+    parser.add_argument("--epochs", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=20, help="timing passes over the evaluation set")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--eval-only", action="store_true", help="evaluate the existing artifact on --data")
+    args = parser.parse_args()
+
+    texts, labels = load_rows(args.data)
+
+    if args.eval_only:
+        evaluate(LocalQueryClassifier.load(args.output), texts, labels, args.threshold, args.repeat)
+        return
+
+    order = list(range(len(texts)))
+    random.Random(args.seed).shuffle(order)
+    split = int(len(order) * (1 - args.holdout))
+    train, test = order[:split], order[split:]
+
+    if test:
+        model = LocalQueryClassifier.train([texts[i] for i in train], [labels[i] for i in train],
+                                           epochs=args.epochs)
+        print(f"hold-out evaluation ({len(train)} train / {len(test)} test)")
+        evaluate(model, [texts[i] for i in test], [labels[i] for i in test], args.threshold, args.repeat)
+
+    model = LocalQueryClassifier.train(texts, labels, epochs=args.epochs)
+    model.save(args.output)
+    print(f"wrote {args.output} ({os.path.getsize(args.output) / 1024:.1f} KiB, trained on {len(texts)} rows)")
+
+
+if __name__ == "__main__":
+    main()
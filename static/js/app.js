@@ -36,39 +36,61 @@ document.addEventListener('DOMContentLoaded', () => {
         userMessage.innerHTML = `<div class="response">${userQuery}</div>`;
         chatBox.insertBefore(userMessage, chatBox.firstChild);
 
+        const agentMessage = document.createElement('div');
+        agentMessage.classList.add('message', 'agent');
+        agentMessage.innerHTML = `
+            <div class="agent-name"></div>
+            <div class="response"></div>
+            <div class="tools-info hidden"></div>
+            <div class="timing-info hidden"></div>
+        `;
+        const agentName = agentMessage.querySelector('.agent-name');
+        const responseDiv = agentMessage.querySelector('.response');
+        const toolsDiv = agentMessage.querySelector('.tools-info');
+        const timingDiv = agentMessage.querySelector('.timing-info');
+
         try {
-            const response = await fetch('/ask', {
+            const startedAt = performance.now();
+            let firstTokenAt = null;
+            let answer = '';
+
+            const response = await fetch('/ask/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({ question: userQuery })
             });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
 
-            const data = await response.json();
-            console.log('API Response:', data);
-
-            const agentMessage = document.createElement('div');
-            agentMessage.classList.add('message', 'agent');
-            
-            // tools info generation
-            let toolsInfo = '';
-            if (data.tools_used && data.tools_used.length > 0) {
-                toolsInfo = `<div class="tools-info">Tools used: ${data.tools_used.join(', ')}</div>`;
-                console.log('Rendering tools:', data.tools_used);
-            } else {
-                console.log('No tools used in response');
-            }
-
-            agentMessage.innerHTML = `
-                <div class="agent-name">${data.agent_used}:</div>
-                <div class="response">${formatAnswer(data.answer)}</div>
-                ${toolsInfo}
-            `;
-            chatBox.insertBefore(agentMessage, chatBox.firstChild);
-            
+            await readEvents(response, (event, data) => {
+                if (event === 'meta') {
+                    console.log('Answer metadata:', data);
+                    agentName.textContent = `${data.agent_used}:`;
+                    // tools info generation
+                    if (data.tools_used && data.tools_used.length > 0) {
+                        toolsDiv.textContent = `Tools used: ${data.tools_used.join(', ')}`;
+                        toolsDiv.classList.remove('hidden');
+                    }
+                    chatBox.insertBefore(agentMessage, chatBox.firstChild);
+                    loadingIndicator.classList.add('hidden');
+                } else if (event === 'token') {
+                    if (firstTokenAt === null) firstTokenAt = performance.now();
+                    answer += data.text;
+                    responseDiv.innerHTML = formatAnswer(answer);
+                } else if (event === 'done') {
+                    const total = performance.now() - startedAt;
+                    const ttfb = (firstTokenAt ?? performance.now()) - startedAt;
+                    console.log('Server timing:', data);
+                    timingDiv.textContent = `First token ${Math.round(ttfb)} ms · total ${(total / 1000).toFixed(1)} s`;
+                    timingDiv.classList.remove('hidden');
+                } else if (event === 'error') {
+                    throw new Error(data.detail);
+                }
+            });
         } catch (error) {
             console.error('Error fetching response:', error);
+            agentMessage.remove();
             const errorMessage = document.createElement('div');
             errorMessage.classList.add('message', 'agent');
             errorMessage.innerHTML = `<div class="agent-name">Error:</div><div class="response">Sorry, something went wrong. Please try again.</div>`;
@@ -81,6 +103,30 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Parse a Server-Sent Events body, calling onEvent(event, data) for each message
+    async function readEvents(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                }
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+
     function formatAnswer(answer) {
         let formattedAnswer = answer.replace(/\n/g, '<br/>');
         formattedAnswer = formattedAnswer.replace(/\*\*(.*?)\*\*/g, '<b>$1</b>');
@@ -0,0 +1,56 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class BatchMemo:
+    """Results of tool lookups made while one batch is being answered"""
+
+    def __init__(self):
+        self.results: Dict[Any, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+
+_active_memo: ContextVar[Optional[BatchMemo]] = ContextVar('tool_batch_memo', default=None)
+
+
+@contextmanager
+def batch_memo() -> Iterator[BatchMemo]:
+    """Share tool results between every task started inside this block.
+
+    asyncio tasks copy the current context when they are created, so agent
+    calls fanned out from inside the block all see the same memo.
+    """
+    memo = BatchMemo()
+    token = _active_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _active_memo.reset(token)
+
+
+def batch_memoized(method: Callable) -> Callable:
+    """Compute a deterministic tool lookup once per batch; no-op outside a batch.
+
+    Every caller in the batch gets the same result object, not a copy, so
+    results must be treated as read-only.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        memo = _active_memo.get()
+        if memo is None:
+            return method(self, *args, **kwargs)
+        key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+        try:
+            result = memo.results[key]
+        except KeyError:
+            memo.misses += 1
+            result = memo.results[key] = method(self, *args, **kwargs)
+        else:
+            memo.hits += 1
+        return result
+
+    return wrapper
@@ -1,6 +1,21 @@
 import re
 import math
 from typing import Dict, Any
+import numpy as np
+from .batch_memo import batch_memoized
+from .expression_evaluator import ArrayEvaluator, ExpressionEvaluator, ExpressionTooExpensive
+
+# Longest phrases first so 'multiplied by' is not split by a shorter match
+_WORD_OPERATORS = [
+    ('to the power of', '**'), ('raised to', '**'),
+    ('multiplied by', '*'), ('divided by', '/'), ('divide', '/'),
+    ('plus', '+'), ('minus', '-'), ('times', '*'),
+    ('×', '*'), ('÷', '/'), ('^', '**'), ('π', ' pi '),
+]
+# Symbols only: in batch mode words are variable names
+_SYMBOL_OPERATORS = [('×', '*'), ('÷', '/'), ('^', '**'), ('π', 'pi')]
+# a word that does not start inside a number, so 2e5 stays a literal
+_IDENTIFIER = re.compile(r'(?<![\d.])[A-Za-z_]\w*')
 
 class CalculatorTool:
     def __init__(self):
@@ -31,42 +46,37 @@ class CalculatorTool:
             'degrees': math.degrees,
             'radians': math.radians
         }
+        self.evaluator = ExpressionEvaluator(self.safe_functions)
+        self.array_evaluator = ArrayEvaluator()
     
     def _sanitize_expression(self, expression: str) -> str:
-        # Enhanced sanitization with more mathematical operations
-        expression = re.sub(r'[^0-9+\-*/().\s**×÷√π]', '', expression)
-        
-        replacements = {
-            'x': '*', 'X': '*',
-            '×': '*', '÷': '/',
-            'plus': '+', 'minus': '-',
-            'times': '*', 'multiplied by': '*',
-            'divided by': '/', 'divide': '/',
-            'to the power of': '**',
-            'raised to': '**',
-            '^': '**',
-            '√': 'sqrt',
-            'π': str(math.pi)
-        }
-        
-        for old, new in replacements.items():
+        for old, new in _WORD_OPERATORS:
             expression = expression.replace(old, new)
-        
+        expression = re.sub(r'√\s*(\d+(?:\.\d+)?)', r'sqrt(\1)', expression)
+        expression = re.sub(r'(?<=[\d)\s])[xX](?=\s*[\d(])', '*', expression)
+
+        # Keep known functions (when called) and constants, drop other words
+        def keep_known(match: re.Match) -> str:
+            name = match.group(0)
+            value = self.safe_functions.get(name)
+            if value is None:
+                return ' '
+            if callable(value) and not expression[match.end():].lstrip().startswith('('):
+                return ' '
+            return name
+
+        expression = _IDENTIFIER.sub(keep_known, expression)
+        expression = re.sub(r'[^0-9A-Za-z_+\-*/().,%!\s]', '', expression)
         return expression.strip()
-    
+
     def _safe_eval(self, expression: str) -> float:
+        result = self.evaluator.evaluate(expression)
         try:
-            safe_dict = {
-                '__builtins__': {},
-                **self.safe_functions
-            }
-            
-            result = eval(expression, safe_dict)
             return float(result)
-            
-        except Exception as e:
+        except (OverflowError, TypeError) as e:
             raise ValueError(f"Could not evaluate expression '{expression}': {str(e)}")
-    
+
+    @batch_memoized
     def calculate(self, expression: str) -> Dict[str, Any]:
         try:
             clean_expression = self._sanitize_expression(expression)
@@ -91,7 +101,15 @@ class CalculatorTool:
                 'original_expression': expression,
                 'formatted_result': self._format_result(result)
             }
-            
+
+        except ExpressionTooExpensive as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': 'too_expensive',
+                'limit': e.limit,
+                'expression': expression
+            }
         except Exception as e:
             return {
                 'success': False,
@@ -99,6 +117,34 @@ class CalculatorTool:
                 'expression': expression
             }
     
+    def calculate_batch(self, expression: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Evaluate ``expression`` once per binding in ``variables`` (name -> array).
+
+        The expression is parsed once and run over NumPy arrays, broadcasting
+        the variables against each other. Elements that fail (division by
+        zero, sqrt of a negative, overflow) are NaN in ``result`` and True in
+        ``error_mask``; only an invalid expression fails the whole call.
+        """
+        clean_expression = expression.strip()
+        for old, new in _SYMBOL_OPERATORS:
+            clean_expression = clean_expression.replace(old, new)
+        try:
+            result, error_mask = self.array_evaluator.evaluate(clean_expression, variables)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'expression': expression
+            }
+        return {
+            'success': True,
+            'result': result,
+            'error_mask': error_mask,
+            'error_count': int(error_mask.sum()),
+            'expression': clean_expression,
+            'original_expression': expression
+        }
+
     def _handle_special_functions(self, expression: str) -> str:
         """Handle special mathematical functions and operations"""
         # Handle percentage calculations
@@ -151,3 +197,36 @@ class CalculatorTool:
                 'type': 'no_real_solutions',
                 'discriminant': discriminant
             }
+
+    def solve_quadratic_batch(self, a: Any, b: Any, c: Any) -> Dict[str, Any]:
+        """Solve ax² + bx + c = 0 for arrays of coefficients.
+
+        ``x1``/``x2`` follow the ordering of ``solve_quadratic`` ((-b ± √d) / 2a)
+        and are NaN where there is no real solution; ``num_solutions`` is 2, 1
+        or 0 per equation. Equations that are not quadratic (a == 0) or have
+        non-finite coefficients are NaN with True in ``error_mask``.
+        """
+        a, b, c = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (a, b, c)))
+        with np.errstate(all='ignore'):
+            discriminant = b * b - 4 * a * c
+            root = np.sqrt(np.where(discriminant >= 0, discriminant, np.nan))
+            # (-b - sign(b)√d) / 2 avoids cancellation; the other root is c / (a·q)
+            q = -0.5 * (b + np.where(b >= 0, root, -root))
+            large = q / a
+            small = np.where(q != 0, c / q, 0.0)
+            x1 = np.where(b >= 0, small, large)
+            x2 = np.where(b >= 0, large, small)
+
+        error_mask = (a == 0) | ~np.isfinite(a) | ~np.isfinite(b) | ~np.isfinite(c)
+        num_solutions = np.where(discriminant > 0, 2, np.where(discriminant == 0, 1, 0))
+        num_solutions[error_mask] = 0
+        no_roots = error_mask | (num_solutions == 0)
+        x1[no_roots] = np.nan
+        x2[no_roots] = np.nan
+        return {
+            'x1': x1,
+            'x2': x2,
+            'discriminant': np.where(error_mask, np.nan, discriminant),
+            'num_solutions': num_solutions,
+            'error_mask': error_mask
+        }
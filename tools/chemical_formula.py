@@ -0,0 +1,129 @@
+import re
+from functools import lru_cache
+from typing import Dict, NamedTuple, Tuple
+
+from .periodic_table_tool import load_elements
+
+SYMBOLS = frozenset(element.symbol for element in load_elements().records)
+
+_TOKEN = re.compile(r"([A-Z][a-z]?)|(\d+)|([(\[{])|([)\]}])|(\S)")
+# hydrate / adduct separators: CuSO4·5H2O, CuSO4.5H2O, CuSO4*5H2O
+_PARTS = re.compile(r"\s*[·•∙.*]\s*")
+_LEADING_COUNT = re.compile(r"^(\d+)(?=\D)")
+# ^2-, ^+, +3, -2, +++, or digits and a sign (see _split_charge)
+_CHARGE = re.compile(r"(?:\^(?P<caret>\d*[+-])|(?P<sign_first>[+-]\d+)|(?P<signs>\++|-+)|(?P<plain>\d+[+-]))$")
+_SUBSCRIPTS = str.maketrans("₀₁₂₃₄₅₆₇₈₉", "0123456789")
+_SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻", "0123456789+-")
+_SUPERSCRIPT_RUN = re.compile(r"[⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻]+")
+_CLOSING = {'(': ')', '[': ']', '{': '}'}
+
+
+class FormulaError(ValueError):
+    """The text is not a valid chemical formula"""
+
+
+class Formula(NamedTuple):
+    """A parsed formula: atom counts in order of first appearance, and the ionic charge"""
+    formula: str
+    counts: Tuple[Tuple[str, int], ...]
+    charge: int = 0
+
+    @property
+    def composition(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+
+def _split_charge(text: str) -> Tuple[str, int]:
+    """Strip a trailing charge.
+
+    ``^`` marks the charge explicitly (``SO4^2-``, ``Fe^3+``); so does a
+    sign before the digits (``Fe+3``) or repeated signs (``Fe+++``). Bare
+    digits before a sign are a charge only on a single atom (``Fe3+``,
+    ``O2-``); otherwise they are the last subscript (``NH4+``, ``SO4-``),
+    and a bracket group's trailing digits before a sign are its charge
+    (``[Fe(CN)6]3-``).
+    """
+    match = _CHARGE.search(text)
+    if not match:
+        return text, 0
+    body = text[:match.start()]
+    token = match.group(match.lastgroup)
+    if match.lastgroup == 'caret':
+        magnitude, sign = token[:-1], token[-1]
+    elif match.lastgroup == 'sign_first':
+        magnitude, sign = token[1:], token[0]
+    elif match.lastgroup == 'signs':
+        magnitude, sign = str(len(token)), token[0]
+    else:
+        digits, sign = token[:-1], token[-1]
+        if body.endswith((']', ')', '}')) or (body in SYMBOLS):
+            magnitude = digits
+        else:
+            body, magnitude = body + digits, ''
+    charge = int(magnitude or 1)
+    return body, charge if sign == '+' else -charge
+
+
+def _parse_group(text: str, formula: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    # each frame: (counts inside the group, expected closing bracket)
+    stack = [(counts, None)]
+    tokens = list(_TOKEN.finditer(text))
+    i = 0
+    while i < len(tokens):
+        symbol, number, opening, closing, other = tokens[i].groups()
+        multiplier = 1
+        if i + 1 < len(tokens) and tokens[i + 1].group(2):
+            multiplier = int(tokens[i + 1].group(2))
+            i += 1
+        if symbol:
+            if symbol not in SYMBOLS:
+                raise FormulaError(f"Unknown element '{symbol}' in '{formula}'")
+            current = stack[-1][0]
+            current[symbol] = current.get(symbol, 0) + multiplier
+        elif opening:
+            if multiplier != 1:
+                raise FormulaError(f"Unexpected number after '{opening}' in '{formula}'")
+            stack.append(({}, _CLOSING[opening]))
+        elif closing:
+            inner, expected = stack.pop() if len(stack) > 1 else ({}, None)
+            if closing != expected:
+                raise FormulaError(f"Unbalanced '{closing}' in '{formula}'")
+            current = stack[-1][0]
+            for element, count in inner.items():
+                current[element] = current.get(element, 0) + count * multiplier
+        else:
+            raise FormulaError(f"Unexpected '{number or other}' in '{formula}'")
+        i += 1
+    if len(stack) > 1:
+        raise FormulaError(f"Missing '{stack[-1][1]}' in '{formula}'")
+    return counts
+
+
+@lru_cache(maxsize=4096)
+def parse_formula(formula: str) -> Formula:
+    """Parse ``H2SO4``, ``Ca(OH)2``, ``K4[Fe(CN)6]``, ``CuSO4·5H2O`` or ``SO4^2-``.
+
+    Raises ``FormulaError`` for unknown elements, unbalanced brackets and
+    other malformed input. Results are cached, so repeated formulas cost a
+    dict lookup.
+    """
+    # H₂O -> H2O; a superscript is always a charge: SO₄²⁻ -> SO4^2-
+    text = formula.strip().translate(_SUBSCRIPTS)
+    text = _SUPERSCRIPT_RUN.sub(lambda match: '^' + match.group().translate(_SUPERSCRIPTS), text)
+    if not text:
+        raise FormulaError("Empty formula")
+    text, charge = _split_charge(text)
+
+    counts: Dict[str, int] = {}
+    for part in _PARTS.split(text):
+        if not part:
+            raise FormulaError(f"Empty component in '{formula}'")
+        # a leading number multiplies the component: the 5 in ·5H2O
+        match = _LEADING_COUNT.match(part)
+        multiplier = int(match.group(1)) if match else 1
+        for element, count in _parse_group(part[match.end():] if match else part, formula).items():
+            counts[element] = counts.get(element, 0) + count * multiplier
+    if not counts:
+        raise FormulaError(f"No elements in '{formula}'")
+    return Formula(formula.strip(), tuple(counts.items()), charge)
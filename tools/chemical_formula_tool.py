@@ -0,0 +1,84 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .batch_memo import batch_memoized
+from .chemical_formula import FormulaError, parse_formula
+from .periodic_table_tool import PeriodicTableTool
+
+
+class ChemicalFormulaTool:
+    """Molar mass and composition of chemical formulas, from the periodic table's atomic masses"""
+
+    def __init__(self, periodic_table: Optional[PeriodicTableTool] = None):
+        self.periodic_table = periodic_table or PeriodicTableTool()
+        table = self.periodic_table.table
+        self.masses: Dict[str, float] = {e.symbol: e.atomic_mass for e in table.records}
+        # column of each element in the mass vector used by molar_mass_batch
+        self._columns: Dict[str, int] = {e.symbol: i for i, e in enumerate(table.records)}
+        self._mass_vector = table.atomic_mass
+
+    @batch_memoized
+    def analyze(self, formula: str) -> Dict[str, Any]:
+        """Molar mass (g/mol), atom counts, mass per element and percent composition
+
+        An ion's charge is reported but does not change its mass: electron
+        masses are below the precision of the atomic masses.
+        """
+        try:
+            parsed = parse_formula(formula)
+        except FormulaError as e:
+            return {'success': False, 'formula': formula, 'error': str(e)}
+
+        element_mass = {symbol: count * self.masses[symbol] for symbol, count in parsed.counts}
+        molar_mass = sum(element_mass.values())
+        return {
+            'success': True,
+            'formula': parsed.formula,
+            'charge': parsed.charge,
+            'molar_mass': molar_mass,
+            'composition': parsed.composition,
+            'element_mass': element_mass,
+            'percent_composition': {symbol: 100 * mass / molar_mass for symbol, mass in element_mass.items()},
+        }
+
+    def molar_mass(self, formula: str) -> Optional[float]:
+        result = self.analyze(formula)
+        return result['molar_mass'] if result['success'] else None
+
+    def percent_composition(self, formula: str) -> Optional[Dict[str, float]]:
+        result = self.analyze(formula)
+        return result['percent_composition'] if result['success'] else None
+
+    def analyze_batch(self, formulas: List[str]) -> List[Dict[str, Any]]:
+        return [self.analyze(formula) for formula in formulas]
+
+    def molar_mass_batch(self, formulas: List[str]) -> Dict[str, Any]:
+        """Molar masses of many formulas at once.
+
+        Each formula becomes a row of atom counts and the masses are one
+        matrix-vector product; formulas that fail to parse come back as NaN
+        with ``error_mask`` set and their message in ``errors``.
+        """
+        counts = np.zeros((len(formulas), len(self._columns)))
+        error_mask = np.zeros(len(formulas), dtype=bool)
+        errors: Dict[int, str] = {}
+        for row, formula in enumerate(formulas):
+            try:
+                parsed = parse_formula(formula)
+            except FormulaError as e:
+                error_mask[row] = True
+                errors[row] = str(e)
+                continue
+            for symbol, count in parsed.counts:
+                counts[row, self._columns[symbol]] = count
+
+        molar_masses = counts @ self._mass_vector
+        molar_masses[error_mask] = np.nan
+        return {
+            'success': not error_mask.any(),
+            'molar_masses': molar_masses,
+            'error_mask': error_mask,
+            'error_count': int(error_mask.sum()),
+            'errors': errors,
+        }
@@ -0,0 +1,327 @@
+import ast
+import math
+import operator
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+import numpy as np
+
+# Expression trees are nested tuples, built once per expression string:
+#   ('num', value) | ('name', id) | ('neg', node) | ('pos', node)
+#   ('binop', op, left, right) | ('call', name, (args...))
+Node = Tuple[Any, ...]
+
+_BINARY_OPERATORS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/',
+    ast.FloorDiv: '//', ast.Mod: '%', ast.Pow: '**',
+}
+
+
+class ExpressionError(ValueError):
+    """The expression is not valid calculator input"""
+
+
+class ExpressionTooExpensive(ExpressionError):
+    """Evaluating the expression would exceed one of the evaluator's limits"""
+
+    def __init__(self, message: str, limit: str):
+        super().__init__(message)
+        self.limit = limit
+
+
+@lru_cache(maxsize=2048)
+def parse_expression(expression: str) -> Node:
+    """Parse ``expression`` into a tree, allowing only numbers, names, arithmetic and calls"""
+    if len(expression) > 1000:
+        raise ExpressionTooExpensive("Expression is too long", 'length')
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression '{expression}': {e.msg}")
+    try:
+        return _convert(tree.body)
+    except RecursionError:
+        raise ExpressionTooExpensive("Expression is nested too deeply", 'depth')
+
+
+def _convert(node: ast.AST) -> Node:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return ('num', node.value)
+    if isinstance(node, ast.Name):
+        return ('name', node.id)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return ('neg' if isinstance(node.op, ast.USub) else 'pos', _convert(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        return ('binop', _BINARY_OPERATORS[type(node.op)], _convert(node.left), _convert(node.right))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        return ('call', node.func.id, tuple(_convert(arg) for arg in node.args))
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+class _Budget:
+    __slots__ = ('operations', 'max_operations', 'deadline')
+
+    def __init__(self, max_operations: int, deadline: float):
+        self.operations = 0
+        self.max_operations = max_operations
+        self.deadline = deadline
+
+    def charge(self, cost: int = 1) -> None:
+        self.operations += cost
+        if self.operations > self.max_operations:
+            raise ExpressionTooExpensive(
+                f"Expression needs more than {self.max_operations} operations", 'operations'
+            )
+        if time.perf_counter() > self.deadline:
+            raise ExpressionTooExpensive("Expression took too long to evaluate", 'deadline')
+
+
+class ExpressionEvaluator:
+    """Evaluate calculator expressions without ``eval`` and with bounded cost.
+
+    Expressions are parsed once into a cached tree and compiled into a cached
+    chain of closures. Evaluation counts operations and checks a wall-clock
+    deadline, and refuses integer work whose size can be predicted to blow
+    up (huge powers, factorials, products) before doing it, so a single
+    question like ``9**9**9`` fails fast with ``ExpressionTooExpensive``
+    instead of pinning a worker.
+    """
+
+    def __init__(self, functions: Dict[str, Any], max_operations: int = 10000,
+                 max_exponent: int = 10000, max_factorial: int = 1000,
+                 max_integer_bits: int = 16384, timeout: float = 0.05):
+        self.functions = functions
+        self.max_operations = max_operations
+        self.max_exponent = max_exponent
+        self.max_factorial = max_factorial
+        self.max_integer_bits = max_integer_bits
+        self.timeout = timeout
+        self._compile = lru_cache(maxsize=2048)(self._compile_uncached)
+
+    def evaluate(self, expression: str) -> Any:
+        program = self._compile(expression)
+        budget = _Budget(self.max_operations, time.perf_counter() + self.timeout)
+        try:
+            return program(budget)
+        except ExpressionError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(f"Could not evaluate expression '{expression}': {e}")
+
+    def _compile_uncached(self, expression: str) -> Callable[[_Budget], Any]:
+        return self._build(parse_expression(expression))
+
+    # ----- compilation: tree -> closures
+
+    def _build(self, node: Node) -> Callable[[_Budget], Any]:
+        kind = node[0]
+        if kind == 'num':
+            value = node[1]
+            if isinstance(value, int) and value.bit_length() > self.max_integer_bits:
+                raise ExpressionTooExpensive("Number literal is too large", 'integer_bits')
+            return lambda budget: value
+        if kind == 'name':
+            if node[1] not in self.functions or callable(self.functions[node[1]]):
+                raise ExpressionError(f"Unknown name '{node[1]}'")
+            value = self.functions[node[1]]
+            return lambda budget: value
+        if kind in ('neg', 'pos'):
+            operand = self._build(node[1])
+            if kind == 'pos':
+                return operand
+
+            def negate(budget: _Budget) -> Any:
+                budget.charge()
+                return -operand(budget)
+            return negate
+        if kind == 'binop':
+            return self._build_binop(node[1], self._build(node[2]), self._build(node[3]))
+        if kind == 'call':
+            return self._build_call(node[1], [self._build(arg) for arg in node[2]])
+        raise ExpressionError(f"Unsupported node '{kind}'")
+
+    def _build_binop(self, op: str, left: Callable, right: Callable) -> Callable[[_Budget], Any]:
+        if op == '**':
+            def power(budget: _Budget) -> Any:
+                base, exponent = left(budget), right(budget)
+                self._check_power(base, exponent)
+                budget.charge()
+                return base ** exponent
+            return power
+
+        if op == '*':
+            def multiply(budget: _Budget) -> Any:
+                a, b = left(budget), right(budget)
+                if isinstance(a, int) and isinstance(b, int):
+                    self._check_bits(a.bit_length() + b.bit_length())
+                budget.charge()
+                return a * b
+            return multiply
+
+        function = {
+            '+': operator.add, '-': operator.sub, '/': operator.truediv,
+            '//': operator.floordiv, '%': operator.mod,
+        }[op]
+
+        def apply(budget: _Budget) -> Any:
+            a, b = left(budget), right(budget)
+            budget.charge()
+            return function(a, b)
+        return apply
+
+    def _build_call(self, name: str, args: list) -> Callable[[_Budget], Any]:
+        function = self.functions.get(name)
+        if function is None or not callable(function):
+            raise ExpressionError(f"Unknown function '{name}'")
+
+        if function is math.factorial:
+            def factorial(budget: _Budget) -> Any:
+                values = [arg(budget) for arg in args]
+                if len(values) == 1:
+                    self._check_factorial(values[0])
+                budget.charge()
+                return function(*values)
+            return factorial
+
+        def call(budget: _Budget) -> Any:
+            values = [arg(budget) for arg in args]
+            budget.charge()
+            return function(*values)
+        return call
+
+    # ----- cost checks made before doing the work
+
+    def _check_bits(self, bits: int) -> None:
+        if bits > self.max_integer_bits:
+            raise ExpressionTooExpensive(
+                f"Result would exceed {self.max_integer_bits} bits", 'integer_bits'
+            )
+
+    def _check_power(self, base: Any, exponent: Any) -> None:
+        if isinstance(base, int) and isinstance(exponent, int):
+            if abs(exponent) > self.max_exponent and abs(base) > 1:
+                raise ExpressionTooExpensive(
+                    f"Exponent {exponent} exceeds the limit of {self.max_exponent}", 'exponent'
+                )
+            if exponent > 0 and abs(base) > 1:
+                self._check_bits(int(math.log2(abs(base)) * exponent) + 1)
+
+    def _check_factorial(self, value: Any) -> None:
+        if isinstance(value, (int, float)) and value > self.max_factorial:
+            raise ExpressionTooExpensive(
+                f"factorial({value:g}) exceeds the limit of factorial({self.max_factorial})", 'factorial'
+            )
+        if isinstance(value, (int, float)) and value > 1:
+            self._check_bits(int(math.lgamma(value + 1) / math.log(2)) + 1)
+
+
+def _array_factorial(values: np.ndarray) -> np.ndarray:
+    """Factorial of whole numbers 0..170 by table lookup, NaN elsewhere"""
+    valid = (values >= 0) & (values <= 170) & (np.floor(values) == values)
+    result = np.full(values.shape, np.nan)
+    result[valid] = _FACTORIALS[values[valid].astype(np.int64)]
+    return result
+
+
+def _array_gcd(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a, b = np.broadcast_arrays(a, b)
+    valid = (np.floor(a) == a) & (np.floor(b) == b) & (np.abs(a) < 2 ** 53) & (np.abs(b) < 2 ** 53)
+    result = np.full(a.shape, np.nan)
+    result[valid] = np.gcd(a[valid].astype(np.int64), b[valid].astype(np.int64))
+    return result
+
+
+def _array_log(x: np.ndarray, base: Any = None) -> np.ndarray:
+    return np.log(x) if base is None else np.log(x) / np.log(base)
+
+
+def _array_round(x: np.ndarray, digits: Any = 0) -> np.ndarray:
+    return np.round(x, int(digits))
+
+
+# 170! is the largest factorial a float64 can hold
+_FACTORIALS = np.array([float(math.factorial(n)) for n in range(171)])
+
+# NumPy equivalents of the calculator's scalar whitelist
+ARRAY_FUNCTIONS: Dict[str, Any] = {
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'asin': np.arcsin, 'acos': np.arccos, 'atan': np.arctan,
+    'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh,
+    'sqrt': np.sqrt, 'log': _array_log, 'log10': np.log10, 'log2': np.log2,
+    'exp': np.exp, 'abs': np.abs, 'round': _array_round,
+    'floor': np.floor, 'ceil': np.ceil,
+    'factorial': _array_factorial, 'gcd': _array_gcd,
+    'pi': np.pi, 'e': np.e,
+    'pow': np.power, 'degrees': np.degrees, 'radians': np.radians,
+}
+
+_ARRAY_OPERATORS = {
+    '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.true_divide,
+    '//': np.floor_divide, '%': np.mod, '**': np.power,
+}
+
+
+class ArrayEvaluator:
+    """Evaluate one expression over arrays of variable bindings with NumPy.
+
+    Shares ``parse_expression`` with ``ExpressionEvaluator``, so an expression
+    is parsed once; the compiled program is cached per expression and set of
+    variable names. Every operation works on whole float64 arrays, which keeps
+    the cost linear in the number of bindings and free of big-integer blowups.
+    Elements whose result is not finite (domain errors, division by zero,
+    overflow) come back as NaN with ``True`` in the error mask instead of
+    raising.
+    """
+
+    def __init__(self, functions: Dict[str, Any] = None):
+        self.functions = ARRAY_FUNCTIONS if functions is None else functions
+        self._compile = lru_cache(maxsize=512)(self._compile_uncached)
+
+    def evaluate(self, expression: str, variables: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(values, error_mask)`` broadcast over the shapes of ``variables``"""
+        arrays = {name: np.asarray(value, dtype=np.float64) for name, value in variables.items()}
+        program = self._compile(expression, tuple(sorted(arrays)))
+        shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+        try:
+            with np.errstate(all='ignore'):
+                values = np.array(np.broadcast_to(program(arrays), shape), dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise ExpressionError(f"Could not evaluate expression '{expression}': {e}")
+        error_mask = ~np.isfinite(values)
+        values[error_mask] = np.nan
+        return values, error_mask
+
+    def _compile_uncached(self, expression: str, names: Iterable[str]) -> Callable[[Dict[str, np.ndarray]], Any]:
+        return self._build(parse_expression(expression), frozenset(names))
+
+    def _build(self, node: Node, names: frozenset) -> Callable[[Dict[str, np.ndarray]], Any]:
+        kind = node[0]
+        if kind == 'num':
+            value = float(node[1])
+            return lambda env: value
+        if kind == 'name':
+            name = node[1]
+            # bound variables shadow the constants (e.g. a variable called e)
+            if name in names:
+                return lambda env: env[name]
+            if name not in self.functions or callable(self.functions[name]):
+                raise ExpressionError(f"Unknown name '{name}'")
+            value = self.functions[name]
+            return lambda env: value
+        if kind == 'pos':
+            return self._build(node[1], names)
+        if kind == 'neg':
+            operand = self._build(node[1], names)
+            return lambda env: np.negative(operand(env))
+        if kind == 'binop':
+            function = _ARRAY_OPERATORS[node[1]]
+            left, right = self._build(node[2], names), self._build(node[3], names)
+            return lambda env: function(np.asarray(left(env), dtype=np.float64), right(env))
+        if kind == 'call':
+            function = self.functions.get(node[1])
+            if function is None or not callable(function):
+                raise ExpressionError(f"Unknown function '{node[1]}'")
+            args = [self._build(arg, names) for arg in node[2]]
+            return lambda env: function(*[np.asarray(arg(env), dtype=np.float64) for arg in args])
+        raise ExpressionError(f"Unsupported node '{kind}'")
@@ -0,0 +1,193 @@
+from typing import Any, Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from .expression_evaluator import ArrayEvaluator, ExpressionError, Node, parse_expression
+from .units import DIMENSIONLESS, Unit, registry
+
+# f(x) = y  ->  x = inverse(y); principal branches only
+_INVERSES = {
+    'sin': 'asin', 'cos': 'acos', 'tan': 'atan',
+    'asin': 'sin', 'acos': 'cos', 'atan': 'tan',
+    'exp': 'log', 'log': 'exp',
+}
+
+# precedence for printing: higher binds tighter
+_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '//': 2, '%': 2, 'neg': 3, 'pos': 3, '**': 4}
+
+_evaluator = ArrayEvaluator()
+
+
+class UnsolvableError(ExpressionError):
+    """The formula cannot be rearranged for the requested variable"""
+
+
+def variables_in(node: Node) -> Set[str]:
+    kind = node[0]
+    if kind == 'name':
+        return {node[1]}
+    if kind in ('neg', 'pos'):
+        return variables_in(node[1])
+    if kind == 'binop':
+        return variables_in(node[2]) | variables_in(node[3])
+    if kind == 'call':
+        return set().union(*(variables_in(arg) for arg in node[2])) if node[2] else set()
+    return set()
+
+
+def _occurrences(node: Node, name: str) -> int:
+    kind = node[0]
+    if kind == 'name':
+        return int(node[1] == name)
+    if kind in ('neg', 'pos'):
+        return _occurrences(node[1], name)
+    if kind == 'binop':
+        return _occurrences(node[2], name) + _occurrences(node[3], name)
+    if kind == 'call':
+        return sum(_occurrences(arg, name) for arg in node[2])
+    return 0
+
+
+def to_source(node: Node, parent: int = 0, right: bool = False) -> str:
+    """Print a tree back as an expression, with only the parentheses it needs"""
+    kind = node[0]
+    if kind == 'num':
+        return repr(node[1])
+    if kind == 'name':
+        return node[1]
+    if kind == 'call':
+        return f"{node[1]}({', '.join(to_source(arg) for arg in node[2])})"
+    if kind in ('neg', 'pos'):
+        precedence = _PRECEDENCE[kind]
+        text = ('-' if kind == 'neg' else '+') + to_source(node[1], precedence)
+    else:
+        op = node[1]
+        precedence = _PRECEDENCE[op]
+        if op == '**':
+            # right-associative: the base needs parentheses at equal precedence
+            text = f"{to_source(node[2], precedence + 1)}**{to_source(node[3], precedence)}"
+        else:
+            text = f"{to_source(node[2], precedence)} {op} {to_source(node[3], precedence, right=True)}"
+    needs_parentheses = precedence < parent or (precedence == parent and right and kind == 'binop')
+    return f"({text})" if needs_parentheses else text
+
+
+def isolate(lhs: Node, rhs: Node, target: str) -> Node:
+    """Rearrange ``lhs = rhs`` into an expression for ``target``.
+
+    Works when the target occurs exactly once: the side holding it is peeled
+    one operation at a time, applying the inverse operation to the other
+    side. Raises ``UnsolvableError`` otherwise.
+    """
+    if _occurrences(lhs, target) + _occurrences(rhs, target) != 1:
+        raise UnsolvableError(f"'{target}' must appear exactly once to be isolated")
+    side, other = (lhs, rhs) if _occurrences(lhs, target) else (rhs, lhs)
+
+    while side != ('name', target):
+        kind = side[0]
+        if kind == 'pos':
+            side = side[1]
+        elif kind == 'neg':
+            side, other = side[1], ('neg', other)
+        elif kind == 'binop':
+            op, left, right = side[1], side[2], side[3]
+            in_left = _occurrences(left, target) == 1
+            if op == '+':
+                side, other = (left, ('binop', '-', other, right)) if in_left else (right, ('binop', '-', other, left))
+            elif op == '-':
+                side, other = (left, ('binop', '+', other, right)) if in_left else (right, ('binop', '-', left, other))
+            elif op == '*':
+                side, other = (left, ('binop', '/', other, right)) if in_left else (right, ('binop', '/', other, left))
+            elif op == '/':
+                side, other = (left, ('binop', '*', other, right)) if in_left else (right, ('binop', '/', left, other))
+            elif op == '**' and in_left:
+                # x**2 = y -> x = sqrt(y), the positive root
+                root = ('call', 'sqrt', (other,)) if right == ('num', 2) else ('binop', '**', other, ('binop', '/', ('num', 1), right))
+                side, other = left, root
+            elif op == '**':
+                side, other = right, ('binop', '/', ('call', 'log', (other,)), ('call', 'log', (left,)))
+            else:
+                raise UnsolvableError(f"Cannot invert '{op}'")
+        elif kind == 'call' and len(side[2]) == 1 and side[1] in _INVERSES:
+            side, other = side[2][0], ('call', _INVERSES[side[1]], (other,))
+        elif kind == 'call' and len(side[2]) == 1 and side[1] == 'sqrt':
+            side, other = side[2][0], ('binop', '**', other, ('num', 2))
+        else:
+            raise UnsolvableError(f"Cannot invert '{side[1] if kind == 'call' else kind}'")
+    return other
+
+
+class CompiledFormula:
+    """A formula parsed once and rearranged for every variable it can be solved for.
+
+    ``expression`` is a Python-syntax equation (``'KE = 0.5 * m * v**2'``),
+    ``units`` the unit each variable is evaluated in, and ``defaults``
+    values used for variables the caller does not give (g, G, ...).
+    """
+
+    def __init__(self, expression: str, units: Dict[str, str], defaults: Optional[Dict[str, float]] = None):
+        left, _, right = expression.partition('=')
+        lhs, rhs = parse_expression(left), parse_expression(right)
+        self.expression = expression
+        names = variables_in(lhs) | variables_in(rhs)
+        # in the order the data lists them, which is the order quantities are matched in
+        self.variables = [name for name in units if name in names] + sorted(names - set(units))
+        self.units = {name: units.get(name, '') for name in self.variables}
+        self.defaults = dict(defaults or {})
+        self._units: Dict[str, Unit] = {
+            name: registry.parse(unit) if unit else Unit(1, DIMENSIONLESS) for name, unit in self.units.items()
+        }
+        # rearranged once per target at load time; the evaluator caches the compiled program
+        self.solutions: Dict[str, str] = {}
+        for target in self.variables:
+            try:
+                self.solutions[target] = to_source(isolate(lhs, rhs, target))
+            except UnsolvableError:
+                pass
+
+    def dimension(self, name: str) -> Tuple[int, ...]:
+        return self._units[name].dimension
+
+    def solve(self, target: str, values: Dict[str, Any], target_unit: Optional[str] = None) -> Dict[str, Any]:
+        """Solve for ``target``; each value is a number/array in the variable's unit or a ``(value, unit)`` pair"""
+        if target not in self.solutions:
+            return {'success': False, 'error': f"Cannot solve {self.expression} for '{target}'"}
+
+        bindings: Dict[str, Any] = {}
+        for name in self.variables:
+            if name == target:
+                continue
+            given = values.get(name, self.defaults.get(name))
+            if given is None:
+                return {'success': False, 'error': f"Missing value for '{name}'"}
+            if isinstance(given, tuple):
+                value, unit = given
+                source, expected = registry.parse(unit) if unit else Unit(1, DIMENSIONLESS), self._units[name]
+                if source is None or source.dimension != expected.dimension:
+                    return {'success': False, 'error': f"Unit '{unit}' is not compatible with {name} ({self.units[name]})"}
+                scale = float(source.factor / expected.factor)
+                offset = float((source.offset - expected.offset) / expected.factor)
+                given = np.asarray(value, dtype=np.float64) * scale + offset
+            bindings[name] = given
+
+        result, error_mask = _evaluator.evaluate(self.solutions[target], bindings)
+        unit = self.units[target]
+        if target_unit and target_unit != unit:
+            factors = registry.conversion(unit, target_unit)
+            if factors is None:
+                return {'success': False, 'error': f"Unit '{target_unit}' is not compatible with {target} ({unit})"}
+            result = result * factors[0] + factors[1]
+            unit = target_unit
+
+        if result.ndim == 0:
+            if error_mask:
+                return {'success': False, 'error': f"No real solution for '{target}'"}
+            result = float(result)
+        return {
+            'success': True,
+            'target': target,
+            'result': result,
+            'unit': unit,
+            'error_mask': error_mask,
+            'solved_expression': f"{target} = {self.solutions[target]}",
+        }
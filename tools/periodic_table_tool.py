@@ -1,182 +1,210 @@
-from typing import Optional, Dict, Any
+import csv
+import os
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple, Union
 
-class PeriodicTableTool:
-    def __init__(self):
-        self.elements = {
-            'hydrogen': {
-                'atomic_number': 1, 'atomic_mass': 1.008, 'symbol': 'H',
-                'group': 1, 'period': 1, 'electron_configuration': '1s¹',
-                'description': 'A colorless, odorless gas, highly reactive.',
-                'category': 'nonmetal', 'state': 'gas'
-            },
-            'helium': {
-                'atomic_number': 2, 'atomic_mass': 4.0026, 'symbol': 'He',
-                'group': 18, 'period': 1, 'electron_configuration': '1s²',
-                'description': 'A noble gas, inert and used in balloons.',
-                'category': 'noble_gas', 'state': 'gas'
-            },
-            'lithium': {
-                'atomic_number': 3, 'atomic_mass': 6.941, 'symbol': 'Li',
-                'group': 1, 'period': 2, 'electron_configuration': '[He] 2s¹',
-                'description': 'A soft, silvery alkali metal.',
-                'category': 'alkali_metal', 'state': 'solid'
-            },
-            'beryllium': {
-                'atomic_number': 4, 'atomic_mass': 9.0122, 'symbol': 'Be',
-                'group': 2, 'period': 2, 'electron_configuration': '[He] 2s²',
-                'description': 'A hard, grayish alkaline earth metal.',
-                'category': 'alkaline_earth_metal', 'state': 'solid'
-            },
-            'boron': {
-                'atomic_number': 5, 'atomic_mass': 10.811, 'symbol': 'B',
-                'group': 13, 'period': 2, 'electron_configuration': '[He] 2s² 2p¹',
-                'description': 'A metalloid used in semiconductors.',
-                'category': 'metalloid', 'state': 'solid'
-            },
-            'carbon': {
-                'atomic_number': 6, 'atomic_mass': 12.011, 'symbol': 'C',
-                'group': 14, 'period': 2, 'electron_configuration': '[He] 2s² 2p²',
-                'description': 'Basis of organic chemistry, exists as graphite and diamond.',
-                'category': 'nonmetal', 'state': 'solid'
-            },
-            'nitrogen': {
-                'atomic_number': 7, 'atomic_mass': 14.007, 'symbol': 'N',
-                'group': 15, 'period': 2, 'electron_configuration': '[He] 2s² 2p³',
-                'description': 'A colorless gas, makes up 78% of Earth\'s atmosphere.',
-                'category': 'nonmetal', 'state': 'gas'
-            },
-            'oxygen': {
-                'atomic_number': 8, 'atomic_mass': 15.999, 'symbol': 'O',
-                'group': 16, 'period': 2, 'electron_configuration': '[He] 2s² 2p⁴',
-                'description': 'Essential for life, supports combustion.',
-                'category': 'nonmetal', 'state': 'gas'
-            },
-            'fluorine': {
-                'atomic_number': 9, 'atomic_mass': 18.998, 'symbol': 'F',
-                'group': 17, 'period': 2, 'electron_configuration': '[He] 2s² 2p⁵',
-                'description': 'Most electronegative element, highly reactive.',
-                'category': 'halogen', 'state': 'gas'
-            },
-            'neon': {
-                'atomic_number': 10, 'atomic_mass': 20.180, 'symbol': 'Ne',
-                'group': 18, 'period': 2, 'electron_configuration': '[He] 2s² 2p⁶',
-                'description': 'Noble gas used in neon signs.',
-                'category': 'noble_gas', 'state': 'gas'
-            },
-            'sodium': {
-                'atomic_number': 11, 'atomic_mass': 22.990, 'symbol': 'Na',
-                'group': 1, 'period': 3, 'electron_configuration': '[Ne] 3s¹',
-                'description': 'Soft alkali metal, reacts violently with water.',
-                'category': 'alkali_metal', 'state': 'solid'
-            },
-            'magnesium': {
-                'atomic_number': 12, 'atomic_mass': 24.305, 'symbol': 'Mg',
-                'group': 2, 'period': 3, 'electron_configuration': '[Ne] 3s²',
-                'description': 'Light metal used in alloys and fireworks.',
-                'category': 'alkaline_earth_metal', 'state': 'solid'
-            },
-            'aluminum': {
-                'atomic_number': 13, 'atomic_mass': 26.982, 'symbol': 'Al',
-                'group': 13, 'period': 3, 'electron_configuration': '[Ne] 3s² 3p¹',
-                'description': 'Light, corrosion-resistant metal.',
-                'category': 'post_transition_metal', 'state': 'solid'
-            },
-            'silicon': {
-                'atomic_number': 14, 'atomic_mass': 28.085, 'symbol': 'Si',
-                'group': 14, 'period': 3, 'electron_configuration': '[Ne] 3s² 3p²',
-                'description': 'Metalloid, basis of computer chips.',
-                'category': 'metalloid', 'state': 'solid'
-            },
-            'phosphorus': {
-                'atomic_number': 15, 'atomic_mass': 30.974, 'symbol': 'P',
-                'group': 15, 'period': 3, 'electron_configuration': '[Ne] 3s² 3p³',
-                'description': 'Essential for life, used in fertilizers.',
-                'category': 'nonmetal', 'state': 'solid'
-            },
-            'sulfur': {
-                'atomic_number': 16, 'atomic_mass': 32.066, 'symbol': 'S',
-                'group': 16, 'period': 3, 'electron_configuration': '[Ne] 3s² 3p⁴',
-                'description': 'Yellow nonmetal, used in vulcanization.',
-                'category': 'nonmetal', 'state': 'solid'
-            },
-            'chlorine': {
-                'atomic_number': 17, 'atomic_mass': 35.452, 'symbol': 'Cl',
-                'group': 17, 'period': 3, 'electron_configuration': '[Ne] 3s² 3p⁵',
-                'description': 'Greenish gas, used in water purification.',
-                'category': 'halogen', 'state': 'gas'
-            },
-            'argon': {
-                'atomic_number': 18, 'atomic_mass': 39.948, 'symbol': 'Ar',
-                'group': 18, 'period': 3, 'electron_configuration': '[Ne] 3s² 3p⁶',
-                'description': 'Noble gas, used in welding.',
-                'category': 'noble_gas', 'state': 'gas'
-            },
-            'iron': {
-                'atomic_number': 26, 'atomic_mass': 55.845, 'symbol': 'Fe',
-                'group': 8, 'period': 4, 'electron_configuration': '[Ar] 3d⁶ 4s²',
-                'description': 'Most common metal on Earth, essential for life.',
-                'category': 'transition_metal', 'state': 'solid'
-            },
-            'copper': {
-                'atomic_number': 29, 'atomic_mass': 63.546, 'symbol': 'Cu',
-                'group': 11, 'period': 4, 'electron_configuration': '[Ar] 3d¹⁰ 4s¹',
-                'description': 'Excellent conductor of electricity.',
-                'category': 'transition_metal', 'state': 'solid'
-            },
-            'zinc': {
-                'atomic_number': 30, 'atomic_mass': 65.380, 'symbol': 'Zn',
-                'group': 12, 'period': 4, 'electron_configuration': '[Ar] 3d¹⁰ 4s²',
-                'description': 'Used in galvanization and alloys.',
-                'category': 'transition_metal', 'state': 'solid'
-            },
-            'silver': {
-                'atomic_number': 47, 'atomic_mass': 107.868, 'symbol': 'Ag',
-                'group': 11, 'period': 5, 'electron_configuration': '[Kr] 4d¹⁰ 5s¹',
-                'description': 'Precious metal with highest electrical conductivity.',
-                'category': 'transition_metal', 'state': 'solid'
-            },
-            'gold': {
-                'atomic_number': 79, 'atomic_mass': 196.967, 'symbol': 'Au',
-                'group': 11, 'period': 6, 'electron_configuration': '[Xe] 4f¹⁴ 5d¹⁰ 6s¹',
-                'description': 'Noble metal, highly valued and corrosion-resistant.',
-                'category': 'transition_metal', 'state': 'solid'
+import numpy as np
+
+from .batch_memo import batch_memoized
+
+DEFAULT_ELEMENTS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'elements.csv')
+
+# Other spellings that should find the same element
+NAME_ALIASES = {'aluminium': 'aluminum', 'sulphur': 'sulfur', 'caesium': 'cesium'}
+
+
+class Element:
+    """One element's record; built once at load and shared by every lookup"""
+
+    __slots__ = ('atomic_number', 'symbol', 'name', 'atomic_mass', 'group', 'period',
+                 'category', 'state', 'electron_configuration', 'description', '_info')
+
+    def __init__(self, atomic_number: int, symbol: str, name: str, atomic_mass: float,
+                 group: Optional[int], period: int, category: str, state: str,
+                 electron_configuration: str, description: str):
+        self.atomic_number = atomic_number
+        self.symbol = symbol
+        self.name = name
+        self.atomic_mass = atomic_mass
+        self.group = group
+        self.period = period
+        self.category = category
+        self.state = state
+        self.electron_configuration = electron_configuration
+        self.description = description
+        self._info: Optional[str] = None
+
+    def __getitem__(self, field: str):
+        # dict-style access, as when elements were plain dicts
+        return getattr(self, field)
+
+    @property
+    def info(self) -> str:
+        """Human-readable summary, formatted on first use and kept on the record"""
+        if self._info is None:
+            self._info = (f"Element: {self.name}\n"
+                          f"Symbol: {self.symbol}\n"
+                          f"Atomic Number: {self.atomic_number}\n"
+                          f"Atomic Mass: {self.atomic_mass:g} u\n"
+                          f"Group: {self.group if self.group is not None else 'None (f-block)'}\n"
+                          f"Period: {self.period}\n"
+                          f"Category: {self.category.replace('_', ' ').title()}\n"
+                          f"State: {self.state.capitalize()}\n"
+                          f"Electron Configuration: {self.electron_configuration}\n"
+                          f"Description: {self.description}")
+        return self._info
+
+    def __repr__(self) -> str:
+        return f"Element({self.atomic_number}, {self.symbol!r}, {self.name!r})"
+
+
+class ElementTable:
+    """The periodic table as columns plus prebuilt indexes.
+
+    Records sit in a list ordered by atomic number, next to NumPy columns
+    for the numeric fields. Name (with aliases), symbol and atomic number
+    lookups are dict hits. Group, period, category and state each have a
+    boolean bitmap per value, so combined filters are an AND of bitmaps,
+    and the atomic mass column is kept sorted for ``searchsorted`` range
+    queries. Results are tuples of the shared records: no dicts or
+    strings are built per call.
+    """
+
+    FILTERS = ('group', 'period', 'category', 'state')
+
+    def __init__(self, records: List[Element]):
+        self.records = sorted(records, key=lambda element: element.atomic_number)
+        self.atomic_number = np.array([e.atomic_number for e in self.records], dtype=np.int16)
+        self.atomic_mass = np.array([e.atomic_mass for e in self.records], dtype=np.float64)
+        self._mass_order = np.argsort(self.atomic_mass, kind='stable')
+        self._sorted_mass = self.atomic_mass[self._mass_order]
+
+        self.by_number: Dict[int, Element] = {e.atomic_number: e for e in self.records}
+        # symbols keep their case: "In" and "As" are elements, "in" and "as" are words
+        self.by_symbol: Dict[str, Element] = {e.symbol: e for e in self.records}
+        self.by_name: Dict[str, Element] = {e.name.lower(): e for e in self.records}
+        for alias, name in NAME_ALIASES.items():
+            self.by_name[alias] = self.by_name[name]
+
+        self._bitmaps: Dict[str, Dict[object, np.ndarray]] = {}
+        self._members: Dict[str, Dict[object, Tuple[Element, ...]]] = {}
+        for field in self.FILTERS:
+            values = [getattr(e, field) for e in self.records]
+            self._bitmaps[field] = {value: np.array([v == value for v in values]) for value in set(values)}
+            self._members[field] = {
+                value: tuple(e for e in self.records if getattr(e, field) == value) for value in set(values)
             }
-        }
-    
+
+    @property
+    def names(self) -> List[str]:
+        """Every lowercase element name and alias, longest first (for regex alternations)"""
+        return sorted(self.by_name, key=len, reverse=True)
+
+    def get(self, key: Union[str, int]) -> Optional[Element]:
+        """Look up by name (any case), symbol (exact case) or atomic number"""
+        if isinstance(key, int):
+            return self.by_number.get(key)
+        key = key.strip()
+        if key.isdigit():
+            return self.by_number.get(int(key))
+        return self.by_name.get(key.lower()) or self.by_symbol.get(key)
+
+    def members(self, field: str, value) -> Tuple[Element, ...]:
+        return self._members[field].get(value, ())
+
+    def mass_between(self, low: float, high: float) -> Tuple[Element, ...]:
+        """Elements with low <= atomic mass <= high, lightest first"""
+        start = np.searchsorted(self._sorted_mass, low, side='left')
+        stop = np.searchsorted(self._sorted_mass, high, side='right')
+        return tuple(self.records[i] for i in self._mass_order[start:stop])
+
+    def select(self, mass_range: Optional[Tuple[float, float]] = None,
+               number_range: Optional[Tuple[int, int]] = None, **criteria) -> Tuple[Element, ...]:
+        """Elements matching every given filter (group, period, category, state) and range"""
+        unknown = set(criteria) - set(self.FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown element filter(s): {', '.join(sorted(unknown))}")
+        criteria = {field: value for field, value in criteria.items() if value is not None}
+        if len(criteria) == 1 and mass_range is None and number_range is None:
+            (field, value), = criteria.items()
+            return self.members(field, value)
+
+        mask = np.ones(len(self.records), dtype=bool)
+        for field, value in criteria.items():
+            bitmap = self._bitmaps[field].get(value)
+            if bitmap is None:
+                return ()
+            mask &= bitmap
+        if mass_range is not None:
+            mask &= (self.atomic_mass >= mass_range[0]) & (self.atomic_mass <= mass_range[1])
+        if number_range is not None:
+            mask &= (self.atomic_number >= number_range[0]) & (self.atomic_number <= number_range[1])
+        return tuple(self.records[i] for i in np.flatnonzero(mask))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+@lru_cache(maxsize=4)
+def load_elements(path: str = DEFAULT_ELEMENTS_PATH) -> ElementTable:
+    """Read the bundled element data file once per path"""
+    records = []
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            records.append(Element(
+                atomic_number=int(row['atomic_number']),
+                symbol=row['symbol'],
+                name=row['name'],
+                atomic_mass=float(row['atomic_mass']),
+                group=int(row['group']) if row['group'] else None,
+                period=int(row['period']),
+                category=row['category'],
+                state=row['state'],
+                electron_configuration=row['electron_configuration'],
+                description=row['description'],
+            ))
+    return ElementTable(records)
+
+
+class PeriodicTableTool:
+    def __init__(self, path: Optional[str] = None):
+        self.table = load_elements(path or os.getenv('ELEMENTS_PATH', DEFAULT_ELEMENTS_PATH))
+        # canonical lowercase name -> record
+        self.elements: Dict[str, Element] = {e.name.lower(): e for e in self.table.records}
+
+    def get_element(self, key: Union[str, int]) -> Optional[Element]:
+        """Look up an element by name, symbol (case-sensitive) or atomic number"""
+        return self.table.get(key)
+
+    @batch_memoized
     def get_element_info(self, element_name: str) -> Optional[str]:
-        element = self.elements.get(element_name.lower())
-        if element:
-            return (f"Element: {element_name.capitalize()}\n"
-                    f"Symbol: {element['symbol']}\n"
-                    f"Atomic Number: {element['atomic_number']}\n"
-                    f"Atomic Mass: {element['atomic_mass']} u\n"
-                    f"Group: {element['group']}\n"
-                    f"Period: {element['period']}\n"
-                    f"Category: {element['category'].replace('_', ' ').title()}\n"
-                    f"State: {element['state'].capitalize()}\n"
-                    f"Electron Configuration: {element['electron_configuration']}\n"
-                    f"Description: {element['description']}")
-        return None
-
-    def get_element_by_symbol(self, symbol: str) -> Optional[Dict[str, Any]]:
-        for name, data in self.elements.items():
-            if data['symbol'].lower() == symbol.lower():
-                return data
-        return None
-    
-    def get_elements_by_group(self, group: int) -> Dict[str, Dict[str, Any]]:
+        element = self.table.by_name.get(element_name.strip().lower())
+        return element.info if element else None
+
+    @batch_memoized
+    def get_element_by_symbol(self, symbol: str) -> Optional[Element]:
+        return self.table.by_symbol.get(symbol.strip())
+
+    def get_elements_by_group(self, group: int) -> Tuple[Element, ...]:
         """Get all elements in a specific group"""
-        group_elements = {}
-        for name, data in self.elements.items():
-            if data['group'] == group:
-                group_elements[name] = data
-        return group_elements
-    
-    def get_elements_by_category(self, category: str) -> Dict[str, Dict[str, Any]]:
+        return self.table.members('group', group)
+
+    def get_elements_by_period(self, period: int) -> Tuple[Element, ...]:
+        """Get all elements in a specific period"""
+        return self.table.members('period', period)
+
+    def get_elements_by_category(self, category: str) -> Tuple[Element, ...]:
         """Get all elements in a specific category"""
-        category_elements = {}
-        category = category.lower().replace(' ', '_')
-        for name, data in self.elements.items():
-            if data['category'] == category:
-                category_elements[name] = data
-        return category_elements
\ No newline at end of file
+        return self.table.members('category', category.lower().replace(' ', '_'))
+
+    def get_elements_by_state(self, state: str) -> Tuple[Element, ...]:
+        """Get all elements in a given state at room temperature"""
+        return self.table.members('state', state.lower())
+
+    def get_elements_by_mass(self, low: float, high: float) -> Tuple[Element, ...]:
+        """Get elements whose atomic mass is between ``low`` and ``high`` u"""
+        return self.table.mass_between(low, high)
+
+    def find_elements(self, **criteria) -> Tuple[Element, ...]:
+        """Combine filters, e.g. ``find_elements(period=4, category='transition_metal', mass_range=(50, 60))``"""
+        return self.table.select(**criteria)
@@ -1,4 +1,5 @@
 from typing import Dict, Any, Optional
+from .batch_memo import batch_memoized
 
 class PhysicsConstantsTool:
     
@@ -119,6 +120,7 @@ class PhysicsConstantsTool:
             }
         }
     
+    @batch_memoized
     def get_constant(self, constant_name: str) -> Optional[Dict[str, Any]]:
         return self.constants.get(constant_name.lower())
     
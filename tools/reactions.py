@@ -0,0 +1,149 @@
+import re
+from functools import lru_cache, reduce
+from math import gcd
+from typing import Dict, List, NamedTuple, Tuple
+
+from .chemical_formula import FormulaError, parse_formula
+
+# 2H2 + O2 -> 2H2O, H2 + O2 = H2O, N2 + 3H2 ⇌ 2NH3, ...
+_ARROW = re.compile(r"\s*(?:<=>|<->|⇌|⇄|->|-->|=>|→|⟶|=)\s*")
+# ' + ' between species; a bare '+' only between a symbol/digit/bracket and a
+# new formula, so the charge in 'Na+ + Cl-' is left alone
+_PLUS = re.compile(r"\s+\+\s+|(?<=[A-Za-z0-9)\]])\+(?=[A-Z(\[])")
+_COEFFICIENT = re.compile(r"^(\d+)\s*(?=[A-Z(\[]|e\b)")
+_ELECTRON = {'e', 'e-', 'e⁻', 'e^-'}
+
+
+class ReactionError(ValueError):
+    """The reaction cannot be parsed or balanced"""
+
+
+class BalancedReaction(NamedTuple):
+    reactants: Tuple[str, ...]
+    products: Tuple[str, ...]
+    coefficients: Tuple[int, ...]
+
+    @property
+    def species(self) -> Tuple[str, ...]:
+        return self.reactants + self.products
+
+    def coefficient(self, species: str) -> int:
+        return self.coefficients[self.species.index(species)]
+
+    @property
+    def equation(self) -> str:
+        def side(names, coefficients):
+            return " + ".join(f"{c if c != 1 else ''}{name}" for name, c in zip(names, coefficients))
+        split = len(self.reactants)
+        return f"{side(self.reactants, self.coefficients[:split])} → {side(self.products, self.coefficients[split:])}"
+
+
+@lru_cache(maxsize=1024)
+def normalize_reaction(reaction: str) -> str:
+    """Canonical spelling of a reaction: one arrow style, ' + ' separators, given coefficients dropped"""
+    sides = _ARROW.split(reaction.strip())
+    if len(sides) != 2 or not all(side.strip() for side in sides):
+        raise ReactionError(f"Expected one arrow between reactants and products in '{reaction}'")
+    return " -> ".join(" + ".join(_split_side(side, reaction)) for side in sides)
+
+
+def _split_side(side: str, reaction: str) -> List[str]:
+    species = []
+    for item in _PLUS.split(side.strip()):
+        item = _COEFFICIENT.sub('', item.strip())
+        if not item:
+            raise ReactionError(f"Empty species in '{reaction}'")
+        species.append(item)
+    return species
+
+
+def _species_counts(species: str) -> Tuple[Dict[str, int], int]:
+    if species in _ELECTRON:
+        return {}, -1
+    try:
+        parsed = parse_formula(species)
+    except FormulaError as e:
+        raise ReactionError(str(e)) from None
+    return parsed.composition, parsed.charge
+
+
+def nullspace(matrix: List[List[int]]) -> List[List[int]]:
+    """Integer basis of the right nullspace, by exact fraction-free Gauss-Jordan elimination.
+
+    Rows stay integer (each elimination step cross-multiplies and then
+    divides the row by its gcd), which is exact like rational arithmetic
+    but avoids building a ``Fraction`` per entry.
+    """
+    rows = [list(row) for row in matrix if any(row)]
+    columns = len(matrix[0]) if matrix else 0
+    pivots: List[int] = []
+    rank = 0
+    for column in range(columns):
+        pivot = next((r for r in range(rank, len(rows)) if rows[r][column] != 0), None)
+        if pivot is None:
+            continue
+        rows[rank], rows[pivot] = rows[pivot], rows[rank]
+        pivot_row = rows[rank]
+        lead = pivot_row[column]
+        for r in range(len(rows)):
+            factor = rows[r][column]
+            if r != rank and factor != 0:
+                row = [lead * a - factor * b for a, b in zip(rows[r], pivot_row)]
+                common = reduce(gcd, row)
+                rows[r] = [value // common for value in row] if common > 1 else row
+        pivots.append(column)
+        rank += 1
+        if rank == len(rows):
+            break
+
+    # row i now reads lead_i * x[pivot_i] + sum(row_i[free] * x[free]) = 0
+    basis = []
+    for free in (column for column in range(columns) if column not in pivots):
+        scale = reduce(lambda a, b: a * b // gcd(a, b), (abs(rows[i][p]) for i, p in enumerate(pivots)), 1)
+        vector = [0] * columns
+        vector[free] = scale
+        for i, p in enumerate(pivots):
+            vector[p] = -rows[i][free] * scale // rows[i][p]
+        basis.append(vector)
+    return basis
+
+
+@lru_cache(maxsize=1024)
+def _balance_normalized(normalized: str) -> BalancedReaction:
+    left, right = normalized.split(" -> ")
+    reactants, products = tuple(left.split(" + ")), tuple(right.split(" + "))
+    species = reactants + products
+
+    counts = [_species_counts(name) for name in species]
+    elements = list(dict.fromkeys(element for composition, _ in counts for element in composition))
+    # one row per element (and for charge): reactant atoms positive, product atoms negative
+    signs = [1] * len(reactants) + [-1] * len(products)
+    matrix = [[sign * composition.get(element, 0) for (composition, _), sign in zip(counts, signs)]
+              for element in elements]
+    if any(charge for _, charge in counts):
+        matrix.append([sign * charge for (_, charge), sign in zip(counts, signs)])
+
+    basis = nullspace(matrix)
+    if not basis:
+        raise ReactionError(f"'{normalized}' cannot be balanced")
+    if len(basis) > 1:
+        raise ReactionError(f"'{normalized}' has no unique balance: it combines {len(basis)} independent reactions")
+    vector = basis[0]
+    if all(value <= 0 for value in vector):
+        vector = [-value for value in vector]
+    if any(value <= 0 for value in vector):
+        raise ReactionError(f"'{normalized}' cannot be balanced with every species taking part")
+    # smallest whole numbers
+    common = reduce(gcd, vector)
+    return BalancedReaction(reactants, products, tuple(value // common for value in vector))
+
+
+def balance(reaction: str) -> BalancedReaction:
+    """Balance a reaction such as ``'Fe + O2 -> Fe2O3'`` (charges and ``e-`` included).
+
+    The coefficients are the integer nullspace vector of the element-count
+    matrix, found with exact integer arithmetic. Results are cached by the
+    normalized reaction string, so spacing, arrow style and any
+    coefficients the caller wrote do not cause a recomputation.
+    """
+    return _balance_normalized(normalize_reaction(reaction))
@@ -0,0 +1,105 @@
+from typing import Any, Dict, Optional, Tuple
+
+from .batch_memo import batch_memoized
+from .chemical_formula_tool import ChemicalFormulaTool
+from .reactions import ReactionError, balance
+from .units import registry
+
+
+class StoichiometryTool:
+    """Balanced equations, limiting reagents and yields for a reaction"""
+
+    def __init__(self, formula_tool: Optional[ChemicalFormulaTool] = None):
+        self.formula_tool = formula_tool or ChemicalFormulaTool()
+
+    @batch_memoized
+    def balance_equation(self, reaction: str) -> Dict[str, Any]:
+        try:
+            balanced = balance(reaction)
+        except ReactionError as e:
+            return {'success': False, 'reaction': reaction, 'error': str(e)}
+        return {
+            'success': True,
+            'equation': balanced.equation,
+            'reactants': balanced.reactants,
+            'products': balanced.products,
+            'coefficients': dict(zip(balanced.species, balanced.coefficients)),
+        }
+
+    def _to_moles(self, species: str, value: float, unit: str) -> Optional[float]:
+        """Moles from an amount given as a mass or an amount of substance"""
+        factors = registry.conversion(unit, 'mol')
+        if factors is not None:
+            return value * factors[0]
+        factors = registry.conversion(unit, 'g')
+        molar_mass = self.formula_tool.molar_mass(species)
+        if factors is None or not molar_mass:
+            return None
+        return value * factors[0] / molar_mass
+
+    def solve(self, reaction: str, amounts: Dict[str, Tuple[float, str]],
+              actual_yield: Optional[Dict[str, Tuple[float, str]]] = None) -> Dict[str, Any]:
+        """Quantities of every species from the given amounts, as ``{species: (value, unit)}``.
+
+        When reactant amounts are given, the limiting reagent is the one
+        allowing the smallest extent of reaction (moles / coefficient); the
+        theoretical yield of each product and the excess of the other given
+        reactants follow from that extent. With only a product given, the
+        extent comes from it and the result is the amount of each reactant
+        needed. ``actual_yield`` amounts of products give percent yields.
+        """
+        balanced = self.balance_equation(reaction)
+        if not balanced['success']:
+            return balanced
+        coefficients = balanced['coefficients']
+
+        moles: Dict[str, float] = {}
+        for species, (value, unit) in amounts.items():
+            if species not in coefficients:
+                return {'success': False, 'error': f"'{species}' is not part of {balanced['equation']}"}
+            amount = self._to_moles(species, value, unit)
+            if amount is None:
+                return {'success': False, 'error': f"Cannot read '{value} {unit}' of {species} as a mass or amount"}
+            moles[species] = amount
+        if not moles:
+            return {'success': False, 'error': "No reactant or product amounts given"}
+
+        given_reactants = [species for species in balanced['reactants'] if species in moles]
+        basis = given_reactants or [species for species in balanced['products'] if species in moles]
+        limiting = min(basis, key=lambda species: moles[species] / coefficients[species])
+        extent = moles[limiting] / coefficients[limiting]
+
+        quantities = {}
+        for species, coefficient in coefficients.items():
+            molar_mass = self.formula_tool.molar_mass(species)
+            reacting = extent * coefficient
+            quantity = {
+                'coefficient': coefficient,
+                'molar_mass': molar_mass,
+                'moles': reacting,
+                'grams': reacting * molar_mass if molar_mass else None,
+            }
+            if species in given_reactants:
+                excess = moles[species] - reacting
+                quantity['excess_moles'] = excess
+                quantity['excess_grams'] = excess * molar_mass if molar_mass else None
+            quantities[species] = quantity
+
+        result = {
+            'success': True,
+            'equation': balanced['equation'],
+            'reactants': balanced['reactants'],
+            'products': balanced['products'],
+            'limiting_reagent': limiting if given_reactants else None,
+            'extent': extent,
+            'quantities': quantities,
+        }
+        if actual_yield:
+            percent_yield = {}
+            for species, (value, unit) in actual_yield.items():
+                actual = self._to_moles(species, value, unit) if species in balanced['products'] else None
+                if actual is None:
+                    return {'success': False, 'error': f"Cannot compare '{value} {unit}' of {species} with the yield"}
+                percent_yield[species] = 100 * actual / quantities[species]['moles']
+            result['percent_yield'] = percent_yield
+        return result
@@ -0,0 +1,93 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_VOWEL = re.compile(r"[aeiouy]")
+STOP_WORDS = frozenset(
+    "a an the is are was were be been of to in on for and or not what whats how do does did i you me my "
+    "can could would should why which who when where with by it its this that these those at as from "
+    "about tell explain please give show find calculate formula equation law".split()
+)
+# longest first; a suffix is only stripped when at least three letters,
+# including a vowel, remain (so 'spring' keeps its 'ing')
+_SUFFIXES = ('ational', 'ations', 'ation', 'ness', 'ment', 'ings', 'ing', 'ies',
+             'ate', 'ive', 'ous', 'ed', 'es', 'ly', 'al', 's')
+
+
+def stem(word: str) -> str:
+    """Light suffix stripping so 'forces', 'forced' and 'force' share a term"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and _VOWEL.search(word[:-len(suffix)]):
+            word = word[:-len(suffix)]
+            if suffix == 'ies':
+                word += 'y'
+            break
+    # forc/force, energ/energy: drop a trailing e or y so both spellings meet
+    return word[:-1] if len(word) > 3 and word[-1] in 'ey' else word
+
+
+def analyze(text: str) -> List[str]:
+    """Lowercase, split, drop stop words and one-letter tokens, and stem"""
+    return [stem(word) for word in _TOKEN.findall(text.lower()) if len(word) > 1 and word not in STOP_WORDS]
+
+
+class InvertedIndex:
+    """BM25-ranked inverted index over documents made of weighted text fields.
+
+    Postings (term -> {doc id: weighted term frequency}) and document
+    lengths are built once; a search only visits the postings of the query's
+    own terms, and returns the ``top_k`` best documents by BM25. A field's
+    weight multiplies its term frequencies, so a match in a name counts
+    more than one in a long description.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._lengths: Dict[str, float] = {}
+        self._idf: Dict[str, float] = {}
+        self._average_length = 0.0
+
+    def add(self, doc_id: str, fields: Iterable[Tuple[str, float]]) -> None:
+        counts: Counter = Counter()
+        for text, weight in fields:
+            for term in analyze(text):
+                counts[term] += weight
+        for term, frequency in counts.items():
+            self._postings[term][doc_id] = frequency
+        self._lengths[doc_id] = sum(counts.values())
+        self._idf.clear()
+
+    def _prepare(self) -> None:
+        total = len(self._lengths)
+        self._average_length = sum(self._lengths.values()) / total if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self._postings.items()
+        }
+
+    def search(self, query: str, top_k: int = 3, min_ratio: float = 0.0) -> List[Tuple[str, float]]:
+        """``(doc id, score)`` of the best ``top_k`` matches, best first.
+
+        Matches scoring below ``min_ratio`` times the best score are dropped,
+        so one strong hit is not padded out with incidental ones.
+        """
+        if not self._idf:
+            self._prepare()
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(analyze(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, frequency in self._postings[term].items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / self._average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(doc_id, score) for doc_id, score in ranked if score >= ranked[0][1] * min_ratio]
+
+    def __len__(self) -> int:
+        return len(self._lengths)
@@ -0,0 +1,262 @@
+import math
+import re
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Exponents of the SI base dimensions, in this order
+BASE_DIMENSIONS = ('m', 'kg', 's', 'A', 'K', 'mol', 'cd')
+Dimension = Tuple[int, int, int, int, int, int, int]
+
+
+def _dim(m: int = 0, kg: int = 0, s: int = 0, A: int = 0, K: int = 0, mol: int = 0, cd: int = 0) -> Dimension:
+    return (m, kg, s, A, K, mol, cd)
+
+
+DIMENSIONLESS = _dim()
+LENGTH = _dim(m=1)
+MASS = _dim(kg=1)
+TIME = _dim(s=1)
+TEMPERATURE = _dim(K=1)
+AREA = _dim(m=2)
+VOLUME = _dim(m=3)
+SPEED = _dim(m=1, s=-1)
+FORCE = _dim(m=1, kg=1, s=-2)
+ENERGY = _dim(m=2, kg=1, s=-2)
+POWER = _dim(m=2, kg=1, s=-3)
+PRESSURE = _dim(m=-1, kg=1, s=-2)
+CHARGE = _dim(s=1, A=1)
+VOLTAGE = _dim(m=2, kg=1, s=-3, A=-1)
+
+
+class Unit(NamedTuple):
+    """A unit as an affine map to SI: value_si = value * factor + offset.
+
+    Factors and offsets are exact fractions, so chains of prefixes and
+    compound units do not pick up rounding error before the final division.
+    """
+    factor: Fraction
+    dimension: Dimension
+    offset: Fraction = Fraction(0)
+
+
+_F = Fraction(5, 9)
+
+# symbol: (factor to SI, dimension, offset, takes SI prefixes, spelled-out names)
+_UNITS = {
+    # length
+    'm': (1.0, LENGTH, 0.0, True, ['meter', 'metre']),
+    'ft': (0.3048, LENGTH, 0.0, False, ['foot', 'feet']),
+    'in': (0.0254, LENGTH, 0.0, False, ['inch', 'inches']),
+    'yd': (0.9144, LENGTH, 0.0, False, ['yard']),
+    'mi': (1609.344, LENGTH, 0.0, False, ['mile']),
+    'nmi': (1852.0, LENGTH, 0.0, False, ['nautical mile']),
+    'au': (1.495978707e11, LENGTH, 0.0, False, ['astronomical unit']),
+    'ly': (9.4607304725808e15, LENGTH, 0.0, False, ['light year', 'lightyear']),
+    'angstrom': (1e-10, LENGTH, 0.0, False, ['ångström', 'å']),
+    # mass
+    'g': (1e-3, MASS, 0.0, True, ['gram', 'gramme']),
+    't': (1000.0, MASS, 0.0, False, ['tonne', 'metric ton']),
+    'lb': (0.45359237, MASS, 0.0, False, ['pound', 'lbs']),
+    'oz': (0.028349523125, MASS, 0.0, False, ['ounce']),
+    'u': (1.66053906660e-27, MASS, 0.0, False, ['amu', 'dalton', 'da']),
+    # time
+    's': (1.0, TIME, 0.0, True, ['second', 'sec']),
+    'min': (60.0, TIME, 0.0, False, ['minute']),
+    'h': (3600.0, TIME, 0.0, False, ['hour', 'hr']),
+    'day': (86400.0, TIME, 0.0, False, ['d']),
+    'week': (604800.0, TIME, 0.0, False, ['wk']),
+    'yr': (31557600.0, TIME, 0.0, False, ['year']),
+    # temperature; lowercase c and f stay temperatures as they always were here
+    'K': (1.0, TEMPERATURE, 0.0, True, ['kelvin']),
+    'c': (1.0, TEMPERATURE, Fraction('273.15'), False, ['celsius', 'degree celsius', '°c']),
+    'f': (_F, TEMPERATURE, Fraction('273.15') - 32 * _F, False, ['fahrenheit', 'degree fahrenheit', '°f']),
+    'R': (_F, TEMPERATURE, 0.0, False, ['rankine']),
+    # other SI base units
+    'A': (1.0, _dim(A=1), 0.0, True, ['ampere', 'amp']),
+    'mol': (1.0, _dim(mol=1), 0.0, True, ['mole']),
+    'cd': (1.0, _dim(cd=1), 0.0, True, ['candela']),
+    # area and volume
+    'ha': (1e4, AREA, 0.0, False, ['hectare']),
+    'acre': (4046.8564224, AREA, 0.0, False, []),
+    'L': (1e-3, VOLUME, 0.0, True, ['liter', 'litre']),
+    'gal': (3.785411784e-3, VOLUME, 0.0, False, ['gallon']),
+    # speed
+    'mph': (0.44704, SPEED, 0.0, False, ['miles per hour']),
+    'kph': (Fraction(5, 18), SPEED, 0.0, False, ['kmh']),
+    'kn': (Fraction(1852, 3600), SPEED, 0.0, False, ['knot', 'kt']),
+    # derived SI units
+    'N': (1.0, FORCE, 0.0, True, ['newton']),
+    'J': (1.0, ENERGY, 0.0, True, ['joule']),
+    'W': (1.0, POWER, 0.0, True, ['watt']),
+    'Pa': (1.0, PRESSURE, 0.0, True, ['pascal']),
+    'Hz': (1.0, _dim(s=-1), 0.0, True, ['hertz']),
+    'coulomb': (1.0, CHARGE, 0.0, False, []),
+    'V': (1.0, VOLTAGE, 0.0, True, ['volt']),
+    'ohm': (1.0, _dim(m=2, kg=1, s=-3, A=-2), 0.0, True, ['Ω']),
+    # other energy, pressure and angle units
+    'cal': (4.184, ENERGY, 0.0, True, ['calorie']),
+    'eV': (1.602176634e-19, ENERGY, 0.0, True, ['electronvolt', 'electron volt']),
+    'Wh': (3600.0, ENERGY, 0.0, True, ['watt hour']),
+    'kwh': (3.6e6, ENERGY, 0.0, False, ['kilowatt hour']),
+    'lbf': (4.4482216152605, FORCE, 0.0, False, ['pound force']),
+    'bar': (1e5, PRESSURE, 0.0, True, []),
+    'atm': (101325.0, PRESSURE, 0.0, False, ['atmosphere']),
+    'psi': (6894.757293168361, PRESSURE, 0.0, False, []),
+    'mmHg': (133.322387415, PRESSURE, 0.0, False, ['torr']),
+    'rad': (1.0, DIMENSIONLESS, 0.0, False, ['radian']),
+    'deg': (math.pi / 180, DIMENSIONLESS, 0.0, False, ['degree', '°']),
+}
+
+# SI prefixes as powers of ten
+PREFIXES = {
+    'Y': 24, 'Z': 21, 'E': 18, 'P': 15, 'T': 12, 'G': 9, 'M': 6,
+    'k': 3, 'h': 2, 'da': 1, 'd': -1, 'c': -2, 'm': -3,
+    'µ': -6, 'u': -6, 'n': -9, 'p': -12, 'f': -15, 'a': -18,
+    'z': -21, 'y': -24,
+}
+_PREFIX_NAMES = {
+    'kilo': 'k', 'mega': 'M', 'giga': 'G', 'tera': 'T', 'hecto': 'h', 'deca': 'da',
+    'deci': 'd', 'centi': 'c', 'milli': 'm', 'micro': 'µ', 'nano': 'n', 'pico': 'p',
+}
+
+DIMENSION_NAMES = {
+    LENGTH: 'length', MASS: 'mass', TIME: 'time', TEMPERATURE: 'temperature',
+    AREA: 'area', VOLUME: 'volume', SPEED: 'speed', FORCE: 'force', ENERGY: 'energy',
+    POWER: 'power', PRESSURE: 'pressure', CHARGE: 'charge', VOLTAGE: 'voltage',
+    DIMENSIONLESS: 'angle',
+}
+
+_SUPERSCRIPTS = str.maketrans('⁰¹²³⁴⁵⁶⁷⁸⁹⁻', '0123456789-')
+_TERM = re.compile(r'^(?P<atom>[^\d^\-]+?)(?:\^|\*\*)?(?P<exponent>-?\d+)?$')
+
+
+def _plural(name: str) -> str:
+    if name.endswith(('inch', 'ch')):
+        return name + 'es'
+    if name.endswith(('s', 'z', 'x')) or not name[-1].isalpha():
+        return name
+    return name + 's'
+
+
+class UnitRegistry:
+    """Units as dimension vectors with affine factors to SI.
+
+    Symbols, SI-prefixed symbols and spelled-out names (with plurals and
+    prefixed names like "kilometers") are resolved through indexes built
+    once at construction. Compound units such as ``km/h``, ``N*m`` or
+    ``kg/m^3`` are parsed once and memoized, and every compatible pair of
+    units converts through a memoized ``(scale, offset)``, so a conversion
+    is one multiply-add.
+
+    Input arrives lowercased from the agents' detectors, so when a symbol
+    is not found with its own case it is retried lowercased; there,
+    ``m`` means milli (``mw`` is a milliwatt) and a lone ``c``/``f`` is a
+    temperature.
+    """
+
+    def __init__(self):
+        self._symbols: Dict[str, Unit] = {}
+        self._aliases: Dict[str, str] = {}
+        for symbol, (factor, dimension, offset, prefixable, names) in _UNITS.items():
+            factor = Fraction(repr(factor)) if isinstance(factor, float) else Fraction(factor)
+            self._symbols[symbol] = Unit(factor, dimension, Fraction(offset))
+            for name in names + ([symbol] if len(symbol) > 2 and symbol.isalpha() else []):
+                self._alias(name, symbol)
+            if prefixable:
+                for prefix, power in PREFIXES.items():
+                    self._symbols.setdefault(prefix + symbol, Unit(factor * Fraction(10) ** power, dimension))
+                for prefix_name, prefix in _PREFIX_NAMES.items():
+                    for name in names:
+                        if name.isalpha():
+                            self._alias(prefix_name + name, prefix + symbol)
+
+        # Lowercase fallbacks; the first spelling registered wins. Unprefixed
+        # symbols go first so 'min', 'mi' and 'cd' keep their meaning, then
+        # the lowercase prefixes so 'mw' is milli rather than mega
+        self._lower: Dict[str, str] = {}
+        for symbol in _UNITS:
+            self._lower.setdefault(symbol.lower(), symbol)
+        for prefix in ('m', 'k', 'c', 'd', 'µ', 'u', 'n', 'p', 'G', 'T', 'M'):
+            for symbol, (_, _, _, prefixable, _) in _UNITS.items():
+                if prefixable:
+                    self._lower.setdefault((prefix + symbol).lower(), prefix + symbol)
+        for symbol in self._symbols:
+            self._lower.setdefault(symbol.lower(), symbol)
+
+    def _alias(self, name: str, symbol: str) -> None:
+        for spelling in {name, _plural(name)}:
+            self._aliases.setdefault(spelling.lower(), symbol)
+            if spelling.startswith('degree '):
+                self._aliases.setdefault('degrees ' + spelling[len('degree '):], symbol)
+
+    def normalize(self, text: str) -> Optional[str]:
+        """Canonical symbol for a unit symbol or name ('Kilometres' -> 'km'), or None"""
+        if text in self._symbols:
+            return text
+        lower = text.lower()
+        return self._aliases.get(lower) or self._lower.get(lower)
+
+    def _atom(self, text: str) -> Optional[Unit]:
+        symbol = self.normalize(text)
+        return self._symbols[symbol] if symbol else None
+
+    @lru_cache(maxsize=1024)
+    def parse(self, text: str) -> Optional[Unit]:
+        """Resolve a unit symbol, name or compound expression, or None if unknown"""
+        text = text.strip()
+        if not text:
+            return None
+        unit = self._atom(text)
+        if unit is not None:
+            return unit
+
+        # Compound: factors joined by * · or space, with everything after the
+        # first '/' (or 'per') in the denominator, so J/kg*K is J/(kg*K)
+        compound = re.sub(r'\s+per\s+', '/', text.translate(_SUPERSCRIPTS))
+        compound = re.sub(r'\b(?:square|sq)\s+(\w+)', r'\1^2', compound)
+        compound = re.sub(r'\bcubic\s+(\w+)', r'\1^3', compound)
+        compound = compound.replace('(', '').replace(')', '').replace('·', '*')
+        numerator, _, denominator = compound.partition('/')
+        factor = Fraction(1)
+        dimension = [0] * len(BASE_DIMENSIONS)
+        for part, sign in ((numerator, 1), (denominator.replace('/', '*'), -1)):
+            for term in filter(None, re.split(r'\s*\*(?!\*)\s*|\s+', part.replace('**', '^'))):
+                match = _TERM.match(term)
+                if match is None:
+                    return None
+                atom = self._atom(match.group('atom'))
+                if atom is None:
+                    return None
+                power = sign * int(match.group('exponent') or 1)
+                factor *= atom.factor ** power
+                dimension = [d + e * power for d, e in zip(dimension, atom.dimension)]
+        # offsets only make sense for a lone temperature; in a compound
+        # (J/kg*c) the unit means a temperature difference
+        return Unit(factor, tuple(dimension))
+
+    @lru_cache(maxsize=4096)
+    def conversion(self, from_unit: str, to_unit: str) -> Optional[Tuple[float, float]]:
+        """``(scale, offset)`` such that ``to = from * scale + offset``, or None if incompatible"""
+        source, target = self.parse(from_unit), self.parse(to_unit)
+        if source is None or target is None or source.dimension != target.dimension:
+            return None
+        return float(source.factor / target.factor), float((source.offset - target.offset) / target.factor)
+
+    def convert(self, value: float, from_unit: str, to_unit: str) -> Optional[float]:
+        factors = self.conversion(from_unit, to_unit)
+        if factors is None:
+            return None
+        scale, offset = factors
+        return value * scale + offset
+
+    def units_by_dimension(self) -> Dict[str, List[str]]:
+        """Unprefixed unit symbols grouped by the name of their dimension"""
+        groups: Dict[str, List[str]] = {}
+        for symbol, (_, dimension, _, _, _) in _UNITS.items():
+            groups.setdefault(DIMENSION_NAMES.get(dimension, 'other'), []).append(symbol)
+        return groups
+
+
+# shared, since the indexes and memoized conversions are the expensive part
+registry = UnitRegistry()